@@ -1,43 +1,119 @@
 # -*- coding: utf-8 -*-
-import json
-import os
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import itertools
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from utils.deal_store import DealStore
 
 # --- Configuración ---
 DEALS_FILE = 'deals.json'
+DEALS_RELOAD_INTERVAL = 1.0  # segundos entre comprobaciones de deals.json
+MAX_PAGE_SIZE = 1000
+LARGE_RESULT_SIZE = 5000  # resultados a partir de los cuales la respuesta se arma en un hilo
+
+# Ofertas residentes en memoria (se recargan solo si deals.json cambia)
+deal_store = DealStore(DEALS_FILE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cargar las ofertas al arrancar y vigilar el archivo mientras la API esté activa
+    deal_store.start_watching(DEALS_RELOAD_INTERVAL)
+    yield
+    deal_store.stop_watching()
 
 # --- Aplicación FastAPI ---
 app = FastAPI(
     title="API de Ofertas de Scraping",
     description="API para obtener las mejores ofertas encontradas por el sistema de scraping.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+async def get_deal_index():
+    # Con el vigilante activo es una lectura en memoria; si no, el disco se lee fuera del event loop
+    index = await deal_store.get_index_async()
+    if index is None:
+        raise HTTPException(status_code=404, detail="No se ha generado el archivo de ofertas todavía. Ejecuta el scraping primero.")
+    return index
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match: "*" o alguna de las etiquetas de la lista (comparación débil, sin el prefijo W/)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def json_bytes_response(request: Request, body: bytes, etag: str, total: Optional[int] = None) -> Response:
+    """Respuesta con el JSON ya serializado; 304 si el cliente tiene la misma versión"""
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if total is not None:
+        headers['X-Total-Count'] = str(total)
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
 # --- Endpoints ---
 @app.get("/api/deals", summary="Obtener todas las ofertas", response_class=JSONResponse)
-async def get_deals():
-    """Devuelve una lista de todas las ofertas encontradas con más de 70% de descuento."""
-    if not os.path.exists(DEALS_FILE):
-        raise HTTPException(status_code=404, detail="No se ha generado el archivo de ofertas todavía. Ejecuta el scraping primero.")
+async def get_deals(
+    request: Request,
+    store: Optional[str] = Query(None, description="Filtrar por tienda"),
+    min_discount: Optional[float] = Query(None, ge=0, le=100, description="Descuento mínimo (%)"),
+    offset: int = Query(0, ge=0, description="Ofertas a saltar"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página")
+):
+    """Devuelve las ofertas encontradas con más de 70% de descuento (filtrables y paginadas).
+
+    El total de ofertas que cumplen el filtro va en la cabecera X-Total-Count.
+    """
+    index = await get_deal_index()
+    body, etag, total = index.response(store, min_discount, offset, limit)
+    return json_bytes_response(request, body, etag, total)
+
+@app.get("/api/deals/stream", summary="Exportar ofertas como NDJSON")
+async def stream_deals(
+    store: Optional[str] = Query(None, description="Filtrar por tienda"),
+    min_discount: Optional[float] = Query(None, ge=0, le=100, description="Descuento mínimo (%)"),
+    cursor: int = Query(0, ge=0, description="Ofertas ya recibidas (para reanudar)"),
+    version: Optional[str] = Query(None, description="Valor de X-Deals-Version de la descarga a reanudar")
+):
+    """Emite las ofertas una por línea (NDJSON) a medida que se envían.
+
+    Para reanudar una descarga cortada, repetir la petición con `cursor` = líneas recibidas
+    y `version` = cabecera X-Deals-Version original; si las ofertas cambiaron entretanto se
+    responde 409 y hay que empezar de nuevo.
+    """
+    index = await get_deal_index()
+    if version and version.strip('"') != index.version:
+        raise HTTPException(status_code=409, detail="Las ofertas cambiaron desde que comenzó la descarga. Vuelve a empezar sin cursor.")
     
-    with open(DEALS_FILE, 'r', encoding='utf-8') as f:
-        deals = json.load(f)
-        
-    return deals
+    # La respuesta conserva su foto del índice aunque deals.json se recargue a mitad de la descarga
+    positions = itertools.islice(index.iter_positions(store, min_discount), cursor, None)
+    return StreamingResponse(
+        index.iter_ndjson(positions),
+        media_type='application/x-ndjson',
+        headers={'X-Deals-Version': index.version, 'Cache-Control': 'no-cache'}
+    )
 
 @app.get("/api/search", summary="Buscar ofertas por palabra clave", response_class=JSONResponse)
 async def search_deals(query: str):
-    """Busca ofertas que contengan la palabra clave en el nombre del producto."""
-    if not os.path.exists(DEALS_FILE):
-        raise HTTPException(status_code=404, detail="No se ha generado el archivo de ofertas todavía. Ejecuta el scraping primero.")
-        
-    with open(DEALS_FILE, 'r', encoding='utf-8') as f:
-        deals = json.load(f)
-        
-    results = [deal for deal in deals if query.lower() in deal.get('name', '').lower()]
-    
-    return results
+    """Busca ofertas cuyo nombre contenga las palabras clave (sin distinguir acentos ni mayúsculas)."""
+    index = await get_deal_index()
+    positions = index.search_positions(query)
+    if len(positions) > LARGE_RESULT_SIZE:
+        # Armar respuestas grandes en un hilo para no frenar las demás peticiones
+        body = await run_in_threadpool(index.render, positions)
+    else:
+        body = index.render(positions)
+    return Response(content=body, media_type='application/json', headers={'X-Total-Count': str(len(positions))})
 
 # --- Ejecución (para pruebas locales) ---
 if __name__ == '__main__':
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extractores de productos
+Compara el motor lxml (selectores compilados) con el camino BeautifulSoup sobre páginas guardadas
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+FIXTURES_DIR = os.path.join('data', 'fixtures')
+
+# Campos que dependen del momento de extracción y no cuentan para la paridad
+VOLATILE_FIELDS = ('fecha_creacion', 'scraped_at')
+
+def load_fixtures(pattern: str) -> List[Tuple[str, str, bytes]]:
+    """Páginas guardadas como <tienda>_<nombre>.html"""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, pattern))):
+        store_name = os.path.basename(path).split('_')[0]
+        with open(path, 'rb') as f:
+            fixtures.append((os.path.basename(path), store_name, f.read()))
+    return fixtures
+
+def get_extractors() -> Dict[str, object]:
+    """Extractores disponibles en este entorno"""
+    extractors = {}
+    from descuentosgo import DescuentosGO
+    extractors['descuentosgo'] = DescuentosGO(parser_only=True)
+    try:
+        from scraping_avanzado import ScrapingAvanzado
+        extractors['scraping_avanzado'] = ScrapingAvanzado(parser_only=True)
+    except ImportError as e:
+        print(f"⚠️  scraping_avanzado no disponible: {e}")
+    return extractors
+
+def strip_volatile(products: List[Dict]) -> List[Dict]:
+    return [{k: v for k, v in product.items() if k not in VOLATILE_FIELDS} for product in products]
+
+def run_engine(extractor, engine: str, html: bytes, store_name: str, iterations: int) -> Tuple[List[Dict], float]:
+    """Extrae `iterations` veces con el motor indicado; devuelve productos y segundos por iteración"""
+    extractor.html_engine = engine
+    products = extractor.extract_products_from_html(html, store_name)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        extractor.extract_products_from_html(html, store_name)
+    return products, (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extractores (lxml vs BeautifulSoup)')
+    parser.add_argument('--iterations', type=int, default=20, help='Repeticiones por página')
+    parser.add_argument('--pattern', default='*.html', help='Patrón de fixtures en data/fixtures')
+    args = parser.parse_args()
+
+    from utils.fast_extractor import LXML_AVAILABLE
+    if not LXML_AVAILABLE:
+        print("❌ lxml no está instalado")
+        return 1
+
+    fixtures = load_fixtures(args.pattern)
+    if not fixtures:
+        print(f"❌ No hay fixtures en {FIXTURES_DIR}")
+        return 1
+
+    # Los extractores imprimen su progreso; silenciarlo durante las mediciones
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        extractors = get_extractors()
+        rows = []
+        for extractor_name, extractor in extractors.items():
+            for fixture_name, store_name, html in fixtures:
+                bs4_products, bs4_time = run_engine(extractor, 'bs4', html, store_name, args.iterations)
+                lxml_products, lxml_time = run_engine(extractor, 'lxml', html, store_name, args.iterations)
+                parity = strip_volatile(bs4_products) == strip_volatile(lxml_products)
+                rows.append((extractor_name, fixture_name, len(lxml_products), bs4_time, lxml_time, parity))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"\n📊 Benchmark de extractores ({args.iterations} iteraciones por página)")
+    print("=" * 96)
+    print(f"{'Extractor':<18} {'Página':<24} {'Prod.':>5} {'bs4 prod/s':>12} {'lxml prod/s':>12} {'bs4 ms':>8} {'lxml ms':>8} {'x':>6}  Paridad")
+    print("-" * 96)
+    all_parity = True
+    for extractor_name, fixture_name, count, bs4_time, lxml_time, parity in rows:
+        all_parity = all_parity and parity
+        print(
+            f"{extractor_name:<18} {fixture_name:<24} {count:>5} "
+            f"{count / bs4_time:>12.0f} {count / lxml_time:>12.0f} "
+            f"{bs4_time * 1000:>8.2f} {lxml_time * 1000:>8.2f} {bs4_time / lxml_time:>6.1f}  "
+            f"{'✅' if parity else '❌'}"
+        )
+    print("=" * 96)
+    print("✅ Mismos productos con ambos motores" if all_parity else "❌ Hay diferencias entre motores")
+    return 0 if all_parity else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
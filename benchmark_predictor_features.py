@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark y paridad de las características del predictor de precios
+Compara el cálculo vectorizado (groupby + ventanas móviles) con la versión original
+fila por fila sobre historiales sintéticos
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def legacy_prepare_features(price_history: List[Dict], min_data_points: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Implementación original de PricePredictor._prepare_features (referencia para la paridad)"""
+    if len(price_history) < min_data_points:
+        return None, None
+
+    df = pd.DataFrame(price_history)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = df.sort_values('timestamp')
+
+    features = []
+    targets = []
+
+    for i in range(len(df) - 1):
+        current_price = df.iloc[i]['current_price']
+        original_price = df.iloc[i]['original_price']
+
+        day_of_week = df.iloc[i]['timestamp'].dayofweek
+        day_of_month = df.iloc[i]['timestamp'].day
+        month = df.iloc[i]['timestamp'].month
+
+        if i > 0:
+            price_change = (current_price - df.iloc[i-1]['current_price']) / df.iloc[i-1]['current_price']
+            price_volatility = np.std([p['current_price'] for p in price_history[max(0, i-5):i+1]])
+        else:
+            price_change = 0
+            price_volatility = 0
+
+        discount = (original_price - current_price) / original_price if original_price > 0 else 0
+
+        price_moving_avg_3 = np.mean([p['current_price'] for p in price_history[max(0, i-2):i+1]])
+        price_moving_avg_7 = np.mean([p['current_price'] for p in price_history[max(0, i-6):i+1]])
+
+        features.append([
+            current_price, original_price, discount, day_of_week, day_of_month, month,
+            price_change, price_volatility, price_moving_avg_3, price_moving_avg_7
+        ])
+        targets.append(df.iloc[i+1]['current_price'])
+
+    return np.array(features), np.array(targets)
+
+def make_histories(products: int, seed: int) -> List[List[Dict]]:
+    """Historiales con precios en caminata aleatoria y registros a intervalos irregulares"""
+    rng = random.Random(seed)
+    histories = []
+    for index in range(products):
+        start = datetime(2025, 1, 1) + timedelta(hours=rng.randint(0, 24 * 300))
+        original_price = float(rng.randint(10, 2000) * 1000)
+        price = original_price * rng.uniform(0.3, 0.95)
+        history = []
+        moment = start
+        for _ in range(rng.randint(5, 50)):
+            moment += timedelta(minutes=rng.randint(30, 60 * 72))
+            price = max(1000.0, round(price * rng.uniform(0.85, 1.15)))
+            history.append({
+                'name': f'Producto {index}',
+                'store': 'falabella',
+                'current_price': price,
+                'original_price': original_price,
+                'timestamp': moment.isoformat()
+            })
+        histories.append(history)
+    return histories
+
+def to_series(history: List[Dict]):
+    from utils.price_history_store import PriceSeries
+    return PriceSeries(
+        key=history[0]['name'],
+        name=history[0]['name'],
+        store=history[0]['store'],
+        timestamps=np.array([datetime.fromisoformat(entry['timestamp']).timestamp() for entry in history]),
+        current_prices=np.array([entry['current_price'] for entry in history], dtype=float),
+        original_prices=np.array([entry['original_price'] for entry in history], dtype=float)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridad y velocidad de PricePredictor._prepare_features')
+    parser.add_argument('--products', type=int, default=2000, help='Historiales sintéticos')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos')
+    args = parser.parse_args()
+
+    from utils.price_predictor import PricePredictor
+    predictor = PricePredictor.__new__(PricePredictor)
+    predictor.min_data_points = 10
+
+    histories = make_histories(args.products, args.seed)
+    series = [to_series(history) for history in histories]
+
+    # Versión original: un producto a la vez, fila por fila
+    start = time.perf_counter()
+    legacy = [legacy_prepare_features(history) for history in histories]
+    legacy_time = time.perf_counter() - start
+    legacy = [result for result in legacy if result[0] is not None]
+    legacy_X = np.vstack([features for features, _ in legacy])
+    legacy_y = np.concatenate([targets for _, targets in legacy])
+
+    # Versión vectorizada: todos los productos en una pasada (como train_models)
+    start = time.perf_counter()
+    batch_X, batch_y = predictor._prepare_features_batch(series)
+    batch_time = time.perf_counter() - start
+
+    # Por producto, como en la predicción individual
+    single_parity = all(
+        np.allclose(predictor._prepare_features(item)[0], legacy_prepare_features(history)[0])
+        for history, item in zip(histories[:50], series[:50]) if len(history) >= 10
+    )
+    parity = (
+        legacy_X.shape == batch_X.shape
+        and np.allclose(legacy_X, batch_X, rtol=1e-9, atol=1e-6)
+        and np.allclose(legacy_y, batch_y)
+        and single_parity
+    )
+
+    print(f"\n📊 Características del predictor: {len(legacy)} productos, {len(legacy_y)} filas")
+    print("=" * 64)
+    print(f"{'Versión':<24} {'Segundos':>10} {'Filas/s':>14}")
+    print("-" * 64)
+    print(f"{'Original (iloc)':<24} {legacy_time:>10.3f} {len(legacy_y) / legacy_time:>14.0f}")
+    print(f"{'Vectorizada (groupby)':<24} {batch_time:>10.3f} {len(batch_y) / batch_time:>14.0f}")
+    print("=" * 64)
+    print(f"⚡ {legacy_time / batch_time:.0f}x más rápido")
+    print("✅ Misma matriz de características" if parity else "❌ Las matrices no coinciden")
+    return 0 if parity else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -44,11 +44,62 @@ REQUEST_TIMEOUT = 10
 
 RETRY_CONFIG = {
     'max_attempts': 3,
-    'delay_between_attempts': 2,
-    'backoff_factor': 2,
-    'max_delay': 10
+    'delay_between_attempts': 2,    # espera base antes del primer reintento (segundos)
+    'backoff_factor': 2,            # multiplicador exponencial entre reintentos
+    'max_delay': 10,                # tope de espera calculada
+    'jitter': 0.5,                  # fracción aleatoria que se resta a cada espera
+    'retry_statuses': [429, 500, 502, 503, 504],
+    'max_retry_after': 60,          # no reintentar si el servidor pide esperar más que esto
+    'retry_budget_per_url': 6,      # reintentos permitidos por URL dentro de la ventana
+    'retry_budget_window': 600      # ventana del presupuesto (segundos)
 }
 
 RATE_LIMIT_CONFIG = {
-    'delay_between_requests': 1
+    # Límites por host: cada tienda tiene su propio token bucket y semáforo
+    'delay_between_requests': 1,    # segundos entre peticiones al mismo host
+    'burst': 2,                     # peticiones que se pueden acumular tras un periodo inactivo
+    'max_concurrent_per_host': 2,   # peticiones simultáneas al mismo host
+    'hosts': {
+        # Ajustes específicos, p. ej. 'webcache.googleusercontent.com': {'delay_between_requests': 2}
+    }
+}
+
+HTTP_CLIENT_CONFIG = {
+    # Cliente httpx compartido por todos los scrapers del proceso
+    'http2': True,                      # requiere el paquete 'h2' (httpx[http2])
+    'max_connections': 40,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30              # segundos que se mantiene abierta una conexión ociosa
+}
+
+SELENIUM_CONFIG = {
+    # Pool de navegadores headless reutilizados entre categorías y ejecuciones
+    'pool_size': 3,                     # navegadores simultáneos
+    'page_load_strategy': 'eager',      # no esperar imágenes ni hojas de estilo
+    'block_resources': True,
+    'blocked_url_patterns': [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+        '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf'
+    ],
+    'wait_timeout': 10,                 # espera máxima por el selector de productos (segundos)
+    'scroll_timeout': 2,                # espera máxima por contenido nuevo tras cada scroll
+    'max_scrolls': 3,
+    'window_size': '1920,1080',
+    'user_agent': DEFAULT_HEADERS['User-Agent']  # el mismo para todos los navegadores del pool
+}
+
+CACHE_CONFIG = {
+    # Capa en memoria (LRU) delante de la caché en disco de CacheManager
+    'memory_max_entries': 500,              # categorías guardadas en memoria
+    'memory_max_bytes': 64 * 1024 * 1024,   # tamaño aproximado (JSON) de los productos en memoria
+    'memory_ttl_hours': 1,                  # vigencia en memoria por defecto
+    'store_ttl_hours': {
+        # Tiendas con ofertas que cambian más rápido se refrescan antes
+        'falabella': 0.5,
+        'paris': 0.5,
+        'sodimac': 2
+    },
+    # Stale-while-revalidate de categorías en los scrapers
+    'soft_ttl_minutes': 2,      # más antiguo que esto: se sirve el cache y se refresca en segundo plano
+    'hard_ttl_hours': 1         # más antiguo que esto: se espera la descarga
 }
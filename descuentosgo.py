@@ -10,21 +10,58 @@ import json
 import time
 import requests
 import sqlite3
+import asyncio
 import threading
+import multiprocessing
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 import re
 from typing import List, Dict, Optional, Set
 import hashlib
+from utils.conditional_get import ValidatorStore, ParsedProductCache, PageResult
+from utils.helpers import ScrapingHelper
+from utils.http_client import close_clients
+from utils.parse_executor import ParseExecutor
+from utils.fast_extractor import FastExtractor, LXML_AVAILABLE
+from utils.cache_manager import get_cache_manager
+from utils.change_detector import ChangeDetector, make_fingerprint, SEEN_REFRESH_INTERVAL
+from config.settings import CACHE_CONFIG
 
 # Configuración
 MIN_DISCOUNT_PERCENTAGE = 70  # Solo productos con 70%+ de descuento
 TELEGRAM_ALERT_THRESHOLD = 85  # Alerta Telegram para 85%+ de descuento
 MAX_PRODUCTS_PER_STORE = 100   # Límite de productos por tienda
 SCAN_INTERVAL = 300  # 5 minutos entre escaneos
+SCAN_FETCH_WORKERS = 8  # Descargas simultáneas del escaneo asíncrono (el límite por host se aplica aparte)
+SCAN_QUEUE_SIZE = 16    # Capacidad de las colas entre etapas (backpressure)
+
+# Selectores de contenedores de producto por tienda (el primero que encuentre resultados gana)
+_COMMON_PRODUCT_SELECTORS = ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container']
+STORE_PRODUCT_SELECTORS = {
+    'paris': _COMMON_PRODUCT_SELECTORS + ['.product-box'],
+    'hites': _COMMON_PRODUCT_SELECTORS + ['.product-box'],
+    'falabella': ['.pod-item', '.pod-details', '.product-item', '.product-card', '.product-grid-item'],
+    'sodimac': _COMMON_PRODUCT_SELECTORS,
+    'easy': _COMMON_PRODUCT_SELECTORS,
+    'lider': _COMMON_PRODUCT_SELECTORS,
+    'jumbo': _COMMON_PRODUCT_SELECTORS,
+    'santa_isabel': _COMMON_PRODUCT_SELECTORS,
+    'alcampo': _COMMON_PRODUCT_SELECTORS,
+    'unimarc': _COMMON_PRODUCT_SELECTORS,
+    'walmart': _COMMON_PRODUCT_SELECTORS,
+    'tottus': _COMMON_PRODUCT_SELECTORS
+}
+DEFAULT_PRODUCT_SELECTORS = ['.product-item', '.product-card']
+NAME_SELECTORS = [
+    '.product-name', '.product-title', '.name', '.title',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    '[class*="name"]', '[class*="title"]',
+    'a', 'span', 'div'
+]
+CATEGORY_SELECTORS = ['.category', '.breadcrumb', '[class*="category"]']
 
 class DescuentosGO:
-    def __init__(self):
+    def __init__(self, parser_only: bool = False):
         self.data_dir = "data"
         self.db_path = os.path.join(self.data_dir, "descuentosgo.db")
         self.json_path = os.path.join(self.data_dir, "productos_descuentosgo.json")
@@ -178,16 +215,59 @@ class DescuentosGO:
             }
         }
         
+        # Motor de extracción: lxml con selectores compilados una vez; BeautifulSoup si falta lxml
+        self.html_engine = 'lxml' if LXML_AVAILABLE else 'bs4'
+        self.fast_extractor = None
+        if LXML_AVAILABLE:
+            self.fast_extractor = FastExtractor(
+                STORE_PRODUCT_SELECTORS, DEFAULT_PRODUCT_SELECTORS,
+                field_selectors=NAME_SELECTORS + CATEGORY_SELECTORS + ['a', 'img']
+            )
+        
+        # Los workers de parseo solo necesitan la configuración de tiendas
+        if parser_only:
+            return
+        
         # Variables de control del scanner
         self.scanner_running = False
         self.scanner_thread = None
         self.total_scans = 0
         self.total_products_found = 0
         self.last_scan_time = None
+        self.last_scan_changes = {}  # nuevos / con cambios / sin cambios del último escaneo
+        
+        # Escaneo asíncrono (descarga -> parseo -> escritura); False usa el recorrido secuencial
+        self.async_scan = True
+        self.parse_backend = 'process'  # 'process', 'thread' o 'inline'
+        self.parse_workers = os.cpu_count() or 1
+        self._parse_executor = None  # se crea en el primer escaneo y se reutiliza en los siguientes
+        self._scan_loop = None
         
         # Inicializar base de datos
         self.init_database()
         
+        # Huellas de precio/descuento de lo guardado: solo lo nuevo o cambiado se guarda y se notifica
+        self.change_detector = ChangeDetector(
+            key_func=lambda product: product['hash_id'],
+            fingerprint_func=lambda product: make_fingerprint(product['precio_actual'], product['descuento_porcentaje']),
+            touch_interval=SEEN_REFRESH_INTERVAL
+        )
+        self.seed_change_detector()
+        
+        # Validadores HTTP y listas parseadas para no reprocesar páginas sin cambios
+        http_cache_path = os.path.join(self.data_dir, "http_cache.db")
+        self.validators = ValidatorStore(http_cache_path)
+        self.parsed_cache = ParsedProductCache(http_cache_path, namespace='descuentosgo')
+        
+        # Productos por categoría con stale-while-revalidate (escaneo asíncrono y scrape_store)
+        self.category_cache = get_cache_manager()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        
+        # Cliente asíncrono (pool compartido, límite por host y reintentos) para el escaneo asíncrono
+        self.helper = ScrapingHelper()
+        self.helper.validators = self.validators
+        
         # Configuración de Telegram
         self.telegram_config = {
             'enabled': True,  # Habilitado por defecto
@@ -204,6 +284,9 @@ class DescuentosGO:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # WAL: lectores y el escritor del scanner no se bloquean entre sí (queda guardado en el archivo)
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Tabla de productos
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS productos (
@@ -253,12 +336,24 @@ class DescuentosGO:
 
     def get_page_content(self, url: str) -> Optional[str]:
         """Obtiene el contenido de una página web con retry"""
+        page = self.fetch_page(url, use_validators=False)
+        return page.text if page else None
+    
+    def fetch_page(self, url: str, use_validators: bool = True) -> Optional[PageResult]:
+        """GET condicional con retry: devuelve not_modified=True si el servidor responde 304"""
+        headers = dict(self.headers)
+        if use_validators:
+            headers.update(self.validators.conditional_headers(url))
+        
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, headers=self.headers, timeout=30)
+                response = requests.get(url, headers=headers, timeout=30)
+                if response.status_code == 304:
+                    return PageResult(url, self.validators.get_content_hash(url), None, not_modified=True)
                 response.raise_for_status()
-                return response.text
+                content_hash = self.validators.record(url, response.headers, response.content)
+                return PageResult(url, content_hash, response.text, body=response.content)
             except Exception as e:
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)  # Backoff exponencial
@@ -266,38 +361,37 @@ class DescuentosGO:
                     return None
         return None
     
+    def scrape_category(self, url: str, store_name: str) -> List[Dict]:
+        """Obtiene los productos de una categoría, sin volver a parsear si la página no cambió"""
+        page = self.fetch_page(url)
+        if page is None:
+            return []
+        
+        products = self.parsed_cache.get(page.content_hash, store_name)
+        if products is not None:
+            return products
+        
+        if page.not_modified:
+            # 304 sin lista parseada guardada: descargar el cuerpo completo
+            page = self.fetch_page(url, use_validators=False)
+            if page is None:
+                return []
+        
+        products = self.extract_products_from_html(page.body if page.body is not None else page.text, store_name)
+        self.parsed_cache.set(page.content_hash, store_name, products)
+        return products
+    
     def extract_products_from_html(self, html_content: str, store_name: str) -> List[Dict]:
         """Extrae productos del HTML usando selectores específicos por tienda"""
         if not html_content:
             return []
         
-        soup = BeautifulSoup(html_content, 'html.parser')
         products = []
-        
-        # Selectores específicos por tienda
-        store_selectors = {
-            'paris': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container', '.product-box'],
-            'hites': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container', '.product-box'],
-            'falabella': ['.pod-item', '.pod-details', '.product-item', '.product-card', '.product-grid-item'],
-            'sodimac': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'easy': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'lider': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'jumbo': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'santa_isabel': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'alcampo': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'unimarc': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'walmart': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container'],
-            'tottus': ['.product-item', '.product-card', '.product-grid-item', '.product-tile', '.product-container']
-        }
-        
-        selectors = store_selectors.get(store_name, ['.product-item', '.product-card'])
-        
-        product_elements = []
-        for selector in selectors:
-            elements = soup.select(selector)
-            if elements:
-                product_elements.extend(elements)
-                break
+        if self.html_engine == 'lxml':
+            document = self.fast_extractor.parse(html_content)
+            _, product_elements = self.fast_extractor.select_products(document, store_name)
+        else:
+            product_elements = self.select_products_bs4(html_content, store_name)
         
         # Extraer información de cada producto
         for element in product_elements[:MAX_PRODUCTS_PER_STORE]:
@@ -307,6 +401,15 @@ class DescuentosGO:
         
         return products
     
+    def select_products_bs4(self, html_content, store_name: str) -> List:
+        """Contenedores de producto con BeautifulSoup (motor de respaldo sin lxml)"""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for selector in STORE_PRODUCT_SELECTORS.get(store_name, DEFAULT_PRODUCT_SELECTORS):
+            elements = soup.select(selector)
+            if elements:
+                return elements
+        return []
+    
     def extract_product_info(self, element, store_name: str) -> Optional[Dict]:
         """Extrae información completa de un producto"""
         try:
@@ -348,14 +451,7 @@ class DescuentosGO:
     
     def extract_product_name(self, element) -> Optional[str]:
         """Extrae el nombre del producto"""
-        name_selectors = [
-            '.product-name', '.product-title', '.name', '.title',
-            'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-            '[class*="name"]', '[class*="title"]',
-            'a', 'span', 'div'
-        ]
-        
-        for selector in name_selectors:
+        for selector in NAME_SELECTORS:
             name_elem = element.select_one(selector)
             if name_elem:
                 name = name_elem.get_text(strip=True)
@@ -421,8 +517,7 @@ class DescuentosGO:
     
     def extract_category(self, element) -> Optional[str]:
         """Extrae la categoría del producto"""
-        category_selectors = ['.category', '.breadcrumb', '[class*="category"]']
-        for selector in category_selectors:
+        for selector in CATEGORY_SELECTORS:
             cat_elem = element.select_one(selector)
             if cat_elem:
                 return cat_elem.get_text(strip=True)[:100]
@@ -467,53 +562,59 @@ class DescuentosGO:
     
     def save_product_to_db(self, product: Dict) -> bool:
         """Guarda un producto en la base de datos"""
+        return self.save_products_to_db([product]) == 1
+    
+    def save_products_to_db(self, products: List[Dict], touched: Optional[List[Dict]] = None) -> int:
+        """Guarda un lote de productos (upsert + historial) en una sola transacción
+        
+        `touched` son productos sin cambios que siguen publicados: solo se renueva su fecha_actualizacion.
+        """
+        touched = touched or []
+        if not products and not touched:
+            return 0
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+            rows = [(
+                product['hash_id'], product['nombre'], product['precio_actual'],
+                product['precio_original'], product['descuento_porcentaje'],
+                product['enlace'], product['imagen'], product['tienda'],
+                product['categoria'], product['confiabilidad_score'], now
+            ) for product in products]
+            history = [(product['hash_id'], product['precio_actual'], now) for product in products]
             
-            # Verificar si el producto ya existe
-            cursor.execute('SELECT hash_id FROM productos WHERE hash_id = ?', (product['hash_id'],))
-            exists = cursor.fetchone()
-            
-            if exists:
-                # Actualizar producto existente
-                cursor.execute('''
-                    UPDATE productos 
-                    SET precio_actual = ?, precio_original = ?, descuento_porcentaje = ?,
-                        confiabilidad_score = ?, fecha_actualizacion = ?
-                    WHERE hash_id = ?
-                ''', (
-                    product['precio_actual'], product['precio_original'],
-                    product['descuento_porcentaje'], product['confiabilidad_score'],
-                    datetime.now().isoformat(), product['hash_id']
-                ))
-            else:
-                # Insertar nuevo producto
-                cursor.execute('''
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                # Existentes: solo se actualizan precios, descuento, score y fecha de actualización
+                conn.executemany('''
                     INSERT INTO productos 
                     (hash_id, nombre, precio_actual, precio_original, descuento_porcentaje, 
                      enlace, imagen, tienda, categoria, confiabilidad_score, fecha_creacion)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    product['hash_id'], product['nombre'], product['precio_actual'],
-                    product['precio_original'], product['descuento_porcentaje'],
-                    product['enlace'], product['imagen'], product['tienda'],
-                    product['categoria'], product['confiabilidad_score'],
-                    datetime.now().isoformat()
-                ))
-            
-            # Guardar en historial de precios
-            cursor.execute('''
-                INSERT INTO historial_precios (producto_hash, precio, fecha)
-                VALUES (?, ?, ?)
-            ''', (product['hash_id'], product['precio_actual'], datetime.now().isoformat()))
-            
-            conn.commit()
+                    ON CONFLICT(hash_id) DO UPDATE SET
+                        precio_actual = excluded.precio_actual,
+                        precio_original = excluded.precio_original,
+                        descuento_porcentaje = excluded.descuento_porcentaje,
+                        confiabilidad_score = excluded.confiabilidad_score,
+                        fecha_actualizacion = excluded.fecha_creacion
+                ''', rows)
+                
+                # Guardar en historial de precios
+                conn.executemany('''
+                    INSERT INTO historial_precios (producto_hash, precio, fecha)
+                    VALUES (?, ?, ?)
+                ''', history)
+                
+                conn.executemany(
+                    'UPDATE productos SET fecha_actualizacion = ? WHERE hash_id = ?',
+                    [(now, product['hash_id']) for product in touched]
+                )
             conn.close()
-            return True
+            return len(rows) + len(touched)
             
         except Exception as e:
-            return False
+            return 0
     
     def send_telegram_alert(self, product: Dict) -> bool:
         """Envía alerta por Telegram si el descuento es muy alto"""
@@ -584,39 +685,82 @@ class DescuentosGO:
             if not category.get('enabled', True):
                 continue
                 
-            html_content = self.get_page_content(category['url'])
-            if html_content:
-                products = self.extract_products_from_html(html_content, store_name)
-                all_products.extend(products)
-                
-                # Pausa entre categorías
+            products, downloaded = self.scrape_category_cached(category, store_name)
+            all_products.extend(products)
+            
+            # Pausa entre categorías (solo si hubo descarga)
+            if downloaded:
                 time.sleep(1)
         
         return all_products
     
+    def scrape_category_cached(self, category: Dict, store_name: str) -> tuple:
+        """(productos, hubo_descarga) con stale-while-revalidate sobre el cache de categorías"""
+        products = self.cached_category_products(category, store_name)
+        if products is not None:
+            return products, False
+        
+        products = self.scrape_category(category['url'], store_name)
+        self._cache_category(category, store_name, products)
+        return products, True
+    
+    def cached_category_products(self, category: Dict, store_name: str) -> Optional[List[Dict]]:
+        """Productos cacheados de la categoría, o None si no hay (o pasó el TTL duro)
+        
+        Datos recientes se sirven tal cual; pasado el TTL blando se sirven igual y se refrescan
+        en un hilo; solo sin cache se espera la descarga.
+        """
+        cached = self.category_cache.get_with_age(
+            store_name, category['name'], category['url'], CACHE_CONFIG['hard_ttl_hours']
+        )
+        if cached is None:
+            return None
+        products, age = cached
+        if age >= CACHE_CONFIG['soft_ttl_minutes'] * 60:
+            self._refresh_category_in_background(category, store_name)
+        return products
+    
+    def _cache_category(self, category: Dict, store_name: str, products: List[Dict]):
+        # Una lista vacía suele ser un error de descarga: no reemplazar datos buenos con ella
+        if products:
+            self.category_cache.set(store_name, category['name'], category['url'], products)
+    
+    def _refresh_category_in_background(self, category: Dict, store_name: str):
+        key = (store_name, category['url'])
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                self._cache_category(category, store_name, self.scrape_category(category['url'], store_name))
+            except Exception as e:
+                pass
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
     def run_single_scan(self) -> Dict:
         """Ejecuta un escaneo completo de todas las tiendas"""
+        if self.async_scan:
+            return self._run_async(self.run_single_scan_async())
+        return self.run_single_scan_sequential()
+    
+    def run_single_scan_sequential(self) -> Dict:
+        """Escaneo tienda por tienda con peticiones bloqueantes"""
         scan_start = datetime.now()
         self.total_scans += 1
         
         results = {}
-        total_products = 0
-        all_products = []
-        stores_scanned = 0
         
         for store_name in self.stores.keys():
             try:
                 products = self.scrape_store(store_name)
                 if products:
                     results[store_name] = products
-                    total_products += len(products)
-                    all_products.extend(products)
-                    stores_scanned += 1
-                    
-                    # Guardar productos en DB y enviar notificaciones
-                    for product in products:
-                        self.save_product_to_db(product)
-                        self.send_telegram_alert(product)
                 
                 # Pausa entre tiendas
                 time.sleep(2)
@@ -624,6 +768,142 @@ class DescuentosGO:
             except Exception as e:
                 continue
         
+        # Guardar productos en DB (una transacción por escaneo) y enviar notificaciones
+        self.store_products([product for products in results.values() for product in products])
+        
+        self._finish_scan(scan_start, results)
+        return results
+    
+    async def run_single_scan_async(self) -> Dict:
+        """Escaneo en pipeline: descarga -> parseo -> escritura, conectadas por colas acotadas"""
+        scan_start = datetime.now()
+        self.total_scans += 1
+        loop = asyncio.get_running_loop()
+        
+        # Trabajo pendiente: todas las categorías habilitadas de todas las tiendas
+        fetch_queue = asyncio.Queue()
+        for store_name, store_config in self.stores.items():
+            for category in store_config['categories']:
+                if category.get('enabled', True):
+                    fetch_queue.put_nowait((store_name, category))
+        
+        # Colas acotadas: si el parseo o la escritura se atrasan, las etapas anteriores esperan
+        parse_queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        write_queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        results = {}
+        
+        async def fetch_stage():
+            while True:
+                try:
+                    store_name, category = fetch_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # Stale-while-revalidate, igual que scrape_category_cached: lo cacheado no se descarga
+                products = self.cached_category_products(category, store_name)
+                if products is not None:
+                    if products:
+                        await write_queue.put((store_name, products))
+                    continue
+                page = await self.fetch_page_async(category['url'], store_name)
+                if page is not None:
+                    await parse_queue.put((store_name, category, page))
+        
+        async def parse_stage(executor):
+            while True:
+                item = await parse_queue.get()
+                if item is None:
+                    return
+                store_name, category, page = item
+                try:
+                    products = await asyncio.to_thread(self.parsed_cache.get, page.content_hash, store_name)
+                    if products is None:
+                        products = await executor.parse(page.body, store_name)
+                        await asyncio.to_thread(self.parsed_cache.set, page.content_hash, store_name, products)
+                except Exception as e:
+                    continue
+                self._cache_category(category, store_name, products)
+                if products:
+                    await write_queue.put((store_name, products))
+        
+        async def write_stage():
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    return
+                store_name, products = item
+                results.setdefault(store_name, []).extend(products)
+        
+        executor = self.get_parse_executor()
+        fetchers = [asyncio.create_task(fetch_stage()) for _ in range(SCAN_FETCH_WORKERS)]
+        parsers = [asyncio.create_task(parse_stage(executor)) for _ in range(executor.max_workers)]
+        writer = asyncio.create_task(write_stage())
+        
+        await asyncio.gather(*fetchers, return_exceptions=True)
+        for _ in parsers:
+            await parse_queue.put(None)
+        await asyncio.gather(*parsers, return_exceptions=True)
+        await write_queue.put(None)
+        await writer
+        
+        # Mantener el orden de tiendas del escaneo secuencial
+        results = {store_name: results[store_name] for store_name in self.stores if store_name in results}
+        
+        # Una sola transacción para todo el escaneo; SQLite y Telegram se atienden fuera del event loop
+        all_products = [product for products in results.values() for product in products]
+        await loop.run_in_executor(None, self.store_products, all_products)
+        self._finish_scan(scan_start, results)
+        return results
+    
+    async def fetch_page_async(self, url: str, store_name: str) -> Optional[PageResult]:
+        """Versión asíncrona de fetch_page sobre el cliente compartido"""
+        try:
+            page = await self.helper.fetch_page(url, headers=dict(self.headers))
+            if page.not_modified and await asyncio.to_thread(self.parsed_cache.get, page.content_hash, store_name) is None:
+                # 304 sin lista parseada guardada: descargar el cuerpo completo
+                page = await self.helper.fetch_page(url, headers=dict(self.headers), use_validators=False)
+            return page
+        except Exception as e:
+            return None
+    
+    def seed_change_detector(self):
+        """Carga en el detector de cambios el último precio guardado de cada producto"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute(
+                'SELECT hash_id, precio_actual, descuento_porcentaje, fecha_actualizacion FROM productos'
+            ).fetchall()
+            conn.close()
+            self.change_detector.seed(
+                (hash_id, make_fingerprint(price, discount), self._parse_db_time(updated_at))
+                for hash_id, price, discount, updated_at in rows
+            )
+        except Exception as e:
+            pass
+    
+    @staticmethod
+    def _parse_db_time(value) -> Optional[float]:
+        """fecha_actualizacion (ISO o CURRENT_TIMESTAMP) como epoch; None si no se puede leer"""
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+    
+    def store_products(self, products: List[Dict]):
+        """Guarda en DB y notifica solo los productos nuevos o con cambio de precio/descuento"""
+        changes = self.change_detector.diff(products)
+        updated = changes.updated
+        if (updated or changes.touch) and self.save_products_to_db(updated, changes.touch):
+            self.change_detector.commit(updated + changes.touch)
+        self.last_scan_changes = {'new': len(changes.new), 'changed': len(changes.changed), 'unchanged': changes.unchanged}
+        for product in updated:
+            self.send_telegram_alert(product)
+    
+    def _finish_scan(self, scan_start: datetime, results: Dict[str, List[Dict]]):
+        """Guarda el JSON, registra el log del escaneo y actualiza contadores"""
+        all_products = [product for products in results.values() for product in products]
+        total_products = len(all_products)
+        stores_scanned = len(results)
+        
         # Guardar en JSON
         if all_products:
             self.save_to_json(all_products)
@@ -636,8 +916,28 @@ class DescuentosGO:
         
         self.total_products_found += total_products
         self.last_scan_time = scan_end
-        
-        return results
+    
+    def get_parse_executor(self) -> ParseExecutor:
+        """Pool de parseo del scanner: se crea una vez y vive hasta close_scan_loop"""
+        if self._parse_executor is None:
+            self._parse_executor = ParseExecutor(parse_store_html, self.parse_backend, self.parse_workers)
+        return self._parse_executor
+    
+    def _run_async(self, coro):
+        """Ejecuta una corrutina en el event loop del scanner (se reutiliza entre escaneos)"""
+        if self._scan_loop is None or self._scan_loop.is_closed():
+            self._scan_loop = asyncio.new_event_loop()
+        return self._scan_loop.run_until_complete(coro)
+    
+    def close_scan_loop(self):
+        """Cierra el pool de conexiones, los workers de parseo y el event loop del escaneo asíncrono"""
+        if self._scan_loop is not None and not self._scan_loop.is_closed():
+            self._scan_loop.run_until_complete(close_clients())
+            self._scan_loop.close()
+        self._scan_loop = None
+        if self._parse_executor is not None:
+            self._parse_executor.shutdown()
+            self._parse_executor = None
     
     def log_scan(self, scan_number: int, start_time: datetime, end_time: datetime, 
                 products_found: int, stores_scanned: int, duration: int):
@@ -691,6 +991,9 @@ class DescuentosGO:
             except Exception as e:
                 print(f"❌ Error en escaneo: {e}")
                 time.sleep(60)  # Esperar 1 minuto en caso de error
+        
+        # El loop del escaneo pertenece a este hilo: se cierra aquí al detener el scanner
+        self.close_scan_loop()
     
     def start_scanner(self):
         """Inicia el scanner automático"""
@@ -841,6 +1144,7 @@ class DescuentosGO:
             'total_scans': self.total_scans,
             'total_products_found': self.total_products_found,
             'last_scan_time': self.last_scan_time,
+            'last_scan_changes': self.last_scan_changes,
             'telegram_notifications': self.telegram_config['notifications_sent'],
             'enabled_categories': self.get_enabled_categories_count()
         }
@@ -1256,6 +1560,15 @@ class DescuentosGO:
         """Limpia la pantalla"""
         os.system('cls' if os.name == 'nt' else 'clear')
 
+_parser = None
+
+def parse_store_html(html, store_name: str) -> List[Dict]:
+    """Punto de entrada de los workers de parseo: HTML crudo + tienda -> productos"""
+    global _parser
+    if _parser is None:
+        _parser = DescuentosGO(parser_only=True)
+    return _parser.extract_products_from_html(html, store_name)
+
 def main():
     """Función principal"""
     try:
@@ -1277,4 +1590,5 @@ def main():
         input("Presiona Enter para salir...")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necesario para el pool de parseo en el ejecutable
     main() 
\ No newline at end of file
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API de ofertas
+Levanta api.py con un deals.json de prueba y mide latencias p50/p99 con muchos clientes concurrentes
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_FILE = os.path.join(ROOT_DIR, 'data', 'fixtures', 'deals.json')
+
+# Consultas que simulan el panel: listado completo, páginas filtradas y búsquedas
+SEARCH_QUERIES = ['notebook', 'samsung', 'camara', 'sillon', 'nike', 'cafetera', 'colchon rosen', 'xiaomi note']
+STORES = ['paris', 'ripley', 'hites', 'sodimac', 'falabella']
+
+def prepare_deals_file(directory: str, fixture: str, multiply: int) -> int:
+    """Copia el fixture (repetido `multiply` veces) como deals.json del directorio de trabajo"""
+    with open(fixture, 'r', encoding='utf-8') as f:
+        base_deals = json.load(f)
+
+    deals = []
+    for copy in range(multiply):
+        for deal in base_deals:
+            deal = dict(deal)
+            if copy:
+                deal['name'] = f"{deal['name']} #{copy}"
+                deal['product_url'] = f"{deal['product_url']}-{copy}"
+            deals.append(deal)
+
+    with open(os.path.join(directory, 'deals.json'), 'w', encoding='utf-8') as f:
+        json.dump(deals, f, indent=4, ensure_ascii=False)
+    return len(deals)
+
+class KeepAliveClient:
+    """Cliente HTTP/1.1 mínimo sobre una conexión persistente
+
+    httpx con cientos de tareas sobre un mismo pool acaba midiendo su propia contención;
+    una conexión por cliente simulado deja la medición en el servidor.
+    """
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def get(self, path: str, params: Optional[Dict] = None,
+                  headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        target = f"{path}?{urlencode(params)}" if params else path
+        lines = [f"GET {target} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        try:
+            head = await self._reader.readuntil(b'\r\n\r\n')
+            status_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+            response_headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+            status = int(status_line.split()[1])
+            length = int(response_headers.get('content-length', 0))
+            body = await self._reader.readexactly(length) if length else b''
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, body
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+def start_server(directory: str, port: int) -> subprocess.Popen:
+    """Arranca uvicorn con api:app usando `directory` como directorio de trabajo"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        cwd=directory, env=env
+    )
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    client = KeepAliveClient(base_url)
+    while time.monotonic() < deadline:
+        try:
+            status, _, _ = await client.get('/api/deals', {'limit': 1})
+            await client.close()
+            if status == 200:
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"La API no respondió en {timeout:.0f}s")
+
+def pick_request(rng: random.Random, etags: Dict[str, str]) -> tuple:
+    """(nombre, ruta, parámetros, cabeceras) de la próxima petición"""
+    roll = rng.random()
+    if roll < 0.3:
+        headers = {'If-None-Match': etags['deals']} if etags.get('deals') and rng.random() < 0.5 else {}
+        return 'deals', '/api/deals', {}, headers
+    if roll < 0.6:
+        params = {'store': rng.choice(STORES), 'min_discount': rng.choice([70, 80, 90]), 'limit': 50}
+        return 'deals_filtrado', '/api/deals', params, {}
+    return 'search', '/api/search', {'query': rng.choice(SEARCH_QUERIES)}, {}
+
+async def run_client(base_url: str, requests_per_client: int, seed: int,
+                     etags: Dict[str, str], latencies: Dict[str, List[float]], errors: List[str]):
+    rng = random.Random(seed)
+    client = KeepAliveClient(base_url)
+    try:
+        for _ in range(requests_per_client):
+            name, path, params, headers = pick_request(rng, etags)
+            start = time.perf_counter()
+            try:
+                status, response_headers, _ = await client.get(path, params, headers)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                errors.append(f"{name}: {e!r}")
+                continue
+            elapsed = time.perf_counter() - start
+            if status not in (200, 304):
+                errors.append(f"{name}: HTTP {status}")
+                continue
+            if name == 'deals' and status == 200:
+                etags['deals'] = response_headers.get('etag', '')
+            latencies.setdefault(name, []).append(elapsed)
+            latencies.setdefault('total', []).append(elapsed)
+    finally:
+        await client.close()
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[position]
+
+async def run_load(base_url: str, clients: int, requests_per_client: int) -> tuple:
+    latencies: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    etags: Dict[str, str] = {}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_client(base_url, requests_per_client, seed, etags, latencies, errors)
+        for seed in range(clients)
+    ])
+    duration = time.perf_counter() - start
+    return latencies, errors, duration
+
+def print_report(latencies: Dict[str, List[float]], errors: List[str], duration: float, clients: int, deals: Optional[int]):
+    total = len(latencies.get('total', []))
+    print(f"\n📊 Prueba de carga: {clients} clientes concurrentes" + (f", {deals} ofertas" if deals else ""))
+    print("=" * 72)
+    print(f"{'Endpoint':<16} {'Peticiones':>10} {'p50 ms':>10} {'p99 ms':>10} {'máx ms':>10}")
+    print("-" * 72)
+    for name in sorted(latencies, key=lambda key: key == 'total'):
+        values = latencies[name]
+        print(
+            f"{name:<16} {len(values):>10} {percentile(values, 50) * 1000:>10.2f} "
+            f"{percentile(values, 99) * 1000:>10.2f} {max(values) * 1000:>10.2f}"
+        )
+    print("=" * 72)
+    print(f"⏱️  {total} peticiones en {duration:.2f}s ({total / duration:.0f} req/s)")
+    if errors:
+        print(f"❌ {len(errors)} errores (primero: {errors[0]})")
+    else:
+        print("✅ Sin errores")
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de api.py (latencias p50/p99)')
+    parser.add_argument('--clients', type=int, default=100, help='Clientes concurrentes')
+    parser.add_argument('--requests', type=int, default=50, help='Peticiones por cliente')
+    parser.add_argument('--fixture', default=FIXTURE_FILE, help='deals.json de prueba')
+    parser.add_argument('--multiply', type=int, default=10, help='Repeticiones del fixture (tamaño del catálogo)')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto para la API de prueba')
+    parser.add_argument('--url', help='Medir una API ya levantada en lugar de arrancar una')
+    args = parser.parse_args()
+
+    if args.url:
+        latencies, errors, duration = asyncio.run(run_load(args.url.rstrip('/'), args.clients, args.requests))
+        print_report(latencies, errors, duration, args.clients, None)
+        return 1 if errors else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        deals = prepare_deals_file(directory, args.fixture, args.multiply)
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(directory, args.port)
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            latencies, errors, duration = asyncio.run(run_load(base_url, args.clients, args.requests))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(latencies, errors, duration, args.clients, deals)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
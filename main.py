@@ -10,6 +10,7 @@ from scrapers.paris_scraper import ParisScraper
 from scrapers.ripley_scraper import RipleyScraper
 from scrapers.hites_scraper import HitesScraper
 from scrapers.sodimac_scraper import SodimacScraper
+from utils.http_client import close_clients
 
 # --- Configuración ---
 LOG_DIR = 'logs'
@@ -68,8 +69,11 @@ def filter_deals(products):
 
 def save_deals_to_json(deals):
     """Guarda las ofertas en un archivo JSON."""
-    with open(DEALS_FILE, 'w', encoding='utf-8') as f:
+    # Escribir a un temporal y reemplazar: la API nunca lee un archivo a medio escribir
+    tmp_file = f"{DEALS_FILE}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         json.dump(deals, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, DEALS_FILE)
     logger.info(f"{len(deals)} ofertas guardadas en {DEALS_FILE}")
 
 async def send_telegram_notification(deals):
@@ -98,14 +102,20 @@ async def main():
     """Función principal que orquesta el proceso de scraping."""
     logger.info("--- Iniciando Proceso de Scraping de Ofertas ---")
     
-    products = await scrape_all_stores()
-    deals = filter_deals(products)
-    
-    if deals:
-        save_deals_to_json(deals)
-        await send_telegram_notification(deals)
-    else:
-        logger.info("No se encontraron ofertas que cumplan con el criterio.")
+    try:
+        products = await scrape_all_stores()
+        deals = filter_deals(products)
+        
+        if deals:
+            save_deals_to_json(deals)
+            await send_telegram_notification(deals)
+        else:
+            logger.info("No se encontraron ofertas que cumplan con el criterio.")
+    finally:
+        # Los refrescos de cache en segundo plano usan el pool: dejarlos terminar antes de cerrarlo
+        await asyncio.gather(*(scraper.wait_for_refreshes() for scraper in SCRAPERS.values()))
+        # Cerrar el pool de conexiones compartido
+        await close_clients()
         
     logger.info("--- Proceso de Scraping de Ofertas Finalizado ---")
 
@@ -6,6 +6,7 @@ Interfaz principal con todas las funcionalidades
 
 import os
 import sys
+import multiprocessing
 from datetime import datetime
 from typing import List, Dict
 
@@ -325,4 +326,5 @@ def main():
         input("Presiona Enter para salir...")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
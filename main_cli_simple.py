@@ -6,6 +6,7 @@ Versión optimizada con funciones esenciales y 12 tiendas chilenas
 
 import os
 import sys
+import multiprocessing
 from datetime import datetime
 
 # Agregar el directorio actual al path para importar módulos
@@ -206,4 +207,5 @@ def main():
         input("Presiona Enter para salir...")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
+from urllib.parse import urlparse
 from utils.helpers import ScrapingHelper
-from config.settings import STORES_CONFIG
+from utils.conditional_get import ParsedProductCache
+from utils.cache_manager import get_cache_manager
+from config.settings import STORES_CONFIG, CACHE_CONFIG
 
 class BaseScraper:
     def __init__(self, store_name):
@@ -9,6 +13,9 @@ class BaseScraper:
         self.store_config = STORES_CONFIG.get(store_name, {})
         self.logger = logging.getLogger(self.__class__.__name__)
         self.helper = ScrapingHelper()
+        self.parsed_cache = ParsedProductCache(namespace='scrapers')
+        self.category_cache = get_cache_manager()
+        self._refresh_tasks = {}
 
     def get_base_url(self):
         return self.store_config.get('base_url')
@@ -26,5 +33,88 @@ class BaseScraper:
                 seen.add(identifier)
         return unique_products
 
+    async def fetch_products(self, category_url, parse_content):
+        """Descarga la categoría con GET condicional y solo parsea si el contenido cambió"""
+        page = await self.helper.fetch_page(category_url)
+        # SQLite es bloqueante: las lecturas y escrituras del cache van a un hilo
+        products = await asyncio.to_thread(self.parsed_cache.get, page.content_hash, self.store_name)
+        if products is not None:
+            self.logger.info(f"Contenido sin cambios, reutilizando {len(products)} productos: {category_url}")
+            return products
+
+        if page.not_modified:
+            # 304 pero sin lista parseada guardada: descargar el cuerpo completo
+            page = await self.helper.fetch_page(category_url, use_validators=False)
+        if not page.text:
+            return []
+
+        products = parse_content(page.text)
+        await asyncio.to_thread(self.parsed_cache.set, page.content_hash, self.store_name, products)
+        return products
+
+    def _category_name(self, category_url):
+        return urlparse(category_url).path.strip('/') or category_url
+
+    async def cached_category(self, category_url, load=None):
+        """Productos de la categoría con stale-while-revalidate
+
+        Dentro del TTL blando se sirve el cache; pasado ese plazo se sirve igual y se refresca
+        en segundo plano; solo sin cache (o pasado el TTL duro) se espera la descarga.
+        """
+        load = load or self.scrape_category
+        cached = self.category_cache.get_with_age(
+            self.store_name, self._category_name(category_url), category_url, CACHE_CONFIG['hard_ttl_hours']
+        )
+        if cached is not None:
+            products, age = cached
+            if age >= CACHE_CONFIG['soft_ttl_minutes'] * 60:
+                self._refresh_in_background(category_url, load)
+            return products
+
+        products = await load(category_url)
+        self._cache_category(category_url, products)
+        return products
+
+    def _cache_category(self, category_url, products):
+        # Una lista vacía suele ser un error de descarga: no reemplazar datos buenos con ella
+        if products:
+            self.category_cache.set(self.store_name, self._category_name(category_url), category_url, products)
+
+    def _refresh_in_background(self, category_url, load):
+        loop = asyncio.get_running_loop()
+        task = self._refresh_tasks.get(category_url)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        task = loop.create_task(self._refresh_category(category_url, load))
+        self._refresh_tasks[category_url] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(category_url, None))
+
+    async def _refresh_category(self, category_url, load):
+        try:
+            self._cache_category(category_url, await load(category_url))
+        except Exception as e:
+            self.logger.warning(f"Error refrescando categoría en segundo plano {category_url}: {e}")
+
+    async def wait_for_refreshes(self):
+        """Espera los refrescos en segundo plano pendientes (p. ej. antes de cerrar el event loop)"""
+        loop = asyncio.get_running_loop()
+        tasks = [task for task in self._refresh_tasks.values() if task.get_loop() is loop]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def scrape_categories(self):
+        """Scrapea todas las categorías en paralelo; el motor de peticiones limita el ritmo por host"""
+        results = await asyncio.gather(
+            *(self.cached_category(category_url) for category_url in self.get_categories()),
+            return_exceptions=True
+        )
+        all_products = []
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.error(f"Error en scraping de categoría: {result}")
+            else:
+                all_products.extend(result)
+        return self.remove_duplicates(all_products)
+
     async def scrape(self):
         raise NotImplementedError("El método 'scrape' debe ser implementado por las subclases.")
\ No newline at end of file
@@ -1,81 +1,79 @@
 # -*- coding: utf-8 -*-
 from .base_scraper import BaseScraper
 from urllib.parse import urljoin
-import time
-from selenium import webdriver
+import asyncio
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException
+from utils.structured_data import StructuredDataExtractor
+from utils.webdriver_pool import get_webdriver_pool
+
+PRODUCT_SELECTOR = '[data-pod-type="product"]'
 
 class FalabellaScraper(BaseScraper):
     def __init__(self):
         super().__init__('falabella')
-        self.driver = None
+        self.driver_pool = None
+        self.structured = StructuredDataExtractor(self.store_name, self.get_base_url())
 
-    def _setup_driver(self):
-        try:
-            chrome_options = Options()
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument(f'--user-agent={self.helper.get_random_user_agent()}')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.implicitly_wait(10)
-        except Exception as e:
-            self.logger.error(f"Error configurando Selenium para Falabella: {e}")
-            self.driver = None
+    def _get_driver_pool(self):
+        if self.driver_pool is None:
+            self.driver_pool = get_webdriver_pool()
+        return self.driver_pool
 
     async def scrape(self):
-        self._setup_driver()
-        if not self.driver:
-            return []
-
-        all_products = []
+        # Un solo cargador por categoría: el refresco en segundo plano también cae a Selenium.
+        # Las categorías con Selenium se renderizan a la vez, tantas como navegadores tenga el pool
+        results = await asyncio.gather(
+            *(self.cached_category(category_url, self.load_category) for category_url in self.get_categories())
+        )
+        all_products = [product for products in results for product in products]
+        return self.remove_duplicates(all_products)
+
+    async def load_category(self, category_url):
+        """Primero el JSON embebido (__NEXT_DATA__) por HTTP; Selenium solo si la página no lo trae"""
+        products = await self.scrape_category_structured(category_url)
+        if products:
+            return products
+        self.logger.info(f"Sin datos estructurados en {category_url}, usando Selenium")
+        return await self.scrape_category(category_url)
+
+    async def scrape_category_structured(self, category_url):
+        """Productos de la categoría desde el JSON de la página, sin renderizarla"""
+        self.logger.info(f"Scraping categoría de Falabella (datos estructurados): {category_url}")
         try:
-            for category_url in self.get_categories():
-                products = await self.scrape_category(category_url)
-                all_products.extend(products)
-        finally:
-            if self.driver:
-                self.driver.quit()
-        
-        return all_products
+            return await self.fetch_products(category_url, self.structured.extract)
+        except Exception as e:
+            self.logger.warning(f"Error leyendo datos estructurados de Falabella: {e}")
+            return []
 
     async def scrape_category(self, category_url):
         self.logger.info(f"Scraping categoría de Falabella: {category_url}")
         try:
-            self.driver.get(category_url)
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, '[data-pod-type="product"]'))
-            )
-            self._scroll_to_load_more()
-            products = self._extract_products_from_page()
+            # Selenium es bloqueante: cada categoría corre en un hilo con su propio navegador del pool
+            loop = asyncio.get_running_loop()
+            products = await loop.run_in_executor(None, self._render_category, category_url)
             return self.remove_duplicates(products)
         except Exception as e:
             self.logger.error(f"Error en scraping de categoría de Falabella: {e}")
             return []
 
-    def _scroll_to_load_more(self):
+    def _render_category(self, category_url):
+        pool = self._get_driver_pool()
+        with pool.driver() as driver:
+            if not pool.load(driver, category_url, PRODUCT_SELECTOR):
+                return []
+            self._scroll_to_load_more(driver)
+            return self._extract_products_from_page(driver)
+
+    def _scroll_to_load_more(self, driver):
         try:
-            last_height = self.driver.execute_script("return document.body.scrollHeight")
-            for _ in range(3):
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
-                if new_height == last_height:
-                    break
-                last_height = new_height
+            self._get_driver_pool().scroll_to_load_more(driver, PRODUCT_SELECTOR)
         except Exception as e:
             self.logger.warning(f"Error durante el scroll en Falabella: {e}")
 
-    def _extract_products_from_page(self):
+    def _extract_products_from_page(self, driver):
         products = []
-        product_elements = self.driver.find_elements(By.CSS_SELECTOR, '[data-pod-type="product"]')
+        product_elements = driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)
         for element in product_elements:
             product = self._parse_product_element(element)
             if product:
@@ -9,7 +9,7 @@ class LaPolarScraper(BaseScraper):
     async def scrape(self):
         all_products = []
         for category_url in self.get_categories():
-            products = await self.scrape_category(category_url)
+            products = await self.cached_category(category_url)
             all_products.extend(products)
         return self.remove_duplicates(all_products)
 
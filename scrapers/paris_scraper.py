@@ -1,38 +1,40 @@
 # -*- coding: utf-8 -*-
 from .base_scraper import BaseScraper
 from urllib.parse import urljoin
+from utils.structured_data import StructuredDataExtractor
 
 class ParisScraper(BaseScraper):
     def __init__(self):
         super().__init__('paris')
+        self.structured = StructuredDataExtractor(self.store_name, self.get_base_url())
 
     async def scrape(self):
-        all_products = []
-        for category_url in self.get_categories():
-            products = await self.scrape_category(category_url)
-            all_products.extend(products)
-        return self.remove_duplicates(all_products)
+        return await self.scrape_categories()
 
     async def scrape_category(self, category_url):
         self.logger.info(f"Scraping categoría de Paris: {category_url}")
         try:
-            content = await self.helper.make_request(category_url)
-            if not content:
-                return []
-
-            soup = self.helper.get_soup(content)
-            product_elements = soup.select('.product-item, .product-card, .product-grid-item')
-            
-            products = []
-            for element in product_elements:
-                product = self._parse_product_element(element)
-                if product:
-                    products.append(product)
-            return products
+            return await self.fetch_products(category_url, self._parse_page)
         except Exception as e:
             self.logger.error(f"Error en scraping de categoría de Paris: {e}")
             return []
 
+    def _parse_page(self, content):
+        # JSON embebido primero; el DOM solo si la página no trae datos estructurados
+        products = self.structured.extract(content)
+        if products:
+            return products
+
+        soup = self.helper.get_soup(content)
+        product_elements = soup.select('.product-item, .product-card, .product-grid-item')
+        
+        products = []
+        for element in product_elements:
+            product = self._parse_product_element(element)
+            if product:
+                products.append(product)
+        return products
+
     def _parse_product_element(self, element):
         try:
             name = self.helper.clean_text(element.select_one('.product-name, .product-title, .name').text)
@@ -8,32 +8,27 @@ class RipleyScraper(BaseScraper):
         super().__init__('ripley')
 
     async def scrape(self):
-        all_products = []
-        for category_url in self.get_categories():
-            products = await self.scrape_category(category_url)
-            all_products.extend(products)
-        return self.remove_duplicates(all_products)
+        return await self.scrape_categories()
 
     async def scrape_category(self, category_url):
         self.logger.info(f"Scraping categoría de Ripley: {category_url}")
         try:
-            content = await self.helper.make_request(category_url)
-            if not content:
-                return []
-
-            soup = self.helper.get_soup(content)
-            product_elements = soup.select('.product-item, .product-card, .catalog-item')
-            
-            products = []
-            for element in product_elements:
-                product = self._parse_product_element(element)
-                if product:
-                    products.append(product)
-            return products
+            return await self.fetch_products(category_url, self._parse_page)
         except Exception as e:
             self.logger.error(f"Error en scraping de categoría de Ripley: {e}")
             return []
 
+    def _parse_page(self, content):
+        soup = self.helper.get_soup(content)
+        product_elements = soup.select('.product-item, .product-card, .catalog-item')
+        
+        products = []
+        for element in product_elements:
+            product = self._parse_product_element(element)
+            if product:
+                products.append(product)
+        return products
+
     def _parse_product_element(self, element):
         try:
             name = self.helper.clean_text(element.select_one('.product-name, .product-title').text)
@@ -17,6 +17,9 @@ from tqdm import tqdm
 import colorama
 from colorama import Fore, Style
 import random
+import multiprocessing
+from utils.parse_executor import ParseExecutor
+from utils.fast_extractor import FastExtractor, LXML_AVAILABLE
 
 # Cargar variables de entorno
 try:
@@ -35,14 +38,46 @@ try:
 except ImportError:
     TELEGRAM_AVAILABLE = False
 
+# Selectores de contenedores de producto (se prueban en orden)
+PRODUCT_SELECTORS = {
+    'paris': [
+        '.product-item', '.product-card', '.product-grid-item',
+        '.product-tile', '.product-container', '.product-box',
+        '.product', '.item', '.card', '.producto',
+        '[data-product]', '[class*="product"]', '[class*="item"]',
+        '[class*="card"]', '.product-grid', '.product-list'
+    ]
+}
+DEFAULT_PRODUCT_SELECTORS = [
+    '.pod-item', '.pod', '.product-item', '.product-card',
+    '.product-grid-item', '.product-tile', '.product-container',
+    '.product-box', '.product', '.item', '.card',
+    '[class*="product"]', '[class*="item"]', '[class*="card"]'
+]
+NAME_SELECTORS = [
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    '.title', '.name', '.product-name', '.product-title',
+    '.item-title', '.card-title', '.product-name',
+    '[data-product-name]', '[title]', 'a[title]'
+]
+DISCOUNT_SELECTORS = [
+    '.discount', '.discount-badge', '.discount-percentage',
+    '.discount-label', '.sale-badge', '.discount-tag',
+    '[class*="discount"]', '[class*="sale"]'
+]
+PRICE_TEXT_PATTERN = re.compile(r'\$\s*\d{1,3}(?:\.\d{3})*(?:,\d{2})?')
+
 class ScrapingAvanzado:
-    def __init__(self):
+    def __init__(self, parser_only: bool = False):
         self.data_dir = "data"
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         
-        # Configurar logging
-        self.setup_logging()
+        # Configurar logging (los workers de parseo no crean archivo de log propio)
+        if parser_only:
+            self.logger = logging.getLogger(__name__)
+        else:
+            self.setup_logging()
         
         # Headers más realistas para evitar detección
         self.headers = {
@@ -91,6 +126,19 @@ class ScrapingAvanzado:
             }
         }
         
+        # Motor de extracción: lxml con selectores compilados una vez; BeautifulSoup si falta lxml
+        self.html_engine = 'lxml' if LXML_AVAILABLE else 'bs4'
+        self.fast_extractor = None
+        if LXML_AVAILABLE:
+            self.fast_extractor = FastExtractor(
+                PRODUCT_SELECTORS, DEFAULT_PRODUCT_SELECTORS,
+                field_selectors=NAME_SELECTORS + DISCOUNT_SELECTORS + ['a', 'img']
+            )
+        
+        # Los workers de parseo solo necesitan la configuración de tiendas
+        if parser_only:
+            return
+        
         # Configuración de timeouts y reintentos
         self.timeout = 30
         self.max_retries = 3
@@ -99,6 +147,9 @@ class ScrapingAvanzado:
         # Data manager para almacenamiento
         self.data_manager = None
         
+        # Pool de procesos para el parseo de HTML (se crea al primer uso)
+        self.parse_executor = ParseExecutor(parse_store_html)
+        
         # Sistema de notificaciones Telegram
         if TELEGRAM_AVAILABLE:
             self.telegram = TelegramNotifier()
@@ -180,37 +231,24 @@ class ScrapingAvanzado:
             return []
         
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
             products = []
             
-            # Técnica 1: Buscar elementos con datos de productos
-            product_elements = []
-            
-            # Selectores optimizados para cada tienda
-            if store_name == 'paris':
-                selectors = [
-                    '.product-item', '.product-card', '.product-grid-item',
-                    '.product-tile', '.product-container', '.product-box',
-                    '.product', '.item', '.card', '.producto',
-                    '[data-product]', '[class*="product"]', '[class*="item"]',
-                    '[class*="card"]', '.product-grid', '.product-list'
-                ]
-            else:  # falabella
-                selectors = [
-                    '.pod-item', '.pod', '.product-item', '.product-card',
-                    '.product-grid-item', '.product-tile', '.product-container',
-                    '.product-box', '.product', '.item', '.card',
-                    '[class*="product"]', '[class*="item"]', '[class*="card"]'
-                ]
+            # Técnica 1: Buscar elementos con datos de productos (selectores optimizados para cada tienda)
+            if self.html_engine == 'lxml':
+                document = self.fast_extractor.parse(html_content)
+                selector, product_elements = self.fast_extractor.select_products(document, store_name)
+            else:
+                soup = BeautifulSoup(html_content, 'html.parser')
+                selector, product_elements = None, []
+                for candidate in PRODUCT_SELECTORS.get(store_name, DEFAULT_PRODUCT_SELECTORS):
+                    elements = soup.select(candidate)
+                    if elements:
+                        selector, product_elements = candidate, elements
+                        break
             
-            # Buscar elementos con selectores específicos
-            for selector in selectors:
-                elements = soup.select(selector)
-                if elements:
-                    self.logger.info(f"✅ Encontrados {len(elements)} elementos con selector: {selector}")
-                    print(f"{Fore.GREEN}✅ Encontrados {len(elements)} elementos con selector: {selector}{Style.RESET_ALL}")
-                    product_elements.extend(elements)
-                    break
+            if product_elements:
+                self.logger.info(f"✅ Encontrados {len(product_elements)} elementos con selector: {selector}")
+                print(f"{Fore.GREEN}✅ Encontrados {len(product_elements)} elementos con selector: {selector}{Style.RESET_ALL}")
             
             # Técnica 2: Si no encontramos con selectores específicos, buscar por patrones
             if not product_elements:
@@ -218,13 +256,13 @@ class ScrapingAvanzado:
                 print(f"{Fore.YELLOW}🔍 Buscando productos por patrones de precio...{Style.RESET_ALL}")
                 
                 # Buscar elementos que contengan precios
-                price_pattern = re.compile(r'\$\s*\d{1,3}(?:\.\d{3})*(?:,\d{2})?')
-                elements_with_prices = soup.find_all(text=price_pattern)
-                
-                for element in elements_with_prices:
-                    parent = element.parent
-                    if parent and parent.name not in ['script', 'style']:
-                        product_elements.append(parent)
+                if self.html_engine == 'lxml':
+                    product_elements = self.fast_extractor.find_text_parents(document, PRICE_TEXT_PATTERN)
+                else:
+                    for element in soup.find_all(string=PRICE_TEXT_PATTERN):
+                        parent = element.parent
+                        if parent and parent.name not in ['script', 'style']:
+                            product_elements.append(parent)
             
             # Extraer información de cada elemento con barra de progreso
             self.logger.info(f"🔄 Procesando {len(product_elements)} elementos encontrados...")
@@ -287,14 +325,7 @@ class ScrapingAvanzado:
     
     def extract_product_name(self, element, store_name):
         """Extrae el nombre del producto"""
-        name_selectors = [
-            'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-            '.title', '.name', '.product-name', '.product-title',
-            '.item-title', '.card-title', '.product-name',
-            '[data-product-name]', '[title]', 'a[title]'
-        ]
-        
-        for selector in name_selectors:
+        for selector in NAME_SELECTORS:
             try:
                 name_elem = element.select_one(selector)
                 if name_elem:
@@ -335,13 +366,7 @@ class ScrapingAvanzado:
     
     def extract_discount(self, element):
         """Extrae información de descuento"""
-        discount_selectors = [
-            '.discount', '.discount-badge', '.discount-percentage',
-            '.discount-label', '.sale-badge', '.discount-tag',
-            '[class*="discount"]', '[class*="sale"]'
-        ]
-        
-        for selector in discount_selectors:
+        for selector in DISCOUNT_SELECTORS:
             try:
                 discount_elem = element.select_one(selector)
                 if discount_elem:
@@ -394,6 +419,8 @@ class ScrapingAvanzado:
         self.logger.info(f"🏪 Iniciando scraping de {store_config['name']}")
         print(f"{Fore.CYAN}\n🏪 Scraping {store_config['name']} con técnicas avanzadas...{Style.RESET_ALL}")
         
+        # El parseo corre en el pool de procesos mientras se descarga la siguiente categoría
+        pending = []
         for category in tqdm(store_config['categories'], desc=f"Procesando categorías de {store_config['name']}", unit="categoría"):
             try:
                 self.logger.info(f"📂 Procesando categoría: {category['name']}")
@@ -404,15 +431,7 @@ class ScrapingAvanzado:
                     self.logger.warning(f"⚠️ No se pudo cargar contenido de {category['name']}")
                     continue
                 
-                products = self.extract_products_from_html(html_content, store_name)
-                
-                if products:
-                    all_products.extend(products)
-                    self.logger.info(f"✅ {len(products)} productos encontrados en {category['name']}")
-                    print(f"{Fore.GREEN}    📦 {len(products)} productos encontrados{Style.RESET_ALL}")
-                else:
-                    self.logger.warning(f"⚠️ No se encontraron productos en {category['name']}")
-                    print(f"{Fore.YELLOW}    ⚠️  No se encontraron productos en esta categoría{Style.RESET_ALL}")
+                pending.append((category, self.parse_executor.submit(html_content, store_name)))
                 
                 # Delay entre categorías para evitar detección
                 time.sleep(random.uniform(1.5, 3.0))
@@ -422,6 +441,22 @@ class ScrapingAvanzado:
                 print(f"{Fore.RED}    ❌ Error en categoría {category['name']}: {e}{Style.RESET_ALL}")
                 continue
         
+        for category, future in pending:
+            try:
+                products = future.result()
+            except Exception as e:
+                self.logger.error(f"❌ Error en categoría {category['name']}: {e}")
+                print(f"{Fore.RED}    ❌ Error en categoría {category['name']}: {e}{Style.RESET_ALL}")
+                continue
+            
+            if products:
+                all_products.extend(products)
+                self.logger.info(f"✅ {len(products)} productos encontrados en {category['name']}")
+                print(f"{Fore.GREEN}    📦 {len(products)} productos encontrados{Style.RESET_ALL}")
+            else:
+                self.logger.warning(f"⚠️ No se encontraron productos en {category['name']}")
+                print(f"{Fore.YELLOW}    ⚠️  No se encontraron productos en esta categoría{Style.RESET_ALL}")
+        
         self.logger.info(f"✅ Scraping completado de {store_config['name']}: {len(all_products)} productos totales")
         print(f"{Fore.GREEN}✅ Scraping completado de {store_config['name']}: {len(all_products)} productos totales{Style.RESET_ALL}")
         
@@ -440,9 +475,7 @@ class ScrapingAvanzado:
             # Guardar en base de datos si hay data manager
             saved_count = 0
             if hasattr(self, 'data_manager') and self.data_manager:
-                for product in tqdm(products, desc="Guardando en base de datos", unit="producto"):
-                    if self.data_manager.save_product_to_db(product):
-                        saved_count += 1
+                saved_count = self.data_manager.save_products_to_db(products)
                 
                 if saved_count > 0:
                     self.logger.info(f"✅ {saved_count} productos guardados en base de datos")
@@ -611,6 +644,8 @@ class ScrapingAvanzado:
                 print(f"{Fore.RED}❌ Error procesando tienda {store_name}: {e}{Style.RESET_ALL}")
                 failed_stores += 1
         
+        self.parse_executor.shutdown()
+        
         end_time = time.time()
         execution_time = end_time - start_time
         
@@ -642,9 +677,19 @@ class ScrapingAvanzado:
             'execution_time': execution_time
         }
 
+_parser = None
+
+def parse_store_html(html, store_name: str) -> List[Dict]:
+    """Punto de entrada de los workers de parseo: HTML crudo + tienda -> productos"""
+    global _parser
+    if _parser is None:
+        _parser = ScrapingAvanzado(parser_only=True)
+    return _parser.extract_products_from_html(html, store_name)
+
 def main():
     scraper = ScrapingAvanzado()
     scraper.run_scraping()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
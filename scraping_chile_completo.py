@@ -11,12 +11,12 @@ import requests
 from datetime import datetime
 from bs4 import BeautifulSoup
 import re
+import multiprocessing
+from utils.parse_executor import ParseExecutor
 
 class ScrapingChileCompleto:
-    def __init__(self):
+    def __init__(self, parser_only=False):
         self.data_dir = "data"
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
         
         # Headers más realistas para evitar detección
         self.headers = {
@@ -142,6 +142,16 @@ class ScrapingChileCompleto:
                 ]
             }
         }
+        
+        # Los workers de parseo solo necesitan la configuración de tiendas
+        if parser_only:
+            return
+        
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        
+        # Pool de procesos para el parseo de HTML (se crea al primer uso)
+        self.parse_executor = ParseExecutor(parse_store_html)
     
     def get_page_content(self, url):
         """Obtiene el contenido de una página web con headers mejorados"""
@@ -391,20 +401,29 @@ class ScrapingChileCompleto:
         
         print(f"\n🏪 Scraping {store_config['name']}...")
         
+        # El parseo corre en el pool de procesos mientras se descarga la siguiente categoría
+        pending = []
         for category in store_config['categories']:
             print(f"  📂 Categoría: {category['name']}")
             
             html_content = self.get_page_content(category['url'])
             if html_content:
-                products = self.extract_products_from_html(html_content, store_name)
-                all_products.extend(products)
-                print(f"    ✅ {len(products)} productos encontrados")
+                pending.append((category, self.parse_executor.submit(html_content, store_name)))
                 
                 # Pausa entre categorías para evitar bloqueos
                 time.sleep(2)
             else:
                 print(f"    ❌ Error cargando categoría")
         
+        for category, future in pending:
+            try:
+                products = future.result()
+            except Exception as e:
+                print(f"    ❌ Error procesando {category['name']}: {e}")
+                continue
+            all_products.extend(products)
+            print(f"    ✅ {category['name']}: {len(products)} productos encontrados")
+        
         return all_products
     
     def save_products(self, products, store_name):
@@ -414,28 +433,25 @@ class ScrapingChileCompleto:
         
         try:
             # Guardar en base de datos si hay data manager
-            saved_count = 0
-            for product in products:
-                if hasattr(self, 'data_manager') and self.data_manager:
-                    if self.data_manager.save_product_to_db(product):
-                        saved_count += 1
-                else:
-                    # Fallback: guardar en JSON
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"{self.data_dir}/{store_name}_products_{timestamp}.json"
-                    
-                    data = {
-                        'store': store_name,
-                        'timestamp': datetime.now().isoformat(),
-                        'total_products': len(products),
-                        'products': products
-                    }
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    
-                    print(f"✅ {len(products)} productos guardados en {filename}")
-                    return filename
+            if hasattr(self, 'data_manager') and self.data_manager:
+                saved_count = self.data_manager.save_products_to_db(products)
+            else:
+                # Fallback: guardar en JSON
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"{self.data_dir}/{store_name}_products_{timestamp}.json"
+                
+                data = {
+                    'store': store_name,
+                    'timestamp': datetime.now().isoformat(),
+                    'total_products': len(products),
+                    'products': products
+                }
+                
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                
+                print(f"✅ {len(products)} productos guardados en {filename}")
+                return filename
             
             if saved_count > 0:
                 print(f"✅ {saved_count} productos guardados en base de datos")
@@ -476,6 +492,8 @@ class ScrapingChileCompleto:
                 # Pausa entre tiendas
                 time.sleep(3)
         
+        self.parse_executor.shutdown()
+        
         print("\n" + "=" * 50)
         print(f"✅ Scraping completado!")
         print(f"📦 Total de productos encontrados: {total_products}")
@@ -483,6 +501,15 @@ class ScrapingChileCompleto:
         
         return results
 
+_parser = None
+
+def parse_store_html(html, store_name):
+    """Punto de entrada de los workers de parseo: HTML crudo + tienda -> productos"""
+    global _parser
+    if _parser is None:
+        _parser = ScrapingChileCompleto(parser_only=True)
+    return _parser.extract_products_from_html(html, store_name)
+
 def main():
     """Función principal para testing"""
     scraper = ScrapingChileCompleto()
@@ -494,4 +521,5 @@ def main():
             print(f"🏪 {store}: {len(products)} productos")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
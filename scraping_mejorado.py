@@ -8,12 +8,20 @@ import os
 import json
 import time
 from datetime import datetime
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from utils.webdriver_pool import get_webdriver_pool
+
+# Selectores de contenedores de producto (también se usan para esperar a que cargue la página)
+PRODUCT_SELECTORS = [
+    '.product-item', '.product-card', '.item', '.product',
+    '[data-product]', '.card', '.producto', '.product-grid-item',
+    '.product-tile', '.product-container', '.product-box',
+    '.product-grid', '.product-list-item', '.product-item-grid',
+    '.product', '.producto', '.item'
+]
 
 class ScrapingMejorado:
     def __init__(self):
@@ -45,18 +53,10 @@ class ScrapingMejorado:
         self.setup_driver()
     
     def setup_driver(self):
-        """Configura el driver de Chrome"""
+        """Toma un navegador del pool compartido (se reutiliza entre ejecuciones)"""
         try:
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # Ejecutar sin interfaz gráfica
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.implicitly_wait(10)
+            self.driver_pool = get_webdriver_pool()
+            self.driver = self.driver_pool.acquire()
             print("✅ Driver de Chrome configurado correctamente")
             
         except Exception as e:
@@ -71,16 +71,14 @@ class ScrapingMejorado:
         
         try:
             print(f"📡 Cargando: {url}")
-            self.driver.get(url)
             
-            # Esperar a que la página cargue completamente
-            time.sleep(5)
+            # Esperar a que aparezca algún producto (no una pausa fija)
+            product_selector = ', '.join(dict.fromkeys(PRODUCT_SELECTORS))
+            self.driver_pool.load(self.driver, url, product_selector)
             
-            # Scroll para cargar contenido dinámico
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(3)
+            # Scroll para cargar contenido dinámico mientras la página siga creciendo
+            self.driver_pool.scroll_to_load_more(self.driver, product_selector)
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(2)
             
             return self.driver.page_source
             
@@ -215,17 +213,9 @@ class ScrapingMejorado:
                     continue
                 
                 # Buscar productos con diferentes selectores
-                product_selectors = [
-                    '.product-item', '.product-card', '.item', '.product',
-                    '[data-product]', '.card', '.producto', '.product-grid-item',
-                    '.product-tile', '.product-container', '.product-box',
-                    '.product-grid', '.product-list-item', '.product-item-grid',
-                    '.product', '.producto', '.item'
-                ]
-                
                 products_found = []
                 
-                for selector in product_selectors:
+                for selector in PRODUCT_SELECTORS:
                     try:
                         elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                         if elements:
@@ -326,10 +316,11 @@ class ScrapingMejorado:
             print("💡 Revisa la carpeta 'data' para ver los resultados")
             
         finally:
-            # Cerrar el driver
+            # Devolver el navegador al pool (queda caliente para la próxima ejecución)
             if self.driver:
-                self.driver.quit()
-                print("🔒 Driver de Chrome cerrado")
+                self.driver_pool.release(self.driver)
+                self.driver = None
+                print("🔒 Driver de Chrome liberado")
 
 def main():
     scraper = ScrapingMejorado()
@@ -2,21 +2,135 @@
 """
 Sistema de Cache Inteligente para DescuentosGO
 Optimiza consultas y reduce tiempo de scraping
+Dos niveles: una LRU en memoria acotada por entradas y bytes, con vigencia por tienda,
+delante de SQLite, donde cada entrada se guarda por separado (JSON, sin pickle); la
+expiración se comprueba al leer y los contadores de aciertos se vuelcan a disco por lotes
 """
 
 import os
 import json
-import pickle
+import time
+import atexit
+import sqlite3
 import hashlib
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
 import logging
 
+from config.settings import CACHE_CONFIG
+
+# Volcado de contadores: cada tantos segundos o tantas consultas, lo que ocurra primero
+STATS_FLUSH_INTERVAL = 30.0
+STATS_FLUSH_EVERY = 100
+
+class MemoryCache:
+    """LRU en memoria con tope de entradas y de bytes, y vigencia por tienda"""
+    
+    def __init__(self, max_entries: int, max_bytes: int, default_ttl_hours: float,
+                 store_ttl_hours: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl_hours = default_ttl_hours
+        self.store_ttl_hours = store_ttl_hours or {}
+        
+        # clave -> (datos, tienda, creado_en, bytes); el final del OrderedDict es lo más reciente
+        self._entries: "OrderedDict[str, Tuple[List[Dict], str, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def ttl_seconds(self, store: str) -> float:
+        return self.store_ttl_hours.get(store, self.default_ttl_hours) * 3600
+    
+    def get(self, key: str, store: str, max_age_seconds: float) -> Optional[Tuple[List[Dict], float]]:
+        """(datos, creado_en) de la clave si siguen vigentes para la tienda y para quien consulta"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            data, entry_store, created_at, size = entry
+            age = now - created_at
+            if age >= self.ttl_seconds(entry_store):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if age >= max_age_seconds:
+                # Vencida solo para esta consulta; otra con más tolerancia aún puede usarla
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data, created_at
+    
+    def set(self, key: str, store: str, data: List[Dict], size: int, created_at: Optional[float] = None):
+        """Guarda la entrada y descarta las menos usadas hasta volver al presupuesto"""
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if created_at is not None and time.time() - created_at >= self.ttl_seconds(store):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, store, created_at or time.time(), size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+    
+    def _remove(self, key: str):
+        _, _, _, size = self._entries.pop(key)
+        self.bytes -= size
+    
+    def purge_expired(self, max_age_seconds: Optional[float] = None) -> int:
+        """Elimina las entradas vencidas (por tienda o más antiguas que `max_age_seconds`)"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                key for key, (_, store, created_at, _) in self._entries.items()
+                if now - created_at >= self.ttl_seconds(store)
+                or (max_age_seconds is not None and now - created_at > max_age_seconds)
+            ]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
 class CacheManager:
-    def __init__(self, cache_dir: str = "cache"):
+    def __init__(self, cache_dir: str = "cache", memory_max_entries: Optional[int] = None,
+                 memory_max_bytes: Optional[int] = None, store_ttl_hours: Optional[Dict[str, float]] = None):
         self.cache_dir = cache_dir
-        self.cache_file = os.path.join(cache_dir, "cache_data.pkl")
-        self.metadata_file = os.path.join(cache_dir, "cache_metadata.json")
+        self.db_path = os.path.join(cache_dir, "cache.db")
         
         # Crear directorio de cache si no existe
         if not os.path.exists(cache_dir):
@@ -25,142 +139,229 @@ class CacheManager:
         # Configurar logging
         self.logger = logging.getLogger(__name__)
         
-        # Cargar cache existente
-        self.cache_data = self._load_cache()
-        self.metadata = self._load_metadata()
-    
-    def _load_cache(self) -> Dict[str, Any]:
-        """Carga el cache desde archivo"""
-        try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'rb') as f:
-                    return pickle.load(f)
-        except Exception as e:
-            self.logger.warning(f"Error cargando cache: {e}")
-        return {}
-    
-    def _save_cache(self):
-        """Guarda el cache en archivo"""
-        try:
-            with open(self.cache_file, 'wb') as f:
-                pickle.dump(self.cache_data, f)
-        except Exception as e:
-            self.logger.error(f"Error guardando cache: {e}")
-    
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Carga metadata del cache"""
-        try:
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.logger.warning(f"Error cargando metadata: {e}")
-        return {"created": datetime.now().isoformat(), "hits": 0, "misses": 0}
-    
-    def _save_metadata(self):
-        """Guarda metadata del cache"""
-        try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            self.logger.error(f"Error guardando metadata: {e}")
+        # Nivel en memoria: evita SQLite y json.loads para las categorías consultadas seguido
+        self.memory = MemoryCache(
+            max_entries=memory_max_entries if memory_max_entries is not None else CACHE_CONFIG['memory_max_entries'],
+            max_bytes=memory_max_bytes if memory_max_bytes is not None else CACHE_CONFIG['memory_max_bytes'],
+            default_ttl_hours=CACHE_CONFIG['memory_ttl_hours'],
+            store_ttl_hours=store_ttl_hours if store_ttl_hours is not None else CACHE_CONFIG['store_ttl_hours']
+        )
+        
+        # Una conexión compartida; el lock la protege entre hilos del scraper
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_database()
+        
+        # Contadores pendientes de volcar
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush_stats)
+    
+    def _init_database(self):
+        """Crea las tablas del cache"""
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    store TEXT,
+                    category TEXT,
+                    url TEXT,
+                    data TEXT NOT NULL,
+                    count INTEGER,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_created ON cache_entries (created_at)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_metadata (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            self._conn.execute('''
+                INSERT OR IGNORE INTO cache_metadata (name, value)
+                VALUES ('created', ?), ('hits', '0'), ('misses', '0')
+            ''', (datetime.now().isoformat(),))
+            self._conn.commit()
     
     def _generate_key(self, store: str, category: str, url: str) -> str:
         """Genera una clave única para el cache"""
         content = f"{store}:{category}:{url}"
         return hashlib.md5(content.encode()).hexdigest()
     
+    def _record(self, hit: bool):
+        """Cuenta un acierto o fallo en memoria y vuelca si toca"""
+        with self._lock:
+            if hit:
+                self._pending_hits += 1
+            else:
+                self._pending_misses += 1
+            pending = self._pending_hits + self._pending_misses
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if pending >= STATS_FLUSH_EVERY or due:
+            self.flush_stats()
+    
+    def flush_stats(self):
+        """Suma los contadores pendientes a los guardados en disco"""
+        with self._lock:
+            hits, misses = self._pending_hits, self._pending_misses
+            self._pending_hits = self._pending_misses = 0
+            self._last_flush = time.monotonic()
+            if not hits and not misses:
+                return
+            try:
+                self._conn.execute(
+                    "UPDATE cache_metadata SET value = CAST(value AS INTEGER) + ? WHERE name = 'hits'", (hits,)
+                )
+                self._conn.execute(
+                    "UPDATE cache_metadata SET value = CAST(value AS INTEGER) + ? WHERE name = 'misses'", (misses,)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error guardando metadata: {e}")
+    
     def get(self, store: str, category: str, url: str, max_age_hours: int = 1) -> Optional[List[Dict]]:
         """Obtiene datos del cache si no han expirado"""
+        cached = self.get_with_age(store, category, url, max_age_hours)
+        return cached[0] if cached is not None else None
+    
+    def get_with_age(self, store: str, category: str, url: str,
+                     max_age_hours: float = 1) -> Optional[Tuple[List[Dict], float]]:
+        """Como `get`, pero devuelve (datos, antigüedad en segundos) para decidir si refrescar"""
         key = self._generate_key(store, category, url)
+        now = time.time()
+        cutoff = now - max_age_hours * 3600
         
-        if key in self.cache_data:
-            cached_item = self.cache_data[key]
-            cached_time = datetime.fromisoformat(cached_item['timestamp'])
-            
-            # Verificar si el cache no ha expirado
-            if datetime.now() - cached_time < timedelta(hours=max_age_hours):
-                self.metadata['hits'] += 1
-                self._save_metadata()
-                self.logger.info(f"✅ Cache hit para {store}/{category}")
-                return cached_item['data']
-            else:
+        cached = self.memory.get(key, store, max_age_hours * 3600)
+        if cached is not None:
+            self._record(hit=True)
+            self.logger.debug(f"✅ Cache hit (memoria) para {store}/{category}")
+            return cached[0], now - cached[1]
+        
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, created_at FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and row[1] < cutoff:
                 # Cache expirado, eliminarlo
-                del self.cache_data[key]
-                self.logger.info(f"⏰ Cache expirado para {store}/{category}")
+                self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                self._conn.commit()
         
-        self.metadata['misses'] += 1
-        self._save_metadata()
+        if row is not None:
+            if row[1] >= cutoff:
+                self._record(hit=True)
+                self.logger.info(f"✅ Cache hit para {store}/{category}")
+                data = json.loads(row[0])
+                # Subir al nivel en memoria conservando la fecha original
+                self.memory.set(key, store, data, len(row[0]), created_at=row[1])
+                return data, now - row[1]
+            self.logger.info(f"⏰ Cache expirado para {store}/{category}")
+        
+        self._record(hit=False)
         self.logger.info(f"❌ Cache miss para {store}/{category}")
         return None
     
     def set(self, store: str, category: str, url: str, data: List[Dict]):
         """Guarda datos en el cache"""
         key = self._generate_key(store, category, url)
+        payload = json.dumps(data, ensure_ascii=False, default=str)
         
-        self.cache_data[key] = {
-            'data': data,
-            'timestamp': datetime.now().isoformat(),
-            'store': store,
-            'category': category,
-            'url': url,
-            'count': len(data)
-        }
+        with self._lock:
+            try:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO cache_entries (key, store, category, url, data, count, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (key, store, category, url, payload, len(data), time.time()))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error guardando cache: {e}")
+                return
         
-        self._save_cache()
+        self.memory.set(key, store, data, len(payload))
         self.logger.info(f"💾 Cache guardado para {store}/{category} ({len(data)} productos)")
     
     def clear_expired(self, max_age_hours: int = 24):
         """Limpia entradas expiradas del cache"""
-        current_time = datetime.now()
-        expired_keys = []
-        
-        for key, item in self.cache_data.items():
-            cached_time = datetime.fromisoformat(item['timestamp'])
-            if current_time - cached_time > timedelta(hours=max_age_hours):
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.cache_data[key]
+        cutoff = time.time() - max_age_hours * 3600
+        self.memory.purge_expired(max_age_hours * 3600)
+        with self._lock:
+            deleted = self._conn.execute('DELETE FROM cache_entries WHERE created_at < ?', (cutoff,)).rowcount
+            self._conn.commit()
         
-        if expired_keys:
-            self._save_cache()
-            self.logger.info(f"🧹 Cache limpiado: {len(expired_keys)} entradas expiradas")
+        if deleted:
+            self.logger.info(f"🧹 Cache limpiado: {deleted} entradas expiradas")
     
     def get_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas del cache"""
-        total_entries = len(self.cache_data)
-        total_products = sum(item.get('count', 0) for item in self.cache_data.values())
+        self.flush_stats()
+        with self._lock:
+            total_entries, total_products = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(count), 0) FROM cache_entries'
+            ).fetchone()
+            metadata = dict(self._conn.execute('SELECT name, value FROM cache_metadata').fetchall())
         
+        hits = int(metadata.get('hits', 0))
+        misses = int(metadata.get('misses', 0))
+        cache_size = sum(
+            os.path.getsize(path) for path in (self.db_path, self.db_path + '-wal') if os.path.exists(path)
+        )
         return {
             'total_entries': total_entries,
             'total_products': total_products,
-            'hits': self.metadata.get('hits', 0),
-            'misses': self.metadata.get('misses', 0),
-            'hit_rate': self.metadata.get('hits', 0) / max(1, self.metadata.get('hits', 0) + self.metadata.get('misses', 0)) * 100,
-            'created': self.metadata.get('created', 'Unknown'),
-            'cache_size_mb': os.path.getsize(self.cache_file) / (1024 * 1024) if os.path.exists(self.cache_file) else 0
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / max(1, hits + misses) * 100,
+            'created': metadata.get('created', 'Unknown'),
+            'cache_size_mb': cache_size / (1024 * 1024),
+            'memory': self.memory.get_stats()
         }
     
     def clear_all(self):
         """Limpia todo el cache"""
-        self.cache_data = {}
-        self.metadata = {"created": datetime.now().isoformat(), "hits": 0, "misses": 0}
-        self._save_cache()
-        self._save_metadata()
+        self.memory.clear()
+        with self._lock:
+            self._pending_hits = self._pending_misses = 0
+            self._conn.execute('DELETE FROM cache_entries')
+            self._conn.execute('''
+                INSERT OR REPLACE INTO cache_metadata (name, value)
+                VALUES ('created', ?), ('hits', '0'), ('misses', '0')
+            ''', (datetime.now().isoformat(),))
+            self._conn.commit()
         self.logger.info("🗑️ Cache completamente limpiado")
     
     def get_cached_stores(self) -> List[str]:
         """Obtiene lista de tiendas en cache"""
-        stores = set()
-        for item in self.cache_data.values():
-            stores.add(item.get('store', ''))
-        return list(stores)
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT store FROM cache_entries').fetchall()
+        return [row[0] or '' for row in rows]
     
     def get_cached_categories(self, store: str = None) -> List[str]:
         """Obtiene lista de categorías en cache"""
-        categories = set()
-        for item in self.cache_data.values():
-            if store is None or item.get('store') == store:
-                categories.add(item.get('category', ''))
-        return list(categories) 
\ No newline at end of file
+        with self._lock:
+            if store is None:
+                rows = self._conn.execute('SELECT DISTINCT category FROM cache_entries').fetchall()
+            else:
+                rows = self._conn.execute(
+                    'SELECT DISTINCT category FROM cache_entries WHERE store = ?', (store,)
+                ).fetchall()
+        return [row[0] or '' for row in rows]
+    
+    def close(self):
+        """Vuelca los contadores y cierra la base del cache"""
+        self.flush_stats()
+        with self._lock:
+            self._conn.close()
+
+_default_cache: Optional[CacheManager] = None
+_default_cache_lock = threading.Lock()
+
+def get_cache_manager() -> CacheManager:
+    """Cache compartido del proceso (un solo nivel en memoria para todos los scrapers)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = CacheManager()
+        return _default_cache
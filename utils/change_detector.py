@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Detector de cambios entre escaneos
+Guarda en memoria una huella compacta por producto (clave -> precio/descuento) para que
+solo los productos nuevos o con cambios lleguen a la base de datos, las alertas y el análisis
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Fingerprint = Tuple[Optional[float], ...]
+
+# Productos sin cambios: renovar su marca de "visto" como mucho cada 12 h (la limpieza y los listados la usan)
+SEEN_REFRESH_INTERVAL = 12 * 3600
+
+def _round(value) -> Optional[float]:
+    try:
+        return round(float(value), 2)
+    except (TypeError, ValueError):
+        return None
+
+def make_fingerprint(*values) -> Fingerprint:
+    """Huella normalizada (floats redondeados) para comparar sin falsos cambios"""
+    return tuple(_round(value) for value in values)
+
+@dataclass
+class ChangeSet:
+    """Resultado de comparar un lote con la última versión guardada"""
+    new: List[Dict] = field(default_factory=list)
+    changed: List[Dict] = field(default_factory=list)
+    # Sin cambios pero con la marca de "visto" vencida (solo si hay touch_interval)
+    touch: List[Dict] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def updated(self) -> List[Dict]:
+        """Productos que hay que guardar y procesar: nuevos + con cambios"""
+        return self.new + self.changed
+
+class ChangeDetector:
+    """Huellas de lo último guardado; `diff` filtra el lote y `commit` confirma lo escrito"""
+
+    def __init__(self, key_func: Callable[[Dict], Hashable], fingerprint_func: Callable[[Dict], Fingerprint],
+                 touch_interval: Optional[float] = None):
+        self.key_func = key_func
+        self.fingerprint_func = fingerprint_func
+        self.touch_interval = touch_interval
+        # clave -> (huella, momento de la última escritura en epoch)
+        self._fingerprints: Dict[Hashable, Tuple[Fingerprint, float]] = {}
+        self._lock = threading.Lock()
+        self.seeded = False
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def seed(self, rows: Iterable[Tuple[Hashable, Fingerprint, Optional[float]]]):
+        """Carga (clave, huella, escrito_en) de lo que ya está en la base de datos"""
+        now = time.time()
+        with self._lock:
+            for key, fingerprint, written_at in rows:
+                self._fingerprints[key] = (fingerprint, written_at or now)
+            self.seeded = True
+        logger.info(f"Detector de cambios inicializado con {len(self._fingerprints)} productos")
+
+    def diff(self, products: Iterable[Dict]) -> ChangeSet:
+        """Separa el lote en nuevos, con cambios y sin cambios (no modifica las huellas)"""
+        # Un mismo producto repetido en el lote cuenta una vez (vale la última aparición)
+        batch: Dict[Hashable, Dict] = {}
+        for product in products:
+            batch[self.key_func(product)] = product
+
+        changes = ChangeSet()
+        now = time.time()
+        with self._lock:
+            for key, product in batch.items():
+                known = self._fingerprints.get(key)
+                if known is None:
+                    changes.new.append(product)
+                elif known[0] != self.fingerprint_func(product):
+                    changes.changed.append(product)
+                else:
+                    changes.unchanged += 1
+                    if self.touch_interval is not None and now - known[1] >= self.touch_interval:
+                        changes.touch.append(product)
+        return changes
+
+    def commit(self, products: Iterable[Dict]):
+        """Registra como guardados los productos (llamar solo si la escritura tuvo éxito)"""
+        now = time.time()
+        with self._lock:
+            for product in products:
+                self._fingerprints[self.key_func(product)] = (self.fingerprint_func(product), now)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Capa de GET condicional para páginas de categorías
+Guarda ETag/Last-Modified por URL y las listas de productos ya parseadas por hash de contenido
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Mapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("data", "http_cache.db")
+
+@dataclass
+class PageResult:
+    """Resultado de una descarga condicional"""
+    url: str
+    content_hash: Optional[str]
+    text: Optional[str]
+    not_modified: bool = False
+    body: Optional[bytes] = None
+
+def hash_content(body: bytes) -> str:
+    """Hash del cuerpo de la respuesta (identifica contenidos idénticos)"""
+    return hashlib.md5(body).hexdigest()
+
+# Bases cuyas listas parseadas antiguas ya se purgaron en este proceso
+_purged_paths = set()
+_purged_lock = threading.Lock()
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Conexión de larga vida, compartida entre hilos (cada store la protege con su lock)"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+class ValidatorStore:
+    """Validadores HTTP (ETag / Last-Modified) persistentes por URL"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = _connect(db_path)
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    updated_at TIMESTAMP
+                )
+            ''')
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Validadores guardados para la URL"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, content_hash FROM http_validators WHERE url = ?', (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content_hash': row[2]}
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para la URL"""
+        validators = self.get(url)
+        headers = {}
+        if validators and validators['content_hash']:
+            if validators['etag']:
+                headers['If-None-Match'] = validators['etag']
+            if validators['last_modified']:
+                headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def record(self, url: str, response_headers: Mapping[str, str], body: bytes) -> str:
+        """Guarda los validadores de una respuesta 200 y devuelve el hash del contenido"""
+        content_hash = hash_content(body)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO http_validators (url, etag, last_modified, content_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash, updated_at = excluded.updated_at
+            ''', (
+                url, response_headers.get('ETag'), response_headers.get('Last-Modified'),
+                content_hash, datetime.now().isoformat()
+            ))
+        return content_hash
+
+    def get_content_hash(self, url: str) -> Optional[str]:
+        """Hash del último contenido descargado para la URL (usado al recibir un 304)"""
+        validators = self.get(url)
+        return validators['content_hash'] if validators else None
+
+class ParsedProductCache:
+    """Listas de productos ya extraídas, indexadas por hash de contenido y tienda"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, namespace: str = "default", max_age_days: int = 7):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._conn = _connect(db_path)
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS parsed_products (
+                    content_hash TEXT NOT NULL,
+                    parser_key TEXT NOT NULL,
+                    products TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    PRIMARY KEY (content_hash, parser_key)
+                )
+            ''')
+
+    def _purge_expired(self):
+        """Descarta las listas antiguas (una vez por proceso y base, en la primera escritura)"""
+        with _purged_lock:
+            if self.db_path in _purged_paths:
+                return
+            _purged_paths.add(self.db_path)
+        cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM parsed_products WHERE created_at < ?', (cutoff,))
+
+    def _key(self, store_name: str) -> str:
+        # El namespace separa extractores que generan esquemas distintos para la misma tienda
+        return f"{self.namespace}:{store_name}"
+
+    def get(self, content_hash: Optional[str], store_name: str) -> Optional[List[Dict]]:
+        """Productos parseados para ese contenido, o None si no están guardados"""
+        if not content_hash:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT products FROM parsed_products WHERE content_hash = ? AND parser_key = ?',
+                (content_hash, self._key(store_name))
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, content_hash: Optional[str], store_name: str, products: List[Dict]):
+        """Guarda la lista de productos parseada de un contenido"""
+        if not content_hash:
+            return
+        self._purge_expired()
+        payload = json.dumps(products, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO parsed_products (content_hash, parser_key, products, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (content_hash, self._key(store_name), payload, datetime.now().isoformat()))
@@ -137,7 +137,7 @@ class Dashboard:
         print()
         
         # Ordenar por precio (más barato primero)
-        sorted_comparisons = sorted(comparisons, key=lambda x: self.extract_price_value(x.get('current_price', '')))
+        sorted_comparisons = sorted(comparisons, key=self.product_price_value)
         
         for i, product in enumerate(sorted_comparisons, 1):
             name = product.get('name', '')[:50] + "..." if len(product.get('name', '')) > 50 else product.get('name', '')
@@ -150,6 +150,13 @@ class Dashboard:
             print(f"      💰 {current_price} (antes: {original_price}) | 🔥 {discount} | 🏪 {store}")
             print()
     
+    def product_price_value(self, product: Dict) -> float:
+        """Precio numérico del producto (columna normalizada si viene de la base de datos)"""
+        price_value = product.get('current_price_value')
+        if price_value is not None:
+            return price_value
+        return self.extract_price_value(product.get('current_price', ''))
+    
     def extract_price_value(self, price_str: str) -> float:
         """Extrae el valor numérico del precio para ordenamiento"""
         try:
@@ -173,15 +180,7 @@ class Dashboard:
                 return False
             
             # Preparar datos para el gráfico
-            discounts = []
-            for product in products:
-                discount_str = product.get('discount', '')
-                if discount_str:
-                    try:
-                        discount_value = int(discount_str.replace('%', '').replace('-', ''))
-                        discounts.append(discount_value)
-                    except:
-                        continue
+            discounts = [product['discount_value'] for product in products if product.get('discount_value') is not None]
             
             if not discounts:
                 print("❌ No hay descuentos válidos para el gráfico")
@@ -11,6 +11,36 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import hashlib
+import re
+from utils.structured_data import parse_price_value
+from utils.change_detector import ChangeDetector, make_fingerprint, SEEN_REFRESH_INTERVAL
+from utils.product_matcher import ProductMatcher
+
+# Versión del esquema de products.db (PRAGMA user_version)
+SCHEMA_VERSION = 2
+
+_DISCOUNT_NUMBER = re.compile(r'(\d+(?:[.,]\d+)?)')
+_SEARCH_TERM = re.compile(r'\w+')
+
+# Pesos BM25 de las columnas de products_fts (name, store, category)
+SEARCH_WEIGHTS = (10.0, 1.0, 3.0)
+
+def build_match_query(query: str) -> Optional[str]:
+    """Consulta MATCH de FTS5: todas las palabras, cada una como prefijo ("note" encuentra "notebook")"""
+    terms = _SEARCH_TERM.findall(query or '')
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def parse_discount_value(discount: Optional[str]) -> Optional[int]:
+    """Porcentaje de descuento normalizado: "-70%" -> 70"""
+    if discount is None:
+        return None
+    match = _DISCOUNT_NUMBER.search(str(discount))
+    if not match:
+        return None
+    value = round(float(match.group(1).replace(',', '.')))
+    return value if 0 <= value <= 100 else None
 
 class DataManager:
     def __init__(self, data_dir: str = "data"):
@@ -22,15 +52,43 @@ class DataManager:
         os.makedirs(os.path.join(data_dir, "json"), exist_ok=True)
         os.makedirs(os.path.join(data_dir, "csv"), exist_ok=True)
         
+        # Índice de texto completo (False si SQLite no trae FTS5)
+        self.fts_enabled = False
+        
+        # Huellas precio/descuento de lo guardado; se carga de la base en el primer guardado
+        self.change_detector = ChangeDetector(
+            key_func=lambda record: record['product_hash'],
+            fingerprint_func=lambda record: make_fingerprint(record['price_value'], record['discount_value']),
+            touch_interval=SEEN_REFRESH_INTERVAL
+        )
+        self.last_save_changes = {}
+        
+        # Grupos del mismo producto entre tiendas (product_clusters.db); se carga al primer uso
+        self._matcher: Optional[ProductMatcher] = None
+        
         # Inicializar base de datos
         self.init_database()
     
+    def get_product_matcher(self) -> ProductMatcher:
+        """Emparejador de productos; al crearlo se agrupan los productos activos que aún no tenga"""
+        if self._matcher is None:
+            matcher = ProductMatcher(os.path.join(self.data_dir, "product_clusters.db"))
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute('SELECT name, store FROM products WHERE is_active = 1 AND name IS NOT NULL').fetchall()
+            conn.close()
+            matcher.assign(rows)
+            self._matcher = matcher
+        return self._matcher
+    
     def init_database(self):
         """Inicializa la base de datos SQLite"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # WAL: las lecturas del dashboard no bloquean las escrituras del scraping
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
             # Tabla de productos
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS products (
@@ -45,7 +103,10 @@ class DataManager:
                     product_link TEXT,
                     product_image TEXT,
                     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1
+                    is_active BOOLEAN DEFAULT 1,
+                    current_price_value REAL,
+                    original_price_value REAL,
+                    discount_value INTEGER
                 )
             ''')
             
@@ -56,17 +117,117 @@ class DataManager:
                     product_hash TEXT,
                     price TEXT,
                     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    price_value REAL,
                     FOREIGN KEY (product_hash) REFERENCES products (product_hash)
                 )
             ''')
             
             conn.commit()
+            self.migrate_database(conn)
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+            ).fetchone() is not None
             conn.close()
             print("✅ Base de datos inicializada correctamente")
             
         except Exception as e:
             print(f"❌ Error inicializando base de datos: {e}")
     
+    def migrate_database(self, conn: sqlite3.Connection):
+        """Actualiza bases creadas con versiones anteriores del esquema"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        
+        conn.execute('BEGIN')
+        try:
+            if version < 1:
+                # v1: precios y descuento numéricos junto al texto original, con índices para filtrar y ordenar
+                self._add_missing_columns(conn, 'products', {
+                    'current_price_value': 'REAL',
+                    'original_price_value': 'REAL',
+                    'discount_value': 'INTEGER'
+                })
+                self._add_missing_columns(conn, 'price_history', {'price_value': 'REAL'})
+                
+                conn.create_function('parse_price', 1, parse_price_value)
+                conn.create_function('parse_discount', 1, parse_discount_value)
+                conn.execute('''
+                    UPDATE products SET
+                        current_price_value = parse_price(current_price),
+                        original_price_value = parse_price(original_price),
+                        discount_value = parse_discount(discount)
+                ''')
+                conn.execute('UPDATE price_history SET price_value = parse_price(price)')
+                
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_products_active_store_scraped
+                    ON products (is_active, store, scraped_at)
+                ''')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_products_active_discount
+                    ON products (is_active, discount_value)
+                ''')
+            
+            new_version = SCHEMA_VERSION
+            if version < 2:
+                # v2: índice de texto completo sobre nombre, tienda y categoría
+                if not self._create_search_index(conn):
+                    # Sin FTS5 la base queda en v1: el paso v2 se reintenta en el próximo arranque
+                    new_version = 1
+            
+            conn.execute(f'PRAGMA user_version = {new_version}')
+            conn.commit()
+            if new_version > version:
+                print(f"✅ Esquema de base de datos actualizado a la versión {new_version}")
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _create_search_index(self, conn: sqlite3.Connection) -> bool:
+        """Tabla FTS5 sincronizada con products mediante triggers; False si FTS5 no está disponible"""
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                    name, store, category,
+                    content='products', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  Búsqueda de texto completo no disponible: {e}")
+            return False
+        
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts (rowid, name, store, category)
+                VALUES (new.id, new.name, new.store, new.category);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, store, category)
+                VALUES ('delete', old.id, old.name, old.store, old.category);
+            END
+        ''')
+        # Solo cambios de texto: los upserts de precios no tocan el índice
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, store, category ON products BEGIN
+                INSERT INTO products_fts (products_fts, rowid, name, store, category)
+                VALUES ('delete', old.id, old.name, old.store, old.category);
+                INSERT INTO products_fts (rowid, name, store, category)
+                VALUES (new.id, new.name, new.store, new.category);
+            END
+        ''')
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        return True
+    
+    def _add_missing_columns(self, conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+    
     def generate_product_hash(self, product: Dict) -> str:
         """Genera un hash único para el producto"""
         # Usar nombre y tienda para generar hash
@@ -95,42 +256,44 @@ class DataManager:
     
     def save_product_to_db(self, product: Dict) -> bool:
         """Guarda un producto en la base de datos"""
+        return self.save_products_to_db([product]) == 1
+    
+    def _seed_change_detector(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT product_hash, current_price_value, discount_value, CAST(strftime('%s', scraped_at) AS REAL)
+            FROM products
+        ''').fetchall()
+        conn.close()
+        self.change_detector.seed(
+            (product_hash, make_fingerprint(price, discount), seen_at) for product_hash, price, discount, seen_at in rows
+        )
+    
+    def save_products_to_db(self, products: List[Dict]) -> int:
+        """Guarda un lote de productos en una sola transacción; devuelve cuántos se procesaron
+        
+        Solo los productos nuevos o con cambio de precio/descuento se escriben (y agregan historial);
+        a los que no cambiaron se les renueva scraped_at como mucho cada SEEN_REFRESH_INTERVAL.
+        """
         try:
-            if not self.validate_product(product):
-                return False
-            
-            product_hash = self.generate_product_hash(product)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Verificar si el producto ya existe
-            cursor.execute('SELECT id FROM products WHERE product_hash = ?', (product_hash,))
-            existing = cursor.fetchone()
+            if not self.change_detector.seeded:
+                self._seed_change_detector()
             
-            if existing:
-                # Actualizar producto existente
-                cursor.execute('''
-                    UPDATE products SET 
-                        current_price = ?, original_price = ?, discount = ?,
-                        product_link = ?, product_image = ?, scraped_at = CURRENT_TIMESTAMP
-                    WHERE product_hash = ?
-                ''', (
-                    product.get('current_price'),
-                    product.get('original_price'),
-                    product.get('discount'),
-                    product.get('product_link'),
-                    product.get('product_image'),
-                    product_hash
-                ))
-            else:
-                # Insertar nuevo producto
-                cursor.execute('''
-                    INSERT INTO products (
-                        product_hash, name, current_price, original_price, discount,
-                        store, category, product_link, product_image
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            records = []
+            for product in products:
+                if not self.validate_product(product):
+                    continue
+                
+                product_hash = self.generate_product_hash(product)
+                current_price_value = parse_price_value(product.get('current_price'))
+                discount_value = parse_discount_value(product.get('discount'))
+                record = {
+                    'product_hash': product_hash,
+                    'price_value': current_price_value,
+                    'discount_value': discount_value,
+                    'history': None
+                }
+                record['row'] = (
                     product_hash,
                     product.get('name'),
                     product.get('current_price'),
@@ -139,23 +302,72 @@ class DataManager:
                     product.get('store'),
                     product.get('category'),
                     product.get('product_link'),
-                    product.get('product_image')
-                ))
-            
-            # Guardar en historial de precios
-            if product.get('current_price'):
-                cursor.execute('''
-                    INSERT INTO price_history (product_hash, price)
-                    VALUES (?, ?)
-                ''', (product_hash, product.get('current_price')))
+                    product.get('product_image'),
+                    current_price_value,
+                    parse_price_value(product.get('original_price')),
+                    discount_value
+                )
+                
+                # Historial de precios
+                if product.get('current_price'):
+                    record['history'] = (product_hash, product.get('current_price'), current_price_value)
+                records.append(record)
+            
+            if not records:
+                return 0
+            
+            changes = self.change_detector.diff(records)
+            updated = changes.updated
+            rows = [record['row'] for record in updated]
+            history = [record['history'] for record in updated if record['history']]
+            touched = [(record['product_hash'],) for record in changes.touch]
+            self.last_save_changes = {
+                'new': len(changes.new), 'changed': len(changes.changed), 'unchanged': changes.unchanged
+            }
+            if not rows and not touched:
+                return len(records)
             
-            conn.commit()
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                # Si ya existe solo se actualizan precios, descuento, enlaces y fecha
+                conn.executemany('''
+                    INSERT INTO products (
+                        product_hash, name, current_price, original_price, discount,
+                        store, category, product_link, product_image,
+                        current_price_value, original_price_value, discount_value
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(product_hash) DO UPDATE SET
+                        current_price = excluded.current_price,
+                        original_price = excluded.original_price,
+                        discount = excluded.discount,
+                        product_link = excluded.product_link,
+                        product_image = excluded.product_image,
+                        current_price_value = excluded.current_price_value,
+                        original_price_value = excluded.original_price_value,
+                        discount_value = excluded.discount_value,
+                        scraped_at = CURRENT_TIMESTAMP
+                ''', rows)
+                
+                conn.executemany('''
+                    INSERT INTO price_history (product_hash, price, price_value)
+                    VALUES (?, ?, ?)
+                ''', history)
+                
+                conn.executemany(
+                    'UPDATE products SET scraped_at = CURRENT_TIMESTAMP WHERE product_hash = ?', touched
+                )
             conn.close()
-            return True
+            self.change_detector.commit(updated + changes.touch)
+            
+            # Los productos guardados entran a su grupo ahora, no en cada búsqueda
+            if updated and self._matcher is not None:
+                self._matcher.assign((record['row'][1], record['row'][5]) for record in updated)
+            return len(records)
             
         except Exception as e:
-            print(f"❌ Error guardando producto en DB: {e}")
-            return False
+            print(f"❌ Error guardando productos en DB: {e}")
+            return 0
     
     def save_products_to_json(self, products: List[Dict], store_name: str) -> Optional[str]:
         """Guarda productos en archivo JSON"""
@@ -248,34 +460,85 @@ class DataManager:
             print(f"❌ Error obteniendo productos: {e}")
             return []
     
+    def get_active_products_by_name(self, items: List[tuple]) -> List[Dict]:
+        """Productos activos para cada (nombre, tienda), buscados por su product_hash"""
+        hashes = [self.generate_product_hash({'name': name, 'store': store}) for name, store in items]
+        if not hashes:
+            return []
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            placeholders = ', '.join('?' * len(hashes))
+            cursor.execute(f'''
+                SELECT * FROM products
+                WHERE is_active = 1 AND product_hash IN ({placeholders})
+            ''', hashes)
+            
+            columns = [description[0] for description in cursor.description]
+            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            conn.close()
+            return products
+            
+        except Exception as e:
+            print(f"❌ Error obteniendo productos: {e}")
+            return []
+    
+    def search_products_fts(self, query: str, store: Optional[str] = None,
+                            min_discount: int = 0, limit: int = 50) -> Optional[List[Dict]]:
+        """Busca en el índice de texto completo ordenando por BM25; None si el índice no está disponible"""
+        if not self.fts_enabled:
+            return None
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            sql = '''
+                SELECT p.* FROM products_fts
+                JOIN products p ON p.id = products_fts.rowid
+                WHERE products_fts MATCH ? AND p.is_active = 1
+            '''
+            params = [match_query]
+            if store:
+                sql += ' AND p.store = ?'
+                params.append(store)
+            if min_discount > 0:
+                sql += ' AND p.discount_value >= ?'
+                params.append(min_discount)
+            sql += ' ORDER BY bm25(products_fts, ?, ?, ?) LIMIT ?'
+            params.extend(SEARCH_WEIGHTS)
+            params.append(limit)
+            cursor.execute(sql, params)
+            
+            columns = [description[0] for description in cursor.description]
+            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            conn.close()
+            return products
+            
+        except Exception as e:
+            print(f"❌ Error en búsqueda de texto completo: {e}")
+            return None
+    
     def get_products_by_discount_range(self, min_discount: int = 0, max_discount: int = 100) -> List[Dict]:
-        """Obtiene productos por rango de descuento"""
+        """Obtiene productos por rango de descuento (mayor descuento primero)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT * FROM products 
-                WHERE is_active = 1 AND discount IS NOT NULL
-                ORDER BY CAST(REPLACE(REPLACE(discount, '%', ''), '-', '') AS INTEGER) DESC
-            ''')
+                WHERE is_active = 1 AND discount_value BETWEEN ? AND ?
+                ORDER BY discount_value DESC
+            ''', (min_discount, max_discount))
             
             columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
-            
-            products = []
-            for row in rows:
-                product = dict(zip(columns, row))
-                
-                # Extraer porcentaje de descuento
-                discount_str = product.get('discount', '')
-                if discount_str:
-                    try:
-                        discount_value = int(discount_str.replace('%', '').replace('-', ''))
-                        if min_discount <= discount_value <= max_discount:
-                            products.append(product)
-                    except:
-                        continue
+            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
             
             conn.close()
             return products
@@ -284,6 +547,35 @@ class DataManager:
             print(f"❌ Error obteniendo productos por descuento: {e}")
             return []
     
+    def get_products_by_price_range(self, min_price: float, max_price: float,
+                                    store: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Obtiene productos activos cuyo precio actual está en el rango"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            query = '''
+                SELECT * FROM products 
+                WHERE is_active = 1 AND current_price_value BETWEEN ? AND ?
+            '''
+            params = [min_price, max_price]
+            if store:
+                query += ' AND store = ?'
+                params.append(store)
+            query += ' ORDER BY scraped_at DESC LIMIT ?'
+            params.append(limit)
+            cursor.execute(query, params)
+            
+            columns = [description[0] for description in cursor.description]
+            products = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            conn.close()
+            return products
+            
+        except Exception as e:
+            print(f"❌ Error obteniendo productos por precio: {e}")
+            return []
+    
     def clean_old_products(self, days_old: int = 30):
         """Limpia productos antiguos de la base de datos"""
         try:
@@ -328,9 +620,9 @@ class DataManager:
             
             # Promedio de descuento
             cursor.execute('''
-                SELECT AVG(CAST(REPLACE(REPLACE(discount, '%', ''), '-', '') AS FLOAT))
+                SELECT AVG(discount_value)
                 FROM products 
-                WHERE is_active = 1 AND discount IS NOT NULL
+                WHERE is_active = 1 AND discount_value IS NOT NULL
             ''')
             avg_discount = cursor.fetchone()[0] or 0
             
@@ -338,8 +630,8 @@ class DataManager:
             cursor.execute('''
                 SELECT name, discount, store 
                 FROM products 
-                WHERE is_active = 1 AND discount IS NOT NULL
-                ORDER BY CAST(REPLACE(REPLACE(discount, '%', ''), '-', '') AS INTEGER) DESC
+                WHERE is_active = 1 AND discount_value IS NOT NULL
+                ORDER BY discount_value DESC
                 LIMIT 5
             ''')
             top_discounts = cursor.fetchall()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Almacén residente de ofertas para la API
+Mantiene deals.json en memoria con un índice invertido de los nombres, las ofertas ya
+serializadas y lo recarga solo cuando el archivo cambia (mtime o inodo)
+"""
+
+import os
+import re
+import json
+import asyncio
+import bisect
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'\w+')
+
+# Prefijos resueltos y respuestas filtradas que se recuerdan por foto del índice
+PREFIX_CACHE_SIZE = 4096
+RESPONSE_CACHE_SIZE = 256
+# Ofertas por fragmento al exportar NDJSON
+STREAM_BATCH_SIZE = 100
+
+def fold_text(text: str) -> str:
+    """Minúsculas y sin acentos: "Cámara Ñandú" -> "camara nandu" """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(fold_text(text))
+
+def encode_json(data) -> bytes:
+    """JSON compacto en UTF-8 (mismo formato que JSONResponse)"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+def _discount_of(deal: Dict) -> float:
+    value = deal.get('discount_percentage', deal.get('discount'))
+    if isinstance(value, str):
+        value = value.replace('%', '').replace('-', '').strip()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class DealIndex:
+    """Foto inmutable de las ofertas: lista original + listas de posiciones por token"""
+
+    __slots__ = ('deals', 'signature', 'body', 'etag', '_encoded', '_stores', '_discounts',
+                 '_postings', '_vocabulary', '_prefix_cache', '_responses')
+
+    def __init__(self, deals: List[Dict], signature: Optional[Tuple[int, int, int]] = None):
+        self.deals = deals
+        self.signature = signature
+
+        # Cada oferta se serializa una sola vez; las respuestas se arman concatenando bytes
+        self._encoded = [encode_json(deal) for deal in deals]
+        self.body = b'[' + b','.join(self._encoded) + b']'
+        self.etag = make_etag(self.body)
+
+        postings: Dict[str, List[int]] = {}
+        stores: Dict[str, List[int]] = {}
+        discounts: List[float] = []
+        for position, deal in enumerate(deals):
+            if not isinstance(deal, dict):
+                discounts.append(0.0)
+                continue
+            discounts.append(_discount_of(deal))
+            store = deal.get('store')
+            if isinstance(store, str):
+                stores.setdefault(store.lower(), []).append(position)
+            name = deal.get('name')
+            if not isinstance(name, str):
+                continue
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(position)
+        self._stores = stores
+        self._discounts = discounts
+        self._postings: Dict[str, FrozenSet[int]] = {
+            token: frozenset(positions) for token, positions in postings.items()
+        }
+        # Vocabulario ordenado: los tokens con un prefijo dado quedan contiguos
+        self._vocabulary = sorted(postings)
+        self._prefix_cache: Dict[str, FrozenSet[int]] = {}
+        self._responses: Dict[Tuple, Tuple[bytes, str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.deals)
+
+    def _prefix_positions(self, prefix: str) -> FrozenSet[int]:
+        positions = self._prefix_cache.get(prefix)
+        if positions is not None:
+            return positions
+
+        start = end = bisect.bisect_left(self._vocabulary, prefix)
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(prefix):
+            end += 1
+        if end - start == 1:
+            positions = self._postings[self._vocabulary[start]]
+        else:
+            positions = frozenset().union(*(self._postings[token] for token in self._vocabulary[start:end]))
+
+        # La foto es inmutable: los prefijos ya resueltos valen hasta la próxima recarga
+        if len(self._prefix_cache) < PREFIX_CACHE_SIZE:
+            self._prefix_cache[prefix] = positions
+        return positions
+
+    def search_positions(self, query: str) -> List[int]:
+        """Posiciones de las ofertas cuyo nombre contiene todas las palabras (como prefijo, sin acentos)"""
+        terms = tokenize(query)
+        if not terms:
+            return list(range(len(self.deals)))
+
+        # Empezar por el término más largo: suele ser el más selectivo
+        matches: Optional[FrozenSet[int]] = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            positions = self._prefix_positions(term)
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+        return sorted(matches)
+
+    def search(self, query: str) -> List[Dict]:
+        return [self.deals[position] for position in self.search_positions(query)]
+
+    def iter_positions(self, store: Optional[str] = None, min_discount: Optional[float] = None) -> Iterator[int]:
+        """Posiciones (en el orden del archivo) de las ofertas de la tienda y con el descuento mínimo"""
+        positions = self._stores.get(store.lower(), []) if store else range(len(self.deals))
+        if not min_discount:
+            return iter(positions)
+        discounts = self._discounts
+        return (position for position in positions if discounts[position] >= min_discount)
+
+    def filter_positions(self, store: Optional[str] = None, min_discount: Optional[float] = None) -> List[int]:
+        return list(self.iter_positions(store, min_discount))
+
+    def render(self, positions: List[int]) -> bytes:
+        """Arreglo JSON con las ofertas indicadas, a partir de los bytes ya serializados"""
+        encoded = self._encoded
+        return b'[' + b','.join([encoded[position] for position in positions]) + b']'
+
+    def iter_ndjson(self, positions: Iterable[int], batch_size: int = STREAM_BATCH_SIZE) -> Iterator[bytes]:
+        """Una oferta por línea, en fragmentos de `batch_size`; no arma la respuesta completa en memoria"""
+        encoded = self._encoded
+        batch = []
+        for position in positions:
+            batch.append(encoded[position])
+            if len(batch) >= batch_size:
+                yield b'\n'.join(batch) + b'\n'
+                batch = []
+        if batch:
+            yield b'\n'.join(batch) + b'\n'
+
+    @property
+    def version(self) -> str:
+        """Identificador de la foto (el ETag sin comillas), usado para reanudar exportaciones"""
+        return self.etag.strip('"')
+
+    def response(self, store: Optional[str] = None, min_discount: Optional[float] = None,
+                 offset: int = 0, limit: Optional[int] = None) -> Tuple[bytes, str, int]:
+        """Cuerpo, ETag y total de ofertas que cumplen el filtro (antes de paginar)"""
+        if not store and not min_discount and not offset and limit is None:
+            return self.body, self.etag, len(self.deals)
+
+        key = (store.lower() if store else None, min_discount or None, offset, limit)
+        cached = self._responses.get(key)
+        if cached is not None:
+            return cached
+
+        positions = self.filter_positions(store, min_discount)
+        end = None if limit is None else offset + limit
+        body = self.render(positions[offset:end])
+        cached = (body, make_etag(body), len(positions))
+        # El panel consulta siempre las mismas combinaciones: guardar la respuesta hasta la próxima recarga
+        if len(self._responses) < RESPONSE_CACHE_SIZE:
+            self._responses[key] = cached
+        return cached
+
+class DealStore:
+    """deals.json residente; `get_index()` devuelve siempre una foto completa y consistente"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[DealIndex] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def get_index(self) -> Optional[DealIndex]:
+        """Índice actual; sin vigilante activo se comprueba el archivo en cada llamada"""
+        if self._watcher is not None:
+            return self._index
+        return self.refresh()
+
+    async def get_index_async(self) -> Optional[DealIndex]:
+        """Igual que `get_index` pero sin bloquear el event loop: la lectura del archivo va a un hilo"""
+        if self._watcher is not None:
+            return self._index
+        return await asyncio.to_thread(self.refresh)
+
+    def refresh(self) -> Optional[DealIndex]:
+        """Recarga el índice si el archivo cambió; None si aún no existe"""
+        signature = self._signature()
+        if signature is None:
+            self._index = None
+            return None
+        index = self._index
+        if index is not None and index.signature == signature:
+            return index
+
+        with self._lock:
+            # Otro hilo pudo haber recargado mientras se esperaba el lock
+            index = self._index
+            if index is not None and index.signature == signature:
+                return index
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    deals = json.load(f)
+            except (OSError, ValueError) as e:
+                # Archivo a medio escribir o inválido: seguir sirviendo la versión anterior
+                logger.warning(f"No se pudo recargar {self.path}: {e}")
+                return index
+            if not isinstance(deals, list):
+                logger.warning(f"{self.path} no contiene una lista de ofertas")
+                return index
+
+            # Cambio atómico de referencia: los lectores ven la foto vieja o la nueva, nunca una mezcla
+            self._index = DealIndex(deals, signature)
+            logger.info(f"{len(deals)} ofertas cargadas desde {self.path}")
+            return self._index
+
+    def search(self, query: str) -> Optional[List[Dict]]:
+        index = self.get_index()
+        return index.search(query) if index is not None else None
+
+    def start_watching(self, interval: float = 1.0):
+        """Carga el archivo y lo vigila en segundo plano; las lecturas ya no tocan el disco"""
+        if self._watcher is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name='deal-store-watcher', daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop.set()
+            watcher.join()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error vigilando {self.path}: {e}")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Extractor rápido de productos sobre lxml
+Los selectores CSS de cada tienda se compilan una sola vez a XPath y se evalúan con libxml2
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    from lxml import etree
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Selector simple: etiqueta opcional + clases + atributos ("a[title]", ".pod-item", '[class*="name"]')
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<rest>(?:\.[\w-]+|\[[^\]]+\])*)$')
+_SELECTOR_PART = re.compile(r'\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$~|]?=)\s*(?P<value>"[^"]*"|\'[^\']*\'|[^\]\s]+))?\s*\]')
+_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+# Igual que BeautifulSoup.get_text(): sin comentarios ni contenido de script/style/template
+_TEXT_NODES = './/text()[not(ancestor::script or ancestor::style or ancestor::template)]'
+_DOCUMENT_TEXT_NODES = '//text()[not(ancestor::script or ancestor::style or ancestor::template)]'
+
+_compiled: Dict[str, "etree.XPath"] = {}
+_text_xpath: Optional["etree.XPath"] = None
+_parsers: Dict[str, "lxml.html.HTMLParser"] = {}
+
+def _xpath_literal(value: str) -> str:
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    parts = value.split('"')
+    return 'concat(' + ', \'"\', '.join(f'"{part}"' for part in parts) + ')'
+
+def css_to_xpath(selector: str) -> str:
+    """Traduce un selector CSS simple (sin combinadores) a XPath sobre los descendientes"""
+    match = _SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not selector.strip():
+        raise ValueError(f"Selector CSS no soportado: {selector}")
+
+    conditions = []
+    for part in _SELECTOR_PART.finditer(match.group('rest') or ''):
+        if part.group('cls'):
+            conditions.append(
+                f"contains(concat(' ', normalize-space(@class), ' '), ' {part.group('cls')} ')"
+            )
+            continue
+
+        attr, op, value = part.group('attr'), part.group('op'), part.group('value')
+        if not op:
+            conditions.append(f'@{attr}')
+            continue
+        if value[0] in '"\'':
+            value = value[1:-1]
+        literal = _xpath_literal(value)
+        if op == '=':
+            conditions.append(f'@{attr} = {literal}')
+        elif op == '*=':
+            conditions.append(f'contains(@{attr}, {literal})' if value else 'false()')
+        elif op == '^=':
+            conditions.append(f'starts-with(@{attr}, {literal})' if value else 'false()')
+        elif op == '$=':
+            conditions.append(
+                f'substring(@{attr}, string-length(@{attr}) - {len(value) - 1}) = {literal}' if value else 'false()'
+            )
+        elif op == '~=':
+            conditions.append(f"contains(concat(' ', normalize-space(@{attr}), ' '), ' {value} ')")
+        else:  # |=
+            conditions.append(f'(@{attr} = {literal} or starts-with(@{attr}, {_xpath_literal(value + "-")}))')
+
+    tag = match.group('tag') or '*'
+    xpath = f'.//{tag.lower()}'
+    for condition in conditions:
+        xpath += f'[{condition}]'
+    return xpath
+
+def compile_selector(selector: str) -> "etree.XPath":
+    """XPath compilado para el selector (se compila una vez por proceso)"""
+    xpath = _compiled.get(selector)
+    if xpath is None:
+        xpath = etree.XPath(css_to_xpath(selector))
+        _compiled[selector] = xpath
+    return xpath
+
+def _get_text_xpath() -> "etree.XPath":
+    global _text_xpath
+    if _text_xpath is None:
+        _text_xpath = etree.XPath(_TEXT_NODES)
+    return _text_xpath
+
+def compile_selectors(selectors: List[str]) -> List[Tuple[str, "etree.XPath"]]:
+    """Compila una lista de selectores conservando su orden de prioridad"""
+    return [(selector, compile_selector(selector)) for selector in selectors]
+
+def _get_parser(encoding: Optional[str]) -> "lxml.html.HTMLParser":
+    key = encoding or ''
+    parser = _parsers.get(key)
+    if parser is None:
+        parser = lxml.html.HTMLParser(encoding=encoding)
+        _parsers[key] = parser
+    return parser
+
+def parse_html(html: Union[bytes, str]) -> Optional["etree._Element"]:
+    """Parsea el documento; None si está vacío o no se puede leer"""
+    if not html:
+        return None
+    try:
+        if isinstance(html, bytes):
+            # libxml2 asume latin-1 si la página no declara charset; las tiendas sirven UTF-8
+            match = _CHARSET.search(html[:4096])
+            encoding = match.group(1).decode('ascii') if match else 'utf-8'
+            return lxml.html.document_fromstring(html, parser=_get_parser(encoding))
+        return lxml.html.document_fromstring(html, parser=_get_parser(None))
+    except (etree.ParserError, ValueError, LookupError) as e:
+        logger.debug(f"No se pudo parsear el HTML: {e}")
+        return None
+
+class FastElement:
+    """Envoltorio mínimo con la API de BeautifulSoup que usan los extractores"""
+
+    __slots__ = ('_element',)
+
+    def __init__(self, element: "etree._Element"):
+        self._element = element
+
+    @property
+    def name(self) -> str:
+        return self._element.tag
+
+    @property
+    def parent(self) -> Optional["FastElement"]:
+        parent = self._element.getparent()
+        return FastElement(parent) if parent is not None else None
+
+    def get(self, attr: str, default=None):
+        return self._element.get(attr, default)
+
+    def select(self, selector: str) -> List["FastElement"]:
+        return [FastElement(element) for element in compile_selector(selector)(self._element)]
+
+    def select_one(self, selector: str) -> Optional["FastElement"]:
+        elements = compile_selector(selector)(self._element)
+        return FastElement(elements[0]) if elements else None
+
+    def find(self, tag: str) -> Optional["FastElement"]:
+        return self.select_one(tag)
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        strings = _get_text_xpath()(self._element)
+        if strip:
+            strings = [text.strip() for text in strings]
+            strings = [text for text in strings if text]
+        return separator.join(strings)
+
+class FastExtractor:
+    """Selectores de contenedores por tienda, compilados al crear el extractor"""
+
+    def __init__(self, store_selectors: Dict[str, List[str]], default_selectors: List[str],
+                 field_selectors: Optional[List[str]] = None):
+        if not LXML_AVAILABLE:
+            raise RuntimeError("lxml no está instalado")
+
+        self.store_selectors = {
+            store_name: compile_selectors(selectors) for store_name, selectors in store_selectors.items()
+        }
+        self.default_selectors = compile_selectors(default_selectors)
+
+        # Selectores de campos (nombre, categoría, descuento...) usados luego vía FastElement
+        compile_selectors(field_selectors or [])
+        self._text_nodes = etree.XPath(_DOCUMENT_TEXT_NODES)
+
+    def parse(self, html: Union[bytes, str]) -> Optional["etree._Element"]:
+        return parse_html(html)
+
+    def select_products(self, document: Optional["etree._Element"], store_name: str) -> Tuple[Optional[str], List[FastElement]]:
+        """Contenedores de producto del primer selector de la tienda que encuentre resultados"""
+        if document is None:
+            return None, []
+
+        for selector, xpath in self.store_selectors.get(store_name, self.default_selectors):
+            elements = xpath(document)
+            if elements:
+                return selector, [FastElement(element) for element in elements]
+        return None, []
+
+    def find_text_parents(self, document: Optional["etree._Element"], pattern: Pattern) -> List[FastElement]:
+        """Padres de los textos que cumplen `pattern` (equivale a soup.find_all(text=pattern))"""
+        if document is None:
+            return []
+
+        parents = []
+        for text in self._text_nodes(document):
+            if not pattern.search(text):
+                continue
+            # En lxml el texto "tail" cuelga del hermano anterior, no de su padre real
+            parent = text.getparent()
+            if text.is_tail:
+                parent = parent.getparent()
+            if parent is not None and parent.tag not in ('script', 'style'):
+                parents.append(FastElement(parent))
+        return parents
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Motor de peticiones concurrentes por host
+Aplica un token bucket y un límite de concurrencia independientes para cada tienda
+"""
+
+import asyncio
+import time
+import weakref
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from config.settings import RATE_LIMIT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket asíncrono: repone `rate` tokens por segundo hasta `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Espera hasta que haya un token disponible y lo consume"""
+        if self.rate <= 0:
+            return
+
+        # El lock mantiene el orden de llegada entre las tareas del mismo host
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class HostLimiter:
+    """Limitador de un host: ritmo (token bucket) + peticiones simultáneas (semáforo)"""
+
+    def __init__(self, host: str, requests_per_second: float, burst: float, max_concurrent: int):
+        self.host = host
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self.max_concurrent = max(1, max_concurrent)
+        self.request_count = 0
+        self.in_flight = 0
+
+class FetchEngine:
+    """Reparte las peticiones por host según RATE_LIMIT_CONFIG"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or RATE_LIMIT_CONFIG
+        self._limiters: Dict[str, HostLimiter] = {}
+
+    def _host_config(self, host: str) -> Dict[str, Any]:
+        """Combina la configuración global con la específica del host (si existe)"""
+        config = dict(self.config)
+        for pattern, overrides in self.config.get('hosts', {}).items():
+            if host == pattern or host.endswith('.' + pattern):
+                config.update(overrides)
+                break
+        return config
+
+    def get_limiter(self, url: str) -> HostLimiter:
+        """Obtiene (o crea) el limitador del host de la URL"""
+        host = urlsplit(url).netloc.lower()
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            config = self._host_config(host)
+            delay = config.get('delay_between_requests', 1)
+            rate = config.get('requests_per_second', 1.0 / delay if delay > 0 else 0)
+            limiter = HostLimiter(
+                host,
+                requests_per_second=rate,
+                burst=config.get('burst', 1),
+                max_concurrent=config.get('max_concurrent_per_host', 2)
+            )
+            self._limiters[host] = limiter
+            logger.debug(f"Limitador creado para {host}: {rate:.2f} req/s, {limiter.max_concurrent} simultáneas")
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Reserva un turno para pedir `url` respetando los límites de su host"""
+        limiter = self.get_limiter(url)
+        async with limiter.semaphore:
+            await limiter.bucket.acquire()
+            limiter.request_count += 1
+            limiter.in_flight += 1
+            try:
+                yield limiter
+            finally:
+                limiter.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Estadísticas de peticiones por host"""
+        return {
+            host: {'requests': limiter.request_count, 'in_flight': limiter.in_flight}
+            for host, limiter in self._limiters.items()
+        }
+
+# Un motor por event loop: los semáforos y locks de asyncio no se comparten entre loops
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, FetchEngine]" = weakref.WeakKeyDictionary()
+
+def get_fetch_engine() -> FetchEngine:
+    """Devuelve el motor compartido del event loop actual"""
+    loop = asyncio.get_running_loop()
+    engine = _engines.get(loop)
+    if engine is None:
+        engine = FetchEngine()
+        _engines[loop] = engine
+    return engine
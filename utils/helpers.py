@@ -1,65 +1,83 @@
 # -*- coding: utf-8 -*-
 import re
 import random
-import time
+import asyncio
 import httpx
 import logging
 from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
-from retrying import retry
-from config.settings import DEFAULT_HEADERS, MIN_DELAY, MAX_DELAY, REQUEST_TIMEOUT, RETRY_CONFIG, RATE_LIMIT_CONFIG
+from config.settings import DEFAULT_HEADERS, MIN_DELAY, MAX_DELAY
+from utils.fetch_engine import get_fetch_engine
+from utils.retry_policy import get_retry_policy
+from utils.http_client import get_client, get_user_agent
+from utils.conditional_get import ValidatorStore, PageResult
 
 logger = logging.getLogger(__name__)
 
 class ScrapingHelper:
     def __init__(self):
-        self.ua = UserAgent()
-        self.client = httpx.AsyncClient(headers=DEFAULT_HEADERS, timeout=REQUEST_TIMEOUT)
         self.request_count = 0
-        self.last_request_time = 0
+        self.validators = ValidatorStore()
     
-    async def _rate_limit(self):
-        """Implementa rate limiting para evitar bloqueos"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+    @property
+    def client(self):
+        """Cliente HTTP compartido por todos los scrapers (pool de conexiones reutilizable)"""
+        return get_client()
+    
+    async def make_request(self, url, headers=None, timeout=None):
+        """Realiza una petición HTTP con reintentos y rate limiting por host"""
+        if headers is None:
+            headers = {'User-Agent': self.get_random_user_agent()}
         
-        min_delay = RATE_LIMIT_CONFIG['delay_between_requests']
-        if time_since_last < min_delay:
-            sleep_time = min_delay - time_since_last
-            await asyncio.sleep(sleep_time)
+        try:
+            # Los reintentos esperan con asyncio.sleep y vuelven a pedir turno al host
+            response = await get_retry_policy().call(url, lambda: self._fetch(url, headers, timeout))
+        except httpx.HTTPError as e:
+            logger.error(f"Error en petición a {url}: {str(e)}")
+            raise
         
-        self.last_request_time = time.time()
-        self.request_count += 1
+        logger.info(f"Petición exitosa: {response.status_code}")
+        return response.text
     
-    @retry(
-        stop_max_attempt_number=RETRY_CONFIG['max_attempts'],
-        wait_fixed=RETRY_CONFIG['delay_between_attempts'] * 1000,
-        wait_exponential_multiplier=RETRY_CONFIG['backoff_factor'] * 1000,
-        wait_exponential_max=RETRY_CONFIG['max_delay'] * 1000
-    )
-    async def make_request(self, url, headers=None, timeout=None):
-        """Realiza una petición HTTP con reintentos y rate limiting"""
+    async def fetch_page(self, url, headers=None, timeout=None, use_validators=True):
+        """GET condicional: envía If-None-Match/If-Modified-Since y detecta respuestas 304"""
+        if headers is None:
+            headers = {'User-Agent': self.get_random_user_agent()}
+        if use_validators:
+            # Los validadores están en SQLite: se consultan en un hilo para no bloquear el event loop
+            headers = {**headers, **await asyncio.to_thread(self.validators.conditional_headers, url)}
+        
         try:
-            await self._rate_limit()
-            
-            if headers is None:
-                headers = {'User-Agent': self.get_random_user_agent()}
-            
-            logger.info(f"Realizando petición a: {url}")
-            response = await self.client.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            
-            logger.info(f"Petición exitosa: {response.status_code}")
-            return response.text
-            
-        except httpx.RequestError as e:
+            response = await get_retry_policy().call(url, lambda: self._fetch(url, headers, timeout))
+        except httpx.HTTPError as e:
             logger.error(f"Error en petición a {url}: {str(e)}")
             raise
+        
+        if response.status_code == 304:
+            logger.info(f"Sin cambios (304): {url}")
+            return PageResult(url, await asyncio.to_thread(self.validators.get_content_hash, url), None, not_modified=True)
+        
+        content_hash = await asyncio.to_thread(self.validators.record, url, response.headers, response.content)
+        return PageResult(url, content_hash, response.text, body=response.content)
+    
+    async def _fetch(self, url, headers, timeout):
+        """Un intento de petición dentro del turno asignado al host"""
+        # Cada host tiene su propio ritmo y límite de concurrencia,
+        # así las distintas tiendas se consultan en paralelo
+        async with get_fetch_engine().slot(url):
+            self.request_count += 1
+            logger.info(f"Realizando petición a: {url}")
+            response = await self.client.get(
+                url, headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+            )
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
     
     def get_random_user_agent(self):
         """Genera un User-Agent aleatorio"""
         try:
-            return self.ua.random
+            return get_user_agent().random
         except Exception as e:
             logger.warning(f"Error generando User-Agent: {e}")
             return DEFAULT_HEADERS['User-Agent']
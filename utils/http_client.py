@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Registro de clientes HTTP compartidos
+Un único httpx.AsyncClient con pool de conexiones para todos los scrapers del proceso
+"""
+
+import asyncio
+import weakref
+import logging
+from typing import Optional
+
+import httpx
+from fake_useragent import UserAgent
+
+from config.settings import DEFAULT_HEADERS, REQUEST_TIMEOUT, HTTP_CLIENT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Los clientes asíncronos quedan ligados al event loop donde se crean,
+# por eso el registro se indexa por loop y se libera junto con él
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_user_agent: Optional[UserAgent] = None
+
+def _create_client() -> httpx.AsyncClient:
+    """Crea un cliente con HTTP/2 (si está disponible) y límites de keep-alive"""
+    http2 = HTTP_CLIENT_CONFIG.get('http2', True) and HTTP2_AVAILABLE
+    if HTTP_CLIENT_CONFIG.get('http2', True) and not HTTP2_AVAILABLE:
+        logger.warning("Paquete 'h2' no instalado, usando HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=HTTP_CLIENT_CONFIG['max_connections'],
+        max_keepalive_connections=HTTP_CLIENT_CONFIG['max_keepalive_connections'],
+        keepalive_expiry=HTTP_CLIENT_CONFIG['keepalive_expiry']
+    )
+    return httpx.AsyncClient(
+        headers=DEFAULT_HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        limits=limits,
+        http2=http2,
+        follow_redirects=True
+    )
+
+def get_client(name: str = 'default') -> httpx.AsyncClient:
+    """Devuelve el cliente compartido `name` del event loop actual, creándolo si hace falta"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = _create_client()
+        clients[name] = client
+        logger.debug(f"Cliente HTTP '{name}' creado")
+    return client
+
+async def close_clients():
+    """Cierra los clientes del event loop actual (llamar al terminar el proceso de scraping)"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.pop(loop, {})
+    for name, client in clients.items():
+        if not client.is_closed:
+            await client.aclose()
+            logger.debug(f"Cliente HTTP '{name}' cerrado")
+
+def get_user_agent() -> UserAgent:
+    """Generador de User-Agents compartido (cargar su base de datos es costoso)"""
+    global _user_agent
+    if _user_agent is None:
+        _user_agent = UserAgent()
+    return _user_agent
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Ejecutor de parseo de HTML
+Reparte la extracción de productos (CPU) entre varios procesos para no bloquear la E/S
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Función de parseo: (HTML crudo, tienda) -> lista de productos como dicts planos.
+# Con el backend 'process' debe ser una función de nivel de módulo (picklable).
+ParseFunction = Callable[[Union[bytes, str], str], List[Dict]]
+
+PARSE_BACKENDS = ('process', 'thread', 'inline')
+
+class _InlineExecutor(Executor):
+    """Ejecuta en el mismo hilo (útil para depurar o en entornos sin multiprocessing)"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+class ParseExecutor:
+    def __init__(self, parse_function: ParseFunction, backend: str = 'process',
+                 max_workers: Optional[int] = None):
+        if backend not in PARSE_BACKENDS:
+            raise ValueError(f"Backend de parseo desconocido: {backend} (opciones: {', '.join(PARSE_BACKENDS)})")
+
+        self.parse_function = parse_function
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        """Crea el pool al primer uso"""
+        if self._executor is None:
+            if self.backend == 'process':
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                except (OSError, NotImplementedError) as e:
+                    # Sin soporte de procesos (p. ej. sandbox): degradar a hilos
+                    logger.warning(f"No se pudo crear el pool de procesos ({e}), usando hilos")
+                    self.backend = 'thread'
+            if self.backend == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            elif self.backend == 'inline':
+                self._executor = _InlineExecutor()
+            logger.debug(f"Pool de parseo '{self.backend}' con {self.max_workers} workers")
+        return self._executor
+
+    def submit(self, html: Union[bytes, str], store_name: str) -> Future:
+        """Encola el parseo de una página; devuelve un Future con la lista de productos"""
+        return self._get_executor().submit(self.parse_function, html, store_name)
+
+    async def parse(self, html: Union[bytes, str], store_name: str) -> List[Dict]:
+        """Versión awaitable de submit para usar desde asyncio"""
+        return await asyncio.wrap_future(self.submit(html, store_name))
+
+    def shutdown(self, wait: bool = True):
+        """Libera los workers del pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
@@ -10,9 +10,18 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 from dataclasses import dataclass
-import json
 import os
 
+import numpy as np
+
+from utils.price_history_store import PriceHistoryStore, LEGACY_JSON_FILE
+from utils.product_matcher import ProductMatcher
+
+# Observaciones por producto que usa el análisis (tendencia, mínimo histórico y competencia)
+HISTORY_POINTS = 20
+# Precios recientes con los que se mide la tendencia
+TREND_WINDOW = 5
+
 @dataclass
 class PriceAnalysis:
     """Resultado del análisis de precios"""
@@ -28,8 +37,13 @@ class PriceAnalyzer:
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
         self.logger = logging.getLogger(__name__)
-        self.price_history_file = os.path.join(data_dir, "price_history.json")
-        self.price_history = self._load_price_history()
+        self.history_store = PriceHistoryStore(
+            os.path.join(data_dir, "price_history.db"),
+            legacy_json=os.path.join(data_dir, LEGACY_JSON_FILE)
+        )
+        # Grupos del mismo producto entre tiendas; se agregan los productos que ya tienen historial
+        self.matcher = ProductMatcher(os.path.join(data_dir, "product_clusters.db"))
+        self.matcher.assign((item['name'], item['store']) for item in self.history_store.latest() if item['name'])
         
         # Configuración de análisis
         self.min_discount_threshold = 0.15  # 15% mínimo para considerar descuento real
@@ -40,24 +54,6 @@ class PriceAnalyzer:
             r'\d{1,3}%', r'\d{1,3}% OFF'  # Descuentos extremos
         ]
     
-    def _load_price_history(self) -> Dict[str, List[Dict]]:
-        """Carga historial de precios"""
-        try:
-            if os.path.exists(self.price_history_file):
-                with open(self.price_history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.logger.warning(f"Error cargando historial de precios: {e}")
-        return {}
-    
-    def _save_price_history(self):
-        """Guarda historial de precios"""
-        try:
-            with open(self.price_history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.price_history, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            self.logger.error(f"Error guardando historial de precios: {e}")
-    
     def _generate_product_key(self, product_name: str, store: str) -> str:
         """Genera clave única para el producto"""
         return f"{store}_{product_name.lower().replace(' ', '_')[:50]}"
@@ -105,6 +101,115 @@ class PriceAnalyzer:
             risk_level=risk_level
         )
     
+    def analyze_prices(self, products: List[Dict], store: Optional[str] = None) -> List[PriceAnalysis]:
+        """Analiza un lote de productos (tienda = `store` o la de cada producto)
+        
+        Da el mismo resultado que `analyze_price` producto a producto contra el historial previo
+        al lote, pero lee el historial una vez, calcula tendencias y mínimos sobre arreglos de
+        NumPy, toma los competidores del grupo de cada producto y guarda el lote en una sola escritura.
+        """
+        if not products:
+            return []
+        
+        stores = [store or product.get('store', '') for product in products]
+        names = [product.get('name', '') for product in products]
+        keys = [self._generate_product_key(name, product_store) for name, product_store in zip(names, stores)]
+        current_prices = [self._extract_numeric_price(product.get('current_price', '')) for product in products]
+        original_prices = [self._extract_numeric_price(product.get('original_price', '')) for product in products]
+        
+        # Competidores: publicaciones del mismo grupo en otras tiendas
+        cluster_ids = self.matcher.assign(zip(names, stores))
+        member_keys = [
+            [self._generate_product_key(member_name, member_store)
+             for member_name, member_store in self.matcher.members(cluster_id, exclude_store=product_store)]
+            for cluster_id, product_store in zip(cluster_ids, stores)
+        ]
+        
+        # Solo el historial del lote y de sus competidores (por el índice), no toda la tabla
+        history = self.history_store.all_series(
+            HISTORY_POINTS, keys=keys + [key for members in member_keys for key in members]
+        )
+        trends, historical_lows = self._batch_trends_and_lows(keys, current_prices, history)
+        competition = self._batch_competition(member_keys, current_prices, history)
+        
+        analyses = []
+        for i, product in enumerate(products):
+            is_real_discount = self._is_real_discount(current_prices[i], original_prices[i], product.get('discount', ''))
+            confidence_score = self._calculate_confidence_score(product, stores[i])
+            analyses.append(PriceAnalysis(
+                is_real_discount=is_real_discount,
+                confidence_score=confidence_score,
+                price_trend=trends[i],
+                historical_low=historical_lows[i],
+                competitor_analysis=competition[i],
+                recommendation=self._generate_recommendation(
+                    is_real_discount, confidence_score, trends[i], historical_lows[i]
+                ),
+                risk_level=self._evaluate_risk_level(product, confidence_score)
+            ))
+        
+        # Actualizar historial de precios en una sola escritura
+        self.history_store.append_many(zip(keys, names, stores, current_prices, original_prices))
+        return analyses
+    
+    def _batch_trends_and_lows(self, keys: List[str], current_prices: List[Optional[float]],
+                               history: Dict) -> Tuple[List[str], List[bool]]:
+        """Tendencia y mínimo histórico de todo el lote con operaciones sobre un único arreglo"""
+        trends = ['stable'] * len(keys)
+        historical_lows = [False] * len(keys)
+        rows = [i for i, key in enumerate(keys) if key in history]
+        if not rows:
+            return trends, historical_lows
+        
+        # Historiales concatenados; cada producto ocupa prices[starts[j]:ends[j]]
+        series = [history[keys[i]].current_prices for i in rows]
+        lengths = np.array([len(prices) for prices in series])
+        prices = np.concatenate(series)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        
+        # Mínimo histórico (5% de tolerancia)
+        minimums = np.minimum.reduceat(prices, starts)
+        current = np.array([np.nan if current_prices[i] is None else current_prices[i] for i in rows], dtype=float)
+        with np.errstate(invalid='ignore'):
+            is_low = current <= minimums * 1.05
+        
+        # Tendencia: promedio de los últimos precios sin el primero menos el promedio sin el último
+        window = np.minimum(lengths, TREND_WINDOW)
+        offsets = np.arange(TREND_WINDOW)
+        valid = offsets < window[:, None]
+        positions = np.where(valid, (ends - window)[:, None] + offsets, 0)
+        recent = np.where(valid, prices[positions], 0.0)
+        total = recent.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            late_mean = (total - recent[:, 0]) / (window - 1)
+            early_mean = (total - prices[ends - 1]) / (window - 1)
+            change = late_mean - early_mean
+            limit = self.price_fluctuation_threshold * (total / window)
+            increasing = (lengths >= 3) & (change > limit)
+            decreasing = (lengths >= 3) & (change < -limit)
+        
+        for j, i in enumerate(rows):
+            historical_lows[i] = bool(is_low[j])
+            if increasing[j]:
+                trends[i] = 'increasing'
+            elif decreasing[j]:
+                trends[i] = 'decreasing'
+        return trends, historical_lows
+    
+    def _batch_competition(self, member_keys: List[List[str]], current_prices: List[Optional[float]],
+                           history: Dict) -> List[Dict[str, float]]:
+        """Competencia de todo el lote a partir de las claves de los competidores de cada producto"""
+        results = []
+        for members, current_price in zip(member_keys, current_prices):
+            similar_products = []
+            for key in members:
+                series = history.get(key)
+                if series is not None:
+                    similar_products.extend(series.current_prices.tolist())
+            results.append(self._summarize_competition(similar_products, current_price))
+        return results
+    
     def _extract_numeric_price(self, price_text: str) -> Optional[float]:
         """Extrae precio numérico del texto"""
         if not price_text:
@@ -177,23 +282,20 @@ class PriceAnalyzer:
         """Analiza la tendencia de precios"""
         key = self._generate_product_key(product_name, store)
         
-        if key not in self.price_history:
-            return 'stable'
-        
-        history = self.price_history[key]
-        if len(history) < 3:
+        history = self.history_store.get_series(key, HISTORY_POINTS)
+        if history is None or len(history) < 3:
             return 'stable'
         
         # Obtener últimos 5 precios
-        recent_prices = [item['current_price'] for item in history[-5:]]
+        recent_prices = history.current_prices[-5:]
         
         # Calcular tendencia
         if len(recent_prices) >= 2:
-            trend = statistics.mean(recent_prices[1:]) - statistics.mean(recent_prices[:-1])
+            trend = recent_prices[1:].mean() - recent_prices[:-1].mean()
             
-            if trend > self.price_fluctuation_threshold * statistics.mean(recent_prices):
+            if trend > self.price_fluctuation_threshold * recent_prices.mean():
                 return 'increasing'
-            elif trend < -self.price_fluctuation_threshold * statistics.mean(recent_prices):
+            elif trend < -self.price_fluctuation_threshold * recent_prices.mean():
                 return 'decreasing'
         
         return 'stable'
@@ -202,31 +304,30 @@ class PriceAnalyzer:
         """Verifica si el precio actual es un mínimo histórico"""
         key = self._generate_product_key(product_name, store)
         
-        if key not in self.price_history:
-            return False
-        
-        history = self.price_history[key]
-        if not history:
+        history = self.history_store.get_series(key, HISTORY_POINTS)
+        if history is None:
             return False
         
         # Obtener precio mínimo histórico
-        historical_prices = [item['current_price'] for item in history]
-        min_price = min(historical_prices)
+        min_price = history.current_prices.min()
         
         # Verificar si el precio actual está cerca del mínimo
-        return current_price <= min_price * 1.05  # 5% de tolerancia
+        return bool(current_price <= min_price * 1.05)  # 5% de tolerancia
     
     def _analyze_competition(self, product_name: str, current_price: float, store: str) -> Dict[str, float]:
         """Analiza precios de competencia"""
-        # Buscar productos similares en otras tiendas
+        # El mismo producto en otras tiendas (grupo del emparejador)
+        cluster_id = self.matcher.assign([(product_name, store)])[0]
         similar_products = []
         
-        for store_key, store_history in self.price_history.items():
-            if store not in store_key:  # Otra tienda
-                for item in store_history:
-                    if self._is_similar_product(product_name, item.get('name', '')):
-                        similar_products.append(item['current_price'])
+        for member_name, member_store in self.matcher.members(cluster_id, exclude_store=store):
+            history = self.history_store.get_series(self._generate_product_key(member_name, member_store), HISTORY_POINTS)
+            if history is not None:
+                similar_products.extend(history.current_prices.tolist())
         
+        return self._summarize_competition(similar_products, current_price)
+    
+    def _summarize_competition(self, similar_products: List[float], current_price: float) -> Dict[str, float]:
         if not similar_products:
             return {'average': current_price, 'min': current_price, 'max': current_price}
         
@@ -237,25 +338,6 @@ class PriceAnalyzer:
             'count': len(similar_products)
         }
     
-    def _is_similar_product(self, name1: str, name2: str) -> bool:
-        """Verifica si dos productos son similares"""
-        # Normalizar nombres
-        name1_norm = re.sub(r'[^\w\s]', '', name1.lower())
-        name2_norm = re.sub(r'[^\w\s]', '', name2.lower())
-        
-        # Buscar palabras clave comunes
-        words1 = set(name1_norm.split())
-        words2 = set(name2_norm.split())
-        
-        common_words = words1.intersection(words2)
-        total_words = words1.union(words2)
-        
-        if not total_words:
-            return False
-        
-        similarity = len(common_words) / len(total_words)
-        return similarity > 0.3  # 30% de similitud
-    
     def _generate_recommendation(self, is_real_discount: bool, confidence_score: float, 
                                price_trend: str, historical_low: bool) -> str:
         """Genera recomendación basada en el análisis"""
@@ -286,29 +368,9 @@ class PriceAnalyzer:
             return 'low'
     
     def _update_price_history(self, product_name: str, store: str, current_price: float, original_price: float):
-        """Actualiza el historial de precios"""
+        """Agrega la observación al historial de precios (se guarda por lotes)"""
         key = self._generate_product_key(product_name, store)
-        
-        if key not in self.price_history:
-            self.price_history[key] = []
-        
-        # Agregar entrada al historial
-        entry = {
-            'name': product_name,
-            'store': store,
-            'current_price': current_price,
-            'original_price': original_price,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        self.price_history[key].append(entry)
-        
-        # Mantener solo últimos 20 registros
-        if len(self.price_history[key]) > 20:
-            self.price_history[key] = self.price_history[key][-20:]
-        
-        # Guardar historial
-        self._save_price_history()
+        self.history_store.append(key, product_name, store, current_price, original_price)
     
     def get_price_statistics(self, store: str = None) -> Dict[str, Any]:
         """Obtiene estadísticas de precios"""
@@ -321,27 +383,25 @@ class PriceAnalyzer:
         
         discounts = []
         
-        for key, history in self.price_history.items():
-            if store and store not in key:
+        for latest in self.history_store.latest():
+            if store and store not in latest['key']:
                 continue
             
-            if history:
-                latest = history[-1]
-                stats['total_products'] += 1
-                
-                if latest.get('original_price') and latest.get('current_price'):
-                    discount = (latest['original_price'] - latest['current_price']) / latest['original_price']
-                    discounts.append(discount)
-                
-                # Clasificar por rango de precio
-                price = latest.get('current_price', 0)
-                if price < 10000:
-                    stats['price_ranges']['low'] += 1
-                elif price < 50000:
-                    stats['price_ranges']['medium'] += 1
-                else:
-                    stats['price_ranges']['high'] += 1
-        
+            stats['total_products'] += 1
+            
+            if latest.get('original_price') and latest.get('current_price'):
+                discount = (latest['original_price'] - latest['current_price']) / latest['original_price']
+                discounts.append(discount)
+            
+            # Clasificar por rango de precio
+            price = latest.get('current_price') or 0
+            if price < 10000:
+                stats['price_ranges']['low'] += 1
+            elif price < 50000:
+                stats['price_ranges']['medium'] += 1
+            else:
+                stats['price_ranges']['high'] += 1
+    
         if discounts:
             stats['average_discount'] = statistics.mean(discounts) * 100
         
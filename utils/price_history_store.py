@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Historial de precios en SQLite
+Una fila por observación (append-only) con índice (product_key, ts); las escrituras se
+acumulan y se guardan por lotes, y cada producto se entrega como arreglos de NumPy
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("data", "price_history.db")
+LEGACY_JSON_FILE = "price_history.json"
+
+# Observaciones pendientes antes de escribir el lote a disco
+FLUSH_EVERY = 200
+# Observaciones que se conservan por producto (el predictor usa hasta 50)
+MAX_POINTS_PER_PRODUCT = 50
+
+# Claves por consulta en los IN (...) (SQLite antiguo admite hasta 999 parámetros)
+KEY_CHUNK = 500
+
+# (ts, precio actual, precio original)
+Point = Tuple[float, Optional[float], Optional[float]]
+
+@dataclass
+class PriceSeries:
+    """Historial de un producto, ordenado del más antiguo al más reciente"""
+    key: str
+    name: str
+    store: str
+    timestamps: np.ndarray  # epoch en segundos
+    current_prices: np.ndarray
+    original_prices: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def local_datetimes(self) -> np.ndarray:
+        """Marcas de tiempo como datetime64 en hora local (como los antiguos ISO del JSON)"""
+        # El desfase horario solo cambia en horas exactas: se consulta una vez por hora distinta
+        hours, inverse = np.unique(self.timestamps // 3600, return_inverse=True)
+        offsets = np.array([time.localtime(hour * 3600).tm_gmtoff for hour in hours], dtype=float)
+        seconds = np.floor(self.timestamps)
+        fraction = np.round((self.timestamps - seconds) * 1e6).astype(np.int64)
+        microseconds = (seconds + offsets[inverse]).astype(np.int64) * 1_000_000 + fraction
+        return microseconds.astype('datetime64[us]')
+
+    def tail(self, limit: Optional[int]) -> 'PriceSeries':
+        if limit is None or len(self) <= limit:
+            return self
+        return PriceSeries(
+            self.key, self.name, self.store,
+            self.timestamps[-limit:], self.current_prices[-limit:], self.original_prices[-limit:]
+        )
+
+def _to_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+def _build_series(key: str, name: str, store: str, points: List[Point]) -> PriceSeries:
+    return PriceSeries(
+        key=key,
+        name=name,
+        store=store,
+        timestamps=np.array([point[0] for point in points], dtype=float),
+        current_prices=np.array([_to_float(point[1]) for point in points], dtype=float),
+        original_prices=np.array([_to_float(point[2]) for point in points], dtype=float)
+    )
+
+def _parse_timestamp(value) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+class PriceHistoryStore:
+    """Observaciones de precio por producto; `append` acumula y `flush` escribe el lote"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, legacy_json: Optional[str] = None,
+                 flush_every: int = FLUSH_EVERY):
+        self.db_path = db_path
+        self.flush_every = flush_every
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_points (
+                    product_key TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    current_price REAL,
+                    original_price REAL,
+                    name TEXT,
+                    store TEXT
+                )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_price_points_key_ts ON price_points (product_key, ts)'
+            )
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_history_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
+        # product_key -> (nombre, tienda, observaciones aún no escritas)
+        self._pending: Dict[str, Tuple[str, str, List[Point]]] = {}
+        self._pending_count = 0
+
+        if legacy_json:
+            self._import_legacy_json(legacy_json)
+        self.prune()
+        atexit.register(self.flush)
+
+    def _import_legacy_json(self, path: str):
+        """Importa una sola vez el antiguo price_history.json (el archivo no se modifica)"""
+        if not os.path.exists(path):
+            return
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM price_history_meta WHERE key = 'legacy_json_imported'"
+            ).fetchone()
+            if done:
+                return
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No se pudo importar {path}: {e}")
+                return
+
+            rows = []
+            for key, entries in (history.items() if isinstance(history, dict) else []):
+                for entry in entries if isinstance(entries, list) else []:
+                    rows.append((
+                        key, _parse_timestamp(entry.get('timestamp')), entry.get('current_price'),
+                        entry.get('original_price'), entry.get('name'), entry.get('store')
+                    ))
+            with self._conn:
+                self._conn.executemany('''
+                    INSERT INTO price_points (product_key, ts, current_price, original_price, name, store)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO price_history_meta (key, value) VALUES ('legacy_json_imported', ?)",
+                    (datetime.now().isoformat(),)
+                )
+            logger.info(f"{len(rows)} registros importados desde {path}")
+
+    def append(self, key: str, name: str, store: str, current_price: Optional[float],
+               original_price: Optional[float], ts: Optional[float] = None):
+        """Agrega una observación; se escribe a disco al completar el lote"""
+        point = (ts if ts is not None else time.time(), current_price, original_price)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = (name, store, [point])
+            else:
+                pending[2].append(point)
+            self._pending_count += 1
+            if self._pending_count >= self.flush_every:
+                self.flush()
+
+    def append_many(self, observations: Iterable[Tuple[str, str, str, Optional[float], Optional[float]]]):
+        """Agrega varias observaciones (clave, nombre, tienda, precio actual, precio original) y las escribe juntas"""
+        now = time.time()
+        with self._lock:
+            for key, name, store, current_price, original_price in observations:
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = (name, store, [(now, current_price, original_price)])
+                else:
+                    pending[2].append((now, current_price, original_price))
+                self._pending_count += 1
+            self.flush()
+
+    def flush(self):
+        """Escribe las observaciones pendientes en una sola transacción"""
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [
+                (key, ts, current_price, original_price, name, store)
+                for key, (name, store, points) in self._pending.items()
+                for ts, current_price, original_price in points
+            ]
+            try:
+                with self._conn:
+                    self._conn.executemany('''
+                        INSERT INTO price_points (product_key, ts, current_price, original_price, name, store)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error guardando historial de precios: {e}")
+                return
+            self._pending.clear()
+            self._pending_count = 0
+
+    def prune(self, keep_last: int = MAX_POINTS_PER_PRODUCT):
+        """Descarta las observaciones más antiguas de cada producto por encima de `keep_last`"""
+        self.flush()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                DELETE FROM price_points WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (PARTITION BY product_key ORDER BY ts DESC, rowid DESC) AS position
+                        FROM price_points
+                    ) WHERE position > ?
+                )
+            ''', (keep_last,))
+
+    def get_series(self, key: str, limit: Optional[int] = None) -> Optional[PriceSeries]:
+        """Últimas `limit` observaciones del producto (incluye las pendientes), o None si no hay"""
+        with self._lock:
+            if limit is None:
+                rows = self._conn.execute('''
+                    SELECT ts, current_price, original_price, name, store FROM price_points
+                    WHERE product_key = ? ORDER BY ts, rowid
+                ''', (key,)).fetchall()
+            else:
+                rows = self._conn.execute('''
+                    SELECT ts, current_price, original_price, name, store FROM (
+                        SELECT rowid AS position, * FROM price_points
+                        WHERE product_key = ? ORDER BY ts DESC, rowid DESC LIMIT ?
+                    ) ORDER BY ts, position
+                ''', (key, limit)).fetchall()
+            pending = self._pending.get(key)
+
+        points = [row[:3] for row in rows]
+        name, store = (rows[-1][3], rows[-1][4]) if rows else ('', '')
+        if pending is not None:
+            name, store = pending[0], pending[1]
+            points.extend(pending[2])
+        if not points:
+            return None
+        return _build_series(key, name, store, points).tail(limit)
+
+    def _select_points(self, limit: Optional[int], keys: Optional[List[str]] = None) -> List[tuple]:
+        where = f"WHERE product_key IN ({', '.join('?' * len(keys))})" if keys is not None else ''
+        return self._conn.execute(f'''
+            SELECT product_key, ts, current_price, original_price, name, store FROM (
+                SELECT *, rowid AS row_id,
+                       ROW_NUMBER() OVER (PARTITION BY product_key ORDER BY ts DESC, rowid DESC) AS position
+                FROM price_points {where}
+            ) WHERE ? IS NULL OR position <= ?
+            ORDER BY product_key, ts, row_id
+        ''', (*(keys or ()), limit, limit)).fetchall()
+
+    def all_series(self, limit: Optional[int] = None, min_points: int = 1,
+                   keys: Optional[Iterable[str]] = None) -> Dict[str, PriceSeries]:
+        """Historial de los productos con al menos `min_points` observaciones (incluye las pendientes)
+
+        Con `keys` solo se leen esos productos (por el índice); sin `keys`, toda la tabla.
+        """
+        with self._lock:
+            if keys is None:
+                rows = self._select_points(limit)
+                pending = self._pending
+            else:
+                keys = list(dict.fromkeys(keys))
+                rows = []
+                for start in range(0, len(keys), KEY_CHUNK):
+                    rows.extend(self._select_points(limit, keys[start:start + KEY_CHUNK]))
+                pending = {key: self._pending[key] for key in keys if key in self._pending}
+            pending = {key: (name, store, list(points)) for key, (name, store, points) in pending.items()}
+
+        grouped: Dict[str, Tuple[str, str, List[Point]]] = {}
+        for key, ts, current_price, original_price, name, store in rows:
+            entry = grouped.get(key)
+            if entry is None:
+                entry = grouped[key] = (name, store, [])
+            entry[2].append((ts, current_price, original_price))
+        for key, (name, store, points) in pending.items():
+            previous = grouped.get(key)
+            grouped[key] = (name, store, (previous[2] if previous else []) + points)
+
+        series = {}
+        for key, (name, store, points) in grouped.items():
+            if limit is not None:
+                points = points[-limit:]
+            if len(points) >= min_points:
+                series[key] = _build_series(key, name, store, points)
+        return series
+
+    def last_timestamps(self, keys: Iterable[str]) -> Dict[str, float]:
+        """Marca de tiempo de la última observación de cada producto (solo los que tienen historial)"""
+        keys = list(dict.fromkeys(keys))
+        last = {}
+        with self._lock:
+            for start in range(0, len(keys), KEY_CHUNK):
+                chunk = keys[start:start + KEY_CHUNK]
+                last.update(self._conn.execute(f'''
+                    SELECT product_key, MAX(ts) FROM price_points
+                    WHERE product_key IN ({', '.join('?' * len(chunk))}) GROUP BY product_key
+                ''', chunk).fetchall())
+            for key in keys:
+                pending = self._pending.get(key)
+                if pending is not None:
+                    # Igual que el último punto de get_series/all_series: lo pendiente va al final
+                    last[key] = pending[2][-1][0]
+        return last
+
+    def latest(self) -> List[Dict]:
+        """Última observación de cada producto"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT product_key, name, store, current_price, original_price, MAX(ts)
+                FROM price_points GROUP BY product_key
+            ''').fetchall()
+        return [
+            {'key': key, 'name': name, 'store': store, 'current_price': current_price,
+             'original_price': original_price, 'timestamp': ts}
+            for key, name, store, current_price, original_price, ts in rows
+        ]
+
+    def count_products(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(DISTINCT product_key) FROM price_points').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -8,10 +8,10 @@ import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
-import json
 import os
 import logging
 from dataclasses import dataclass
+from collections import OrderedDict
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
@@ -21,6 +21,20 @@ import pickle
 import warnings
 warnings.filterwarnings('ignore')
 
+from utils.price_history_store import PriceHistoryStore, PriceSeries, LEGACY_JSON_FILE, MAX_POINTS_PER_PRODUCT
+
+# Observaciones por producto que se usan para entrenar y predecir
+HISTORY_POINTS = MAX_POINTS_PER_PRODUCT
+
+# Predicciones recordadas por (producto, última observación del historial)
+PREDICTION_CACHE_SIZE = 10000
+
+# Orden de las características (el mismo en entrenamiento y predicción)
+FEATURE_COLUMNS = [
+    'current_price', 'original_price', 'discount', 'day_of_week', 'day_of_month', 'month',
+    'price_change', 'price_volatility', 'price_moving_avg_3', 'price_moving_avg_7'
+]
+
 @dataclass
 class PricePrediction:
     """Resultado de predicción de precio"""
@@ -38,18 +52,22 @@ class PricePredictor:
         self.data_dir = data_dir
         self.logger = logging.getLogger(__name__)
         self.models_dir = os.path.join(data_dir, "ml_models")
-        self.price_history_file = os.path.join(data_dir, "price_history.json")
         
         # Crear directorio de modelos si no existe
         if not os.path.exists(self.models_dir):
             os.makedirs(self.models_dir)
         
-        # Cargar datos históricos
-        self.price_history = self._load_price_history()
+        # Historial de precios compartido con el analizador
+        self.history_store = PriceHistoryStore(
+            os.path.join(data_dir, "price_history.db"),
+            legacy_json=os.path.join(data_dir, LEGACY_JSON_FILE)
+        )
         
         # Modelos de ML
         self.models = {}
         self.scalers = {}
+        # (clave, ts de la última observación) -> ((precio actual, precio original, día), predicción)
+        self._prediction_cache: "OrderedDict[Tuple[str, float], Tuple[Tuple, PricePrediction]]" = OrderedDict()
         
         # Configuración
         self.min_data_points = 10
@@ -59,24 +77,6 @@ class PricePredictor:
         # Cargar modelos entrenados
         self._load_trained_models()
     
-    def _load_price_history(self) -> Dict[str, List[Dict]]:
-        """Carga historial de precios"""
-        try:
-            if os.path.exists(self.price_history_file):
-                with open(self.price_history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.logger.warning(f"Error cargando historial de precios: {e}")
-        return {}
-    
-    def _save_price_history(self):
-        """Guarda historial de precios"""
-        try:
-            with open(self.price_history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.price_history, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            self.logger.error(f"Error guardando historial de precios: {e}")
-    
     def _load_trained_models(self):
         """Carga modelos entrenados"""
         try:
@@ -126,88 +126,71 @@ class PricePredictor:
         """Genera clave única para el producto"""
         return f"{store}_{product_name.lower().replace(' ', '_')[:50]}"
     
-    def _prepare_features(self, price_history: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    def _prepare_features(self, price_history: PriceSeries) -> Tuple[np.ndarray, np.ndarray]:
         """Prepara características para el modelo de ML"""
         if len(price_history) < self.min_data_points:
             return None, None
+        return self._prepare_features_batch([price_history])
+    
+    def _prepare_features_batch(self, histories: List[PriceSeries]) -> Tuple[np.ndarray, np.ndarray]:
+        """Características de varios productos a la vez
+        
+        Una fila por observación salvo la última de cada producto (su objetivo es el precio
+        siguiente); las ventanas móviles y variaciones se calculan por producto con groupby.
+        """
+        histories = [history for history in histories if len(history) >= self.min_data_points]
+        if not histories:
+            return None, None
         
-        # Convertir a DataFrame
-        df = pd.DataFrame(price_history)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Crear características
-        features = []
-        targets = []
-        
-        for i in range(len(df) - 1):
-            # Características de precio
-            current_price = df.iloc[i]['current_price']
-            original_price = df.iloc[i]['original_price']
-            
-            # Características de tiempo
-            day_of_week = df.iloc[i]['timestamp'].dayofweek
-            day_of_month = df.iloc[i]['timestamp'].day
-            month = df.iloc[i]['timestamp'].month
-            
-            # Características de tendencia
-            if i > 0:
-                price_change = (current_price - df.iloc[i-1]['current_price']) / df.iloc[i-1]['current_price']
-                price_volatility = np.std([p['current_price'] for p in price_history[max(0, i-5):i+1]])
-            else:
-                price_change = 0
-                price_volatility = 0
-            
-            # Características de descuento
-            discount = (original_price - current_price) / original_price if original_price > 0 else 0
-            
-            # Características de movimiento de precio
-            price_moving_avg_3 = np.mean([p['current_price'] for p in price_history[max(0, i-2):i+1]])
-            price_moving_avg_7 = np.mean([p['current_price'] for p in price_history[max(0, i-6):i+1]])
-            
-            # Vector de características
-            feature_vector = [
-                current_price,
-                original_price,
-                discount,
-                day_of_week,
-                day_of_month,
-                month,
-                price_change,
-                price_volatility,
-                price_moving_avg_3,
-                price_moving_avg_7
-            ]
-            
-            features.append(feature_vector)
-            targets.append(df.iloc[i+1]['current_price'])
-        
-        return np.array(features), np.array(targets)
+        # Convertir a DataFrame (un producto detrás de otro, cada uno en orden cronológico)
+        df = pd.DataFrame({
+            'product': np.repeat(np.arange(len(histories)), [len(history) for history in histories]),
+            'timestamp': pd.to_datetime(np.concatenate([history.local_datetimes() for history in histories])),
+            'current_price': np.concatenate([history.current_prices for history in histories]),
+            'original_price': np.concatenate([history.original_prices for history in histories])
+        })
+        df = df.sort_values(['product', 'timestamp'], kind='stable', ignore_index=True)
+        prices = df.groupby('product', sort=False)['current_price']
+        
+        # Características de tendencia (el primer registro de cada producto no tiene anterior)
+        df['price_change'] = prices.pct_change(fill_method=None).fillna(0.0)
+        df['price_volatility'] = prices.rolling(6, min_periods=1).std(ddof=0).reset_index(level=0, drop=True)
+        
+        # Características de descuento
+        original = df['original_price'].to_numpy()
+        current = df['current_price'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['discount'] = np.where(original > 0, (original - current) / original, 0.0)
+        
+        # Características de movimiento de precio
+        df['price_moving_avg_3'] = prices.rolling(3, min_periods=1).mean().reset_index(level=0, drop=True)
+        df['price_moving_avg_7'] = prices.rolling(7, min_periods=1).mean().reset_index(level=0, drop=True)
+        
+        # Características de tiempo
+        df['day_of_week'] = df['timestamp'].dt.dayofweek
+        df['day_of_month'] = df['timestamp'].dt.day
+        df['month'] = df['timestamp'].dt.month
+        
+        # Objetivo: el precio de la observación siguiente del mismo producto
+        df['target'] = prices.shift(-1)
+        df = df[df['product'].duplicated(keep='last')]
+        
+        return df[FEATURE_COLUMNS].to_numpy(dtype=float), df['target'].to_numpy(dtype=float)
     
     def train_models(self, force_retrain: bool = False):
         """Entrena los modelos de ML"""
-        if not self.price_history:
+        all_history = self.history_store.all_series(HISTORY_POINTS)
+        if not all_history:
             self.logger.warning("No hay datos históricos para entrenar modelos")
             return
         
-        # Preparar datos de entrenamiento
-        all_features = []
-        all_targets = []
+        # Preparar datos de entrenamiento (todos los productos en una sola pasada)
+        X, y = self._prepare_features_batch(list(all_history.values()))
         
-        for key, history in self.price_history.items():
-            features, targets = self._prepare_features(history)
-            if features is not None and targets is not None:
-                all_features.append(features)
-                all_targets.append(targets)
-        
-        if not all_features:
+        if X is None:
             self.logger.warning("No hay suficientes datos para entrenar modelos")
             return
         
-        # Combinar todos los datos
-        X = np.vstack(all_features)
-        y = np.concatenate(all_targets)
-        
         # Dividir en train/test
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
@@ -240,6 +223,9 @@ class PricePredictor:
         
         self.models['random_forest'] = rf_model
         
+        # Las predicciones recordadas eran de los modelos anteriores
+        self._prediction_cache.clear()
+        
         # Guardar modelos
         self._save_trained_models()
         
@@ -251,44 +237,133 @@ class PricePredictor:
         product_name = product.get('name', '')
         key = self._generate_product_key(product_name, store)
         
-        if key not in self.price_history:
+        history = self.history_store.get_series(key, HISTORY_POINTS)
+        if history is None or len(history) < self.min_data_points:
             return None
         
-        history = self.price_history[key]
-        if len(history) < self.min_data_points:
+        return self._predict_batch([(key, product, history)])[0]
+    
+    def predict_prices(self, products: List[Dict], store: Optional[str] = None) -> List[Optional[PricePrediction]]:
+        """Predice un lote de productos (tienda = `store` o la de cada producto)
+        
+        Primero consulta solo la última observación de cada producto: los que no cambiaron reutilizan
+        la predicción anterior. Para el resto lee el historial, arma una sola matriz de características
+        y llama a `predict` una vez por modelo.
+        """
+        if not products or 'standard' not in self.scalers:
+            return [None] * len(products)
+        
+        keys = [self._generate_product_key(product.get('name', ''), store or product.get('store', ''))
+                for product in products]
+        
+        # Última marca de tiempo por producto (consulta indexada), sin leer el historial
+        last_timestamps = self.history_store.last_timestamps(keys)
+        today = datetime.now().date()
+        results: List[Optional[PricePrediction]] = [None] * len(products)
+        misses = []
+        for index, (key, product) in enumerate(zip(keys, products)):
+            if key not in last_timestamps:
+                continue
+            cached = self._cached_prediction(key, last_timestamps[key], product, today)
+            if cached is not None:
+                results[index] = cached
+            else:
+                misses.append(index)
+        
+        if misses:
+            histories = self.history_store.all_series(
+                HISTORY_POINTS, self.min_data_points, keys=[keys[index] for index in misses]
+            )
+            # Ya se consultó la memoria para estos productos: _predict_batch no la vuelve a mirar
+            predictions = self._predict_batch(
+                [(keys[index], products[index], histories.get(keys[index])) for index in misses], use_cache=False
+            )
+            for index, prediction in zip(misses, predictions):
+                results[index] = prediction
+        return results
+    
+    def _cached_prediction(self, key: str, last_ts: float, product: Dict, today) -> Optional[PricePrediction]:
+        """Predicción anterior si el historial, los precios y el día no cambiaron"""
+        cache_key = (key, float(last_ts))
+        cached = self._prediction_cache.get(cache_key)
+        if cached is None:
             return None
-        
-        # Preparar características del producto actual
         current_price = self._extract_numeric_price(product.get('current_price', ''))
         original_price = self._extract_numeric_price(product.get('original_price', ''))
-        
-        if not current_price or not original_price:
+        if cached[0] != (current_price, original_price, today):
             return None
-        
-        # Crear vector de características
-        feature_vector = self._create_feature_vector(product, history)
-        
-        if feature_vector is None:
-            return None
-        
-        # Escalar características
+        self._prediction_cache.move_to_end(cache_key)
+        return cached[1]
+    
+    def _predict_batch(self, items: List[Tuple[str, Dict, Optional[PriceSeries]]],
+                       use_cache: bool = True) -> List[Optional[PricePrediction]]:
+        """Predicciones para (clave, producto, historial); una llamada a `predict` por modelo para todo el lote
+
+        Con `use_cache=False` no se consultan predicciones anteriores (el llamador ya lo hizo),
+        pero las nuevas sí se guardan.
+        """
+        results: List[Optional[PricePrediction]] = [None] * len(items)
         if 'standard' not in self.scalers:
-            return None
+            return results
+        
+        today = datetime.now().date()
+        pending = []
+        for index, (key, product, history) in enumerate(items):
+            if history is None or len(history) < self.min_data_points:
+                continue
+            
+            # Preparar características del producto actual
+            current_price = self._extract_numeric_price(product.get('current_price', ''))
+            original_price = self._extract_numeric_price(product.get('original_price', ''))
+            
+            if not current_price or not original_price:
+                continue
+            
+            # Mismo historial, mismos precios y mismo día: la predicción anterior sigue valiendo
+            cache_key = (key, float(history.timestamps[-1]))
+            if use_cache:
+                cached = self._cached_prediction(key, history.timestamps[-1], product, today)
+                if cached is not None:
+                    results[index] = cached
+                    continue
+            
+            # Crear vector de características
+            feature_vector = self._create_feature_vector(product, history)
+            
+            if feature_vector is None:
+                continue
+            
+            pending.append((index, cache_key, current_price, original_price, history, feature_vector))
         
-        feature_scaled = self.scalers['standard'].transform([feature_vector])
+        if not pending:
+            return results
         
-        # Hacer predicciones
-        predictions = {}
+        # Escalar características y hacer predicciones (todas las filas juntas)
+        features_scaled = self.scalers['standard'].transform(np.vstack([item[5] for item in pending]))
+        model_predictions = {}
         for model_name, model in self.models.items():
             try:
-                pred = model.predict(feature_scaled)[0]
-                predictions[model_name] = max(0, pred)  # Precio no puede ser negativo
+                model_predictions[model_name] = np.maximum(0, model.predict(features_scaled))  # Precio no puede ser negativo
             except Exception as e:
                 self.logger.error(f"Error en predicción con {model_name}: {e}")
         
-        if not predictions:
-            return None
+        if not model_predictions:
+            return results
         
+        for row, (index, cache_key, current_price, original_price, history, feature_vector) in enumerate(pending):
+            predictions = {model_name: values[row] for model_name, values in model_predictions.items()}
+            prediction = self._build_prediction(predictions, current_price, history, feature_vector)
+            results[index] = prediction
+            
+            self._prediction_cache[cache_key] = ((current_price, original_price, today), prediction)
+            self._prediction_cache.move_to_end(cache_key)
+            while len(self._prediction_cache) > PREDICTION_CACHE_SIZE:
+                self._prediction_cache.popitem(last=False)
+        return results
+    
+    def _build_prediction(self, predictions: Dict[str, float], current_price: float,
+                          history: PriceSeries, feature_vector: np.ndarray) -> PricePrediction:
+        """Arma el resultado a partir de la predicción de cada modelo"""
         # Calcular predicción promedio
         predicted_price = np.mean(list(predictions.values()))
         
@@ -324,7 +399,7 @@ class PricePredictor:
             factors=factors
         )
     
-    def _create_feature_vector(self, product: Dict, history: List[Dict]) -> Optional[np.ndarray]:
+    def _create_feature_vector(self, product: Dict, history: PriceSeries) -> Optional[np.ndarray]:
         """Crea vector de características para predicción"""
         try:
             current_price = self._extract_numeric_price(product.get('current_price', ''))
@@ -343,17 +418,18 @@ class PricePredictor:
             discount = (original_price - current_price) / original_price if original_price > 0 else 0
             
             # Características de tendencia
+            prices = history.current_prices
             if len(history) > 1:
-                prev_price = history[-2]['current_price']
+                prev_price = prices[-2]
                 price_change = (current_price - prev_price) / prev_price
-                price_volatility = np.std([p['current_price'] for p in history[-5:]])
+                price_volatility = np.std(prices[-5:])
             else:
                 price_change = 0
                 price_volatility = 0
             
             # Promedios móviles
-            price_moving_avg_3 = np.mean([p['current_price'] for p in history[-3:]])
-            price_moving_avg_7 = np.mean([p['current_price'] for p in history[-7:]])
+            price_moving_avg_3 = np.mean(prices[-3:])
+            price_moving_avg_7 = np.mean(prices[-7:])
             
             return np.array([
                 current_price,
@@ -413,15 +489,15 @@ class PricePredictor:
         future_price = current_price * (1 + daily_change * days)
         return max(0, future_price)
     
-    def _calculate_volatility(self, history: List[Dict]) -> float:
+    def _calculate_volatility(self, history: PriceSeries) -> float:
         """Calcula la volatilidad del precio"""
         if len(history) < 2:
             return 0.0
         
-        prices = [p['current_price'] for p in history]
-        returns = [(prices[i] - prices[i-1]) / prices[i-1] for i in range(1, len(prices))]
+        prices = history.current_prices
+        returns = np.diff(prices) / prices[:-1]
         
-        return np.std(returns) if returns else 0.0
+        return float(np.std(returns))
     
     def _generate_prediction_recommendation(self, predicted_price: float, current_price: float, 
                                           confidence: float, trend: str) -> str:
@@ -480,30 +556,13 @@ class PricePredictor:
         if not current_price or not original_price:
             return
         
-        if key not in self.price_history:
-            self.price_history[key] = []
-        
-        # Agregar nueva entrada
-        entry = {
-            'name': product_name,
-            'store': store,
-            'current_price': current_price,
-            'original_price': original_price,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        self.price_history[key].append(entry)
-        
-        # Mantener solo últimos 50 registros
-        if len(self.price_history[key]) > 50:
-            self.price_history[key] = self.price_history[key][-50:]
-        
-        self._save_price_history()
+        # Agregar nueva entrada (se guarda por lotes)
+        self.history_store.append(key, product_name, store, current_price, original_price)
     
     def get_prediction_statistics(self) -> Dict[str, Any]:
         """Obtiene estadísticas de predicciones"""
         stats = {
-            'total_products': len(self.price_history),
+            'total_products': self.history_store.count_products(),
             'products_with_sufficient_data': 0,
             'average_confidence': 0.0,
             'trend_distribution': {'increasing': 0, 'decreasing': 0, 'stable': 0},
@@ -512,24 +571,22 @@ class PricePredictor:
         
         confidences = []
         trends = []
+        items = []
         
-        for key, history in self.price_history.items():
-            if len(history) >= self.min_data_points:
-                stats['products_with_sufficient_data'] += 1
-                
-                # Simular predicción para estadísticas
-                if history:
-                    latest = history[-1]
-                    product = {
-                        'name': latest.get('name', ''),
-                        'current_price': str(latest.get('current_price', '')),
-                        'original_price': str(latest.get('original_price', ''))
-                    }
-                    
-                    prediction = self.predict_price(product, latest.get('store', ''))
-                    if prediction:
-                        confidences.append(prediction.confidence)
-                        trends.append(prediction.trend)
+        for key, history in self.history_store.all_series(HISTORY_POINTS, self.min_data_points).items():
+            stats['products_with_sufficient_data'] += 1
+            
+            # Simular predicción para estadísticas
+            items.append((key, {
+                'name': history.name or '',
+                'current_price': str(history.current_prices[-1]),
+                'original_price': str(history.original_prices[-1])
+            }, history))
+        
+        for prediction in self._predict_batch(items):
+            if prediction:
+                confidences.append(prediction.confidence)
+                trends.append(prediction.trend)
         
         if confidences:
             stats['average_confidence'] = np.mean(confidences)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Emparejamiento de productos entre tiendas
+Normaliza los nombres (sin acentos, unidades unidas, sin palabras vacías), extrae marca y
+modelo, y asigna a cada producto un identificador de grupo persistente: "el mismo producto
+en Paris, Ripley y Falabella" es una consulta y no una comparación de todos contra todos
+"""
+
+import os
+import re
+import math
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from utils.deal_store import fold_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("data", "product_clusters.db")
+
+# Puntaje mínimo para considerar dos publicaciones el mismo producto
+MATCH_THRESHOLD = 0.6
+# Palabras con más publicaciones que esto no se usan para buscar candidatos
+MAX_PROBE_POSTINGS = 500
+
+STOPWORDS = frozenset({
+    'de', 'del', 'la', 'el', 'los', 'las', 'y', 'o', 'con', 'sin', 'para', 'por', 'en', 'a',
+    'un', 'una', 'the', 'and', 'with', 'for', 'color', 'unidad', 'unidades', 'pack', 'set'
+})
+
+BRANDS = frozenset({
+    'samsung', 'lg', 'sony', 'apple', 'xiaomi', 'motorola', 'huawei', 'oppo', 'realme', 'honor',
+    'hp', 'lenovo', 'dell', 'asus', 'acer', 'msi', 'microsoft', 'nintendo', 'playstation', 'xbox',
+    'philips', 'panasonic', 'jbl', 'bose', 'tcl', 'hisense', 'hyundai', 'caixun', 'noblex',
+    'mabe', 'whirlpool', 'fensa', 'electrolux', 'bosch', 'midea', 'oster', 'thomas', 'ursus',
+    'somela', 'kitchenaid', 'nespresso', 'dyson', 'karcher', 'makita', 'dewalt', 'black',
+    'nike', 'adidas', 'puma', 'reebok', 'skechers', 'fila', 'converse', 'vans', 'columbia',
+    'rosen', 'cic', 'mantahue', 'drimkip', 'lego', 'mattel', 'canon', 'nikon', 'garmin', 'kingston'
+})
+
+# Unidades que se pegan al número: "128 GB" y "128GB" quedan como "128gb"
+_UNITS = r'gb|tb|mb|mah|hz|w|kg|g|ml|l|lt|cm|mm|m|pulgadas|pulg|in'
+_NUMBER_UNIT = re.compile(rf'(\d+(?:[.,]\d+)?)\s*(?:({_UNITS})\b|(")|(\'\'))')
+_ATTRIBUTE = re.compile(rf'^\d+(?:[.,]\d+)?({_UNITS})$')
+_TOKEN = re.compile(r'[\w.,]+')
+_HAS_DIGIT = re.compile(r'\d')
+_HAS_ALPHA = re.compile(r'[a-z]')
+
+@dataclass
+class ProductSignature:
+    """Nombre reducido a lo que identifica al producto"""
+    tokens: FrozenSet[str]
+    brand: Optional[str]
+    models: FrozenSet[str]
+    attributes: Dict[str, str]  # unidad -> valor ("gb" -> "128gb")
+
+def _join_unit(match) -> str:
+    number = match.group(1).replace(',', '.')
+    unit = match.group(2) or 'pulg'
+    if unit in ('pulgadas', 'in'):
+        unit = 'pulg'
+    elif unit == 'lt':
+        unit = 'l'
+    return f"{number}{unit}"
+
+def normalize_tokens(name: str) -> List[str]:
+    """Palabras normalizadas del nombre: "Smart TV 55\" Samsung" -> ['smart', 'tv', '55pulg', 'samsung']"""
+    text = _NUMBER_UNIT.sub(_join_unit, fold_text(name))
+    tokens = []
+    for token in _TOKEN.findall(text):
+        token = token.strip('.,')
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def make_signature(name: str) -> ProductSignature:
+    tokens = normalize_tokens(name or '')
+    brand = next((token for token in tokens if token in BRANDS), None)
+    attributes = {}
+    models = set()
+    for token in tokens:
+        attribute = _ATTRIBUTE.match(token)
+        if attribute:
+            attributes[attribute.group(1)] = token
+        elif len(token) >= 3 and _HAS_DIGIT.search(token) and _HAS_ALPHA.search(token):
+            # Códigos con letras y números ("a54", "55ux7500", "rtx4060") identifican el modelo
+            models.add(token)
+    return ProductSignature(frozenset(tokens), brand, frozenset(models), attributes)
+
+def match_score(a: ProductSignature, b: ProductSignature) -> float:
+    """Similitud entre 0 y 1; marcas, modelos o capacidades distintas la anulan"""
+    if a.brand and b.brand and a.brand != b.brand:
+        return 0.0
+    if a.models and b.models and a.models.isdisjoint(b.models):
+        return 0.0
+    for unit, value in a.attributes.items():
+        if b.attributes.get(unit, value) != value:
+            return 0.0
+
+    union = len(a.tokens | b.tokens)
+    if not union:
+        return 0.0
+    score = len(a.tokens & b.tokens) / union
+    if a.models & b.models:
+        # Mismo código de modelo: coincide aunque una tienda agregue más palabras al nombre
+        score = max(score, 0.5 + score / 2)
+    return score
+
+def product_key(name: str, store: str) -> str:
+    """Identificador de una publicación (tienda + nombre sin acentos ni mayúsculas)"""
+    return f"{(store or '').lower()}:{' '.join(fold_text(name or '').split())}"
+
+class ProductMatcher:
+    """Índice invertido de palabras + grupos persistentes de publicaciones del mismo producto"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, threshold: float = MATCH_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        # product_key -> (nombre, tienda, firma, grupo)
+        self._products: Dict[str, Tuple[str, str, ProductSignature, int]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._clusters: Dict[int, Set[str]] = {}
+        self._next_cluster = 1
+        # Última fila de product_clusters ya cargada (otras instancias y procesos escriben en el mismo archivo)
+        self._last_rowid = 0
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS product_clusters (
+                    product_key TEXT PRIMARY KEY,
+                    cluster_id INTEGER NOT NULL,
+                    name TEXT,
+                    store TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_product_clusters_cluster ON product_clusters (cluster_id)')
+            self._sync(conn)
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Transacciones explícitas: la asignación de grupos se hace bajo BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _reset(self):
+        """Descarta el estado en memoria y lo vuelve a cargar desde la base"""
+        self._products.clear()
+        self._postings.clear()
+        self._clusters.clear()
+        self._next_cluster = 1
+        self._last_rowid = 0
+        conn = self._connect()
+        try:
+            self._sync(conn)
+        finally:
+            conn.close()
+
+    def _sync(self, conn: sqlite3.Connection):
+        """Carga las publicaciones que otras conexiones agregaron desde la última lectura"""
+        rows = conn.execute('''
+            SELECT rowid, product_key, cluster_id, name, store FROM product_clusters
+            WHERE rowid > ? ORDER BY rowid
+        ''', (self._last_rowid,)).fetchall()
+        for rowid, key, cluster_id, name, store in rows:
+            if key not in self._products:
+                self._add(key, name, store, make_signature(name), cluster_id)
+            self._last_rowid = rowid
+
+    def _add(self, key: str, name: str, store: str, signature: ProductSignature, cluster_id: int):
+        self._products[key] = (name, store, signature, cluster_id)
+        for token in signature.tokens:
+            self._postings.setdefault(token, set()).add(key)
+        self._clusters.setdefault(cluster_id, set()).add(key)
+        self._next_cluster = max(self._next_cluster, cluster_id + 1)
+
+    def _candidates(self, signature: ProductSignature, min_score: float) -> Set[str]:
+        """Publicaciones que pueden alcanzar `min_score` (filtro por prefijo de Jaccard)
+
+        Con Jaccard >= t deben compartir al menos una de las |A| - ceil(t·|A|) + 1 palabras
+        menos frecuentes de A. Las palabras muy comunes ("smart", "tv", la marca) no se
+        recorren salvo que no quede otra; los códigos de modelo se consultan siempre.
+        """
+        tokens = sorted(signature.tokens, key=lambda token: len(self._postings.get(token, ())))
+        prefix = tokens[:len(tokens) - math.ceil(min_score * len(tokens)) + 1]
+        probe = [token for token in prefix if len(self._postings.get(token, ())) <= MAX_PROBE_POSTINGS]
+        if not probe:
+            probe = prefix[:1]
+        candidates: Set[str] = set()
+        for token in probe:
+            candidates.update(self._postings.get(token, ()))
+        for model in signature.models:
+            candidates.update(self._postings.get(model, ()))
+        return candidates
+
+    def _best_match(self, signature: ProductSignature) -> Optional[Tuple[float, str]]:
+        best = None
+        for key in self._candidates(signature, self.threshold):
+            score = match_score(signature, self._products[key][2])
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, key)
+        return best
+
+    def assign(self, items: Iterable[Tuple[str, str]]) -> List[int]:
+        """Grupo de cada (nombre, tienda); las publicaciones nuevas se unen al grupo más parecido o abren uno
+
+        Las publicaciones nuevas se emparejan y se guardan dentro de una transacción BEGIN IMMEDIATE,
+        después de cargar lo que escribieron otras conexiones: dos instancias (o procesos) sobre el
+        mismo archivo nunca entregan el mismo identificador a productos distintos.
+        """
+        items = [(name, store, product_key(name, store)) for name, store in items]
+        with self._lock:
+            if all(key in self._products for _, _, key in items):
+                return [self._products[key][3] for _, _, key in items]
+
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                self._sync(conn)
+                cluster_ids = []
+                new_rows = []
+                for name, store, key in items:
+                    known = self._products.get(key)
+                    if known is not None:
+                        cluster_ids.append(known[3])
+                        continue
+
+                    signature = make_signature(name)
+                    best = self._best_match(signature)
+                    if best is not None:
+                        cluster_id = self._products[best[1]][3]
+                    else:
+                        # Con la base bloqueada y sincronizada, el siguiente id no lo tiene nadie más
+                        cluster_id = self._next_cluster
+                    self._add(key, name, store, signature, cluster_id)
+                    new_rows.append((key, cluster_id, name, store))
+                    cluster_ids.append(cluster_id)
+
+                conn.executemany('''
+                    INSERT INTO product_clusters (product_key, cluster_id, name, store)
+                    VALUES (?, ?, ?, ?)
+                ''', new_rows)
+                self._last_rowid = conn.execute('SELECT MAX(rowid) FROM product_clusters').fetchone()[0] or 0
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                # Lo agregado en memoria sin guardar se descarta recargando desde la base
+                self._reset()
+                raise
+            finally:
+                conn.close()
+        return cluster_ids
+
+    def refresh(self):
+        """Carga lo que otras conexiones agregaron (para consultar grupos sin asignar)"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._sync(conn)
+            finally:
+                conn.close()
+
+    def cluster_of(self, name: str, store: str) -> Optional[int]:
+        known = self._products.get(product_key(name, store))
+        return known[3] if known is not None else None
+
+    def find_cluster(self, name: str, store: Optional[str] = None) -> Optional[int]:
+        """Grupo de la publicación o, si no está registrada, el de su mejor coincidencia (sin guardar nada)"""
+        with self._lock:
+            if store is not None:
+                cluster_id = self.cluster_of(name, store)
+                if cluster_id is not None:
+                    return cluster_id
+            best = self._best_match(make_signature(name))
+            return self._products[best[1]][3] if best is not None else None
+
+    def members(self, cluster_id: int, exclude_store: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(nombre, tienda) de las publicaciones del grupo"""
+        with self._lock:
+            keys = list(self._clusters.get(cluster_id, ()))
+            members = [self._products[key][:2] for key in keys]
+        if exclude_store:
+            members = [member for member in members if member[1] != exclude_store]
+        return members
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Política de reintentos asíncrona
+Backoff exponencial con jitter, respeto de Retry-After y presupuesto de reintentos por URL
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+
+import httpx
+
+from config.settings import RETRY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class RetryPolicy:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or RETRY_CONFIG
+        self.max_attempts = self.config.get('max_attempts', 3)
+        self.base_delay = self.config.get('delay_between_attempts', 2)
+        self.backoff_factor = self.config.get('backoff_factor', 2)
+        self.max_delay = self.config.get('max_delay', 10)
+        self.jitter = self.config.get('jitter', 0.5)
+        self.retry_statuses = set(self.config.get('retry_statuses', [429, 500, 502, 503, 504]))
+        self.max_retry_after = self.config.get('max_retry_after', 60)
+        self.budget_per_url = self.config.get('retry_budget_per_url', 6)
+        self.budget_window = self.config.get('retry_budget_window', 600)
+
+        # Marcas de tiempo de los reintentos recientes de cada URL (solo URLs con reintentos en la ventana)
+        self._retries: Dict[str, deque] = {}
+        self._last_sweep = time.monotonic()
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Clasifica el error: fallos de red y códigos 429/5xx se reintentan, el resto no"""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in self.retry_statuses
+        return isinstance(error, httpx.TransportError)
+
+    def _parse_retry_after(self, error: Exception) -> Optional[float]:
+        """Lee la cabecera Retry-After (segundos o fecha HTTP)"""
+        if not isinstance(error, httpx.HTTPStatusError):
+            return None
+        value = error.response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def compute_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Espera antes del reintento `attempt` (1 = primer reintento); None si no conviene reintentar"""
+        retry_after = self._parse_retry_after(error)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+
+        delay = min(self.max_delay, self.base_delay * (self.backoff_factor ** (attempt - 1)))
+        return delay * (1 - random.uniform(0, self.jitter))
+
+    def _consume_budget(self, url: str) -> bool:
+        """Registra un reintento para `url` si todavía queda presupuesto en la ventana"""
+        now = time.monotonic()
+        if now - self._last_sweep > self.budget_window:
+            self._sweep(now)
+        history = self._retries.setdefault(url, deque())
+        while history and now - history[0] > self.budget_window:
+            history.popleft()
+        if len(history) >= self.budget_per_url:
+            return False
+        history.append(now)
+        return True
+
+    def _sweep(self, now: float):
+        """Olvida las URLs cuyo último reintento ya salió de la ventana (el registro no crece sin límite)"""
+        expired = [url for url, history in self._retries.items() if not history or now - history[-1] > self.budget_window]
+        for url in expired:
+            del self._retries[url]
+        self._last_sweep = now
+
+    async def call(self, url: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta `func` con reintentos; relanza el último error si se agotan"""
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+
+                delay = self.compute_delay(attempt, e)
+                if delay is None:
+                    logger.warning(f"Retry-After demasiado largo para {url}, no se reintenta")
+                    raise
+                if not self._consume_budget(url):
+                    logger.warning(f"Presupuesto de reintentos agotado para {url}")
+                    raise
+
+                logger.info(f"Reintento {attempt}/{self.max_attempts - 1} para {url} en {delay:.1f}s ({e})")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+_default_policy: Optional[RetryPolicy] = None
+
+def get_retry_policy() -> RetryPolicy:
+    """Política compartida del proceso (el presupuesto por URL es global)"""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = RetryPolicy()
+    return _default_policy
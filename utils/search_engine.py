@@ -8,9 +8,25 @@ import re
 from typing import List, Dict, Optional
 from difflib import SequenceMatcher
 
+from utils.product_matcher import make_signature, match_score
+
+# Productos activos que se consideran al comparar tiendas por palabras clave
+COMPARISON_POOL_SIZE = 1000
+
 class SearchEngine:
     def __init__(self, data_manager):
         self.data_manager = data_manager
+        # Grupos persistentes del mismo producto entre tiendas (los productos se agrupan al guardarse)
+        self.matcher = data_manager.get_product_matcher()
+    
+    def _comparison_pool(self) -> List[Dict]:
+        """Productos activos más recientes, cada uno con el identificador de su grupo"""
+        products = self.data_manager.get_active_products(limit=COMPARISON_POOL_SIZE)
+        products = [product for product in products if product.get('name')]
+        self.matcher.refresh()
+        for product in products:
+            product['cluster_id'] = self.matcher.cluster_of(product['name'], product.get('store', ''))
+        return products
     
     def search_products(self, query: str, store: Optional[str] = None, 
                        min_discount: int = 0, max_results: int = 50) -> List[Dict]:
@@ -20,7 +36,14 @@ class SearchEngine:
         
         query = query.lower().strip()
         
-        # Obtener productos activos
+        # Índice FTS5 sobre todo el catálogo (acentos y prefijos incluidos)
+        results = self.data_manager.search_products_fts(
+            query, store=store, min_discount=min_discount, limit=max_results
+        )
+        if results is not None:
+            return results
+        
+        # Sin FTS5: puntuar en Python los productos más recientes
         products = self.data_manager.get_active_products(store=store, limit=1000)
         
         if not products:
@@ -34,15 +57,8 @@ class SearchEngine:
             
             if score > 0:
                 # Verificar descuento mínimo
-                if min_discount > 0:
-                    discount_str = product.get('discount', '')
-                    if discount_str:
-                        try:
-                            discount_value = int(discount_str.replace('%', '').replace('-', ''))
-                            if discount_value < min_discount:
-                                continue
-                        except:
-                            continue
+                if min_discount > 0 and (product.get('discount_value') or 0) < min_discount:
+                    continue
                 
                 scored_products.append((score, product))
         
@@ -82,16 +98,11 @@ class SearchEngine:
         score += name_similarity * 3.0
         
         # Bonus por descuento alto
-        discount_str = product.get('discount', '')
-        if discount_str:
-            try:
-                discount_value = int(discount_str.replace('%', '').replace('-', ''))
-                if discount_value >= 50:
-                    score += 2.0
-                elif discount_value >= 30:
-                    score += 1.0
-            except:
-                pass
+        discount_value = product.get('discount_value') or 0
+        if discount_value >= 50:
+            score += 2.0
+        elif discount_value >= 30:
+            score += 1.0
         
         return score
     
@@ -100,34 +111,18 @@ class SearchEngine:
         if not product_name:
             return []
         
-        # Obtener todos los productos activos
-        all_products = self.data_manager.get_active_products(limit=1000)
-        
-        if not all_products:
+        # Publicaciones del mismo grupo (en todo el catálogo, no solo las más recientes)
+        self.matcher.refresh()
+        cluster_id = self.matcher.find_cluster(product_name, exclude_store)
+        if cluster_id is None:
             return []
+        members = self.matcher.members(cluster_id, exclude_store=exclude_store)
+        products = self.data_manager.get_active_products_by_name(members)
         
-        # Filtrar productos similares
-        similar_products = []
-        product_name_lower = product_name.lower()
-        
-        for product in all_products:
-            # Excluir productos de la misma tienda si se especifica
-            if exclude_store and product.get('store') == exclude_store:
-                continue
-            
-            # Calcular similitud
-            similarity = self.calculate_product_similarity(product_name_lower, product.get('name', '').lower())
-            
-            if similarity > 0.3:  # Umbral de similitud
-                similar_products.append((similarity, product))
-        
-        # Ordenar por similitud
-        similar_products.sort(key=lambda x: x[0], reverse=True)
-        
-        # Retornar solo los productos (sin puntuación)
-        results = [product for similarity, product in similar_products[:10]]
-        
-        return results
+        # De mayor a menor similitud con el nombre buscado
+        signature = make_signature(product_name)
+        products.sort(key=lambda product: match_score(signature, make_signature(product['name'])), reverse=True)
+        return products[:10]
     
     def calculate_product_similarity(self, name1: str, name2: str) -> float:
         """Calcula la similitud entre dos nombres de productos"""
@@ -180,24 +175,7 @@ class SearchEngine:
     def get_products_by_price_range(self, min_price: float, max_price: float, 
                                    store: Optional[str] = None) -> List[Dict]:
         """Obtiene productos por rango de precio"""
-        products = self.data_manager.get_active_products(store=store, limit=1000)
-        
-        if not products:
-            return []
-        
-        filtered_products = []
-        
-        for product in products:
-            price_str = product.get('current_price', '')
-            if price_str:
-                try:
-                    price_value = self.extract_price_value(price_str)
-                    if min_price <= price_value <= max_price:
-                        filtered_products.append(product)
-                except:
-                    continue
-        
-        return filtered_products
+        return self.data_manager.get_products_by_price_range(min_price, max_price, store=store)
     
     def extract_price_value(self, price_str: str) -> float:
         """Extrae el valor numérico del precio"""
@@ -213,17 +191,10 @@ class SearchEngine:
     
     def get_best_deals(self, limit: int = 10, min_discount: int = 20) -> List[Dict]:
         """Obtiene las mejores ofertas"""
+        # La consulta ya viene ordenada por descuento (mayor primero)
         products = self.data_manager.get_products_by_discount_range(min_discount, 100)
         
-        if not products:
-            return []
-        
-        # Ordenar por porcentaje de descuento (mayor primero)
-        sorted_products = sorted(products, 
-                               key=lambda x: self.extract_discount_value(x.get('discount', '')),
-                               reverse=True)
-        
-        return sorted_products[:limit]
+        return products[:limit]
     
     def extract_discount_value(self, discount_str: str) -> int:
         """Extrae el valor numérico del descuento"""
@@ -243,7 +214,7 @@ class SearchEngine:
             return {}
         
         # Obtener productos de todas las tiendas
-        all_products = self.data_manager.get_active_products(limit=1000)
+        all_products = self._comparison_pool()
         
         if not all_products:
             return {}
@@ -269,9 +240,18 @@ class SearchEngine:
                 product['match_score'] = matches / len(product_keywords)
                 store_products[store].append(product)
         
-        # Ordenar productos por puntuación en cada tienda
+        # Grupos con publicaciones en más de una tienda: el mismo producto para comparar precios
+        cluster_stores = {}
+        for store, products in store_products.items():
+            for product in products:
+                if product['cluster_id'] is not None:
+                    cluster_stores.setdefault(product['cluster_id'], set()).add(store)
+        
+        # Ordenar productos por puntuación en cada tienda (a igual puntuación, primero los comparables)
         for store in store_products:
-            store_products[store].sort(key=lambda x: x.get('match_score', 0), reverse=True)
+            store_products[store].sort(
+                key=lambda x: (x.get('match_score', 0), len(cluster_stores.get(x['cluster_id'], ())) > 1), reverse=True
+            )
             store_products[store] = store_products[store][:5]  # Top 5 por tienda
         
         return store_products 
\ No newline at end of file
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Extractor de datos estructurados
+Lee los productos del JSON embebido en la página (__NEXT_DATA__, JSON-LD, estados inline)
+sin renderizar el DOM
+"""
+
+import re
+import json
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+logger = logging.getLogger(__name__)
+
+_SCRIPT = re.compile(r'<script(?P<attrs>[^>]*)>(?P<body>.*?)</script>', re.IGNORECASE | re.DOTALL)
+_STATE_ASSIGNMENT = re.compile(
+    r'window\.(?P<name>__[A-Z_]*STATE__|__NUXT__|__APOLLO_STATE__|__PRELOADED_STATE__)\s*=\s*'
+)
+_THOUSANDS = re.compile(r'^\d{1,3}(?:\.\d{3})+(?:,\d+)?$')
+_DECIMAL = re.compile(r'^\d+[.,]\d{1,2}$')
+_PERCENT = re.compile(r'(\d+(?:[.,]\d+)?)\s*%')
+
+NAME_KEYS = ('displayName', 'name', 'productName', 'title')
+URL_KEYS = ('url', 'productUrl', 'link', 'href', 'pdpUrl')
+IMAGE_KEYS = ('image', 'mediaUrls', 'imageUrl', 'images', 'thumbnail', 'media')
+CURRENT_PRICE_KEYS = ('price', 'salePrice', 'offerPrice', 'bestPrice', 'currentPrice', 'internetPrice', 'lowPrice')
+ORIGINAL_PRICE_KEYS = ('listPrice', 'normalPrice', 'originalPrice', 'regularPrice', 'oldPrice', 'strikePrice', 'highPrice')
+DISCOUNT_KEYS = ('discountPercentage', 'discount', 'discountBadge', 'badge')
+
+# Tipos de precio de Falabella: el precio CMR solo aplica pagando con su tarjeta
+_CARD_PRICE_TYPES = ('cmrPrice',)
+_ORIGINAL_PRICE_TYPES = ('normalPrice', 'listPrice')
+
+# Rutas conocidas hacia la grilla de productos (se prueban antes del recorrido genérico)
+STORE_PRODUCT_PATHS = {
+    'falabella': [('props', 'pageProps', 'results')],
+    'paris': [('props', 'pageProps', 'products'), ('props', 'pageProps', 'searchResult', 'products')],
+}
+
+def parse_price_value(value: Any) -> Optional[float]:
+    """Precio numérico desde JSON: números, "24.990", "$ 1.249.990", "24990.00" o listas"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+
+    cleaned = re.sub(r'[^\d.,]', '', str(value))
+    if not cleaned:
+        return None
+    if _THOUSANDS.match(cleaned):
+        # Formato chileno: 1.249.990 o 1.249,90
+        cleaned = cleaned.replace('.', '').replace(',', '.')
+    elif _DECIMAL.match(cleaned):
+        cleaned = cleaned.replace(',', '.')
+    else:
+        cleaned = cleaned.replace('.', '').replace(',', '')
+    try:
+        price = float(cleaned)
+    except ValueError:
+        return None
+    return price if price > 0 else None
+
+def extract_json_blobs(html: Union[bytes, str]) -> List[Tuple[str, Any]]:
+    """Bloques JSON embebidos en la página como (origen, datos)"""
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+
+    blobs = []
+    for match in _SCRIPT.finditer(html):
+        attrs, body = match.group('attrs'), match.group('body').strip()
+        if not body:
+            continue
+
+        if '__NEXT_DATA__' in attrs:
+            source = 'next_data'
+        elif 'application/ld+json' in attrs:
+            source = 'json_ld'
+        else:
+            # Estado inline: window.__INITIAL_STATE__ = {...};
+            state = _STATE_ASSIGNMENT.search(body)
+            if not state:
+                continue
+            try:
+                data, _ = json.JSONDecoder().raw_decode(body, state.end())
+            except ValueError:
+                continue
+            blobs.append(('state', data))
+            continue
+
+        try:
+            blobs.append((source, json.loads(body)))
+        except ValueError as e:
+            logger.debug(f"JSON embebido inválido ({source}): {e}")
+    return blobs
+
+def _get_path(data: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def _first(node: Dict, keys: Tuple[str, ...]) -> Any:
+    for key in keys:
+        value = node.get(key)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+def _looks_like_product(node: Dict) -> bool:
+    if node.get('@type') == 'Product':
+        return True
+    name = _first(node, NAME_KEYS)
+    if not isinstance(name, str):
+        return False
+    return any(key in node for key in CURRENT_PRICE_KEYS + ('prices', 'offers'))
+
+def iter_product_nodes(data: Any) -> Iterator[Dict]:
+    """Recorre el JSON y devuelve los objetos con forma de producto (sin bajar dentro de ellos)"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if _looks_like_product(node):
+                yield node
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+class StructuredDataExtractor:
+    """Productos de una tienda a partir de sus datos estructurados"""
+
+    def __init__(self, store_name: str, base_url: Optional[str] = None):
+        self.store_name = store_name
+        self.base_url = base_url
+        self.product_paths = STORE_PRODUCT_PATHS.get(store_name, [])
+
+    def extract(self, html: Union[bytes, str]) -> List[Dict]:
+        """Productos en el esquema estándar; lista vacía si la página no trae datos utilizables"""
+        if not html:
+            return []
+
+        products = []
+        seen = set()
+        for source, data in extract_json_blobs(html):
+            nodes = None
+            if source == 'next_data':
+                for path in self.product_paths:
+                    candidate = _get_path(data, path)
+                    if isinstance(candidate, list) and candidate:
+                        nodes = candidate
+                        break
+            for node in nodes if nodes is not None else iter_product_nodes(data):
+                product = self.map_product(node) if isinstance(node, dict) else None
+                if not product:
+                    continue
+                # El mismo producto puede venir en el JSON-LD y en otro blob: se conserva la primera aparición
+                key = product['product_url'] or product['name'].lower()
+                if key not in seen:
+                    seen.add(key)
+                    products.append(product)
+            if products and source == 'next_data':
+                # __NEXT_DATA__ ya trae la grilla completa; el JSON-LD suele repetirla parcialmente
+                break
+
+        logger.debug(f"{len(products)} productos estructurados para {self.store_name}")
+        return products
+
+    def map_product(self, node: Dict) -> Optional[Dict]:
+        """Convierte un objeto producto del JSON al diccionario estándar de los scrapers"""
+        name = _first(node, NAME_KEYS)
+        if not isinstance(name, str) or not name.strip():
+            return None
+
+        current_price, original_price = self._extract_prices(node)
+        if not current_price:
+            return None
+        if not original_price or original_price < current_price:
+            original_price = current_price
+
+        discount = self._extract_discount(node)
+        if not discount and original_price > current_price:
+            discount = round((original_price - current_price) / original_price * 100, 2)
+
+        return {
+            'name': ' '.join(name.split()),
+            'original_price': original_price,
+            'current_price': current_price,
+            'discount_percentage': discount,
+            'product_url': self._absolute(self._extract_url(node)),
+            'image_url': self._absolute(self._extract_image(node)),
+            'store': self.store_name
+        }
+
+    def _extract_prices(self, node: Dict) -> Tuple[Optional[float], Optional[float]]:
+        prices = node.get('prices')
+        if isinstance(prices, list) and prices and isinstance(prices[0], dict):
+            return self._prices_from_list(prices)
+
+        offers = node.get('offers')
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        if isinstance(offers, dict):
+            # JSON-LD: Offer o AggregateOffer
+            current = parse_price_value(_first(offers, ('price', 'lowPrice')))
+            spec = offers.get('priceSpecification')
+            original = parse_price_value(spec.get('price')) if isinstance(spec, dict) else None
+            return current, original or parse_price_value(offers.get('highPrice'))
+
+        if isinstance(prices, dict):
+            node = prices
+        return (
+            parse_price_value(_first(node, CURRENT_PRICE_KEYS)),
+            parse_price_value(_first(node, ORIGINAL_PRICE_KEYS))
+        )
+
+    def _prices_from_list(self, prices: List[Dict]) -> Tuple[Optional[float], Optional[float]]:
+        """Lista de precios tipados (formato Falabella: internetPrice, cmrPrice, normalPrice...)"""
+        current, card, original = [], [], []
+        for entry in prices:
+            value = parse_price_value(entry.get('price'))
+            if value is None:
+                continue
+            price_type = entry.get('type')
+            if entry.get('crossed') or price_type in _ORIGINAL_PRICE_TYPES:
+                original.append(value)
+            elif price_type in _CARD_PRICE_TYPES:
+                card.append(value)
+            else:
+                current.append(value)
+        current = current or card
+        return (min(current) if current else None), (max(original) if original else None)
+
+    def _extract_discount(self, node: Dict) -> float:
+        value = _first(node, DISCOUNT_KEYS)
+        if isinstance(value, dict):
+            value = _first(value, ('label', 'value', 'text'))
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(abs(value)) if 0 < abs(value) < 100 else 0
+        if isinstance(value, str):
+            match = _PERCENT.search(value)
+            if match:
+                return float(match.group(1).replace(',', '.'))
+        return 0
+
+    def _extract_url(self, node: Dict) -> Optional[str]:
+        value = _first(node, URL_KEYS)
+        if isinstance(value, dict):
+            value = _first(value, ('href', 'url'))
+        return value if isinstance(value, str) else None
+
+    def _extract_image(self, node: Dict) -> Optional[str]:
+        value = _first(node, IMAGE_KEYS)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if isinstance(value, dict):
+            value = _first(value, ('url', 'contentUrl', 'src'))
+        return value if isinstance(value, str) else None
+
+    def _absolute(self, url: Optional[str]) -> Optional[str]:
+        if not url:
+            return None
+        return urljoin(self.base_url, url) if self.base_url else url
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Pool de navegadores Selenium
+Mantiene varios Chrome headless calientes, con carga 'eager', recursos pesados bloqueados
+y esperas explícitas en lugar de pausas fijas
+"""
+
+import atexit
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from config.settings import SELENIUM_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class WebDriverPool:
+    """Navegadores reutilizables; cada hilo toma uno con `driver()` y lo devuelve al terminar"""
+
+    def __init__(self, size: Optional[int] = None, config: Optional[Dict[str, Any]] = None,
+                 user_agent: Optional[str] = None, driver_factory: Optional[Callable[[], Any]] = None):
+        self.config = config or SELENIUM_CONFIG
+        self.size = max(1, size or self.config.get('pool_size', 3))
+        self.user_agent = user_agent or self.config.get('user_agent')
+        self._driver_factory = driver_factory or self._create_driver
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._drivers: List[Any] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _build_options(self) -> Options:
+        options = Options()
+        options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-gpu')
+        options.add_argument(f"--window-size={self.config.get('window_size', '1920,1080')}")
+        if self.user_agent:
+            options.add_argument(f'--user-agent={self.user_agent}')
+
+        # DOMContentLoaded basta: los productos se esperan explícitamente después
+        options.page_load_strategy = self.config.get('page_load_strategy', 'eager')
+        if self.config.get('block_resources', True):
+            options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.managed_default_content_settings.fonts': 2
+            })
+        return options
+
+    def _create_driver(self):
+        driver = webdriver.Chrome(options=self._build_options())
+        # Sin espera implícita: cada find_element fallido costaría el timeout completo
+        driver.implicitly_wait(0)
+        patterns = self.config.get('blocked_url_patterns', [])
+        if self.config.get('block_resources', True) and patterns:
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            except WebDriverException as e:
+                logger.warning(f"No se pudo bloquear recursos vía CDP: {e}")
+        return driver
+
+    def warm_up(self, count: Optional[int] = None):
+        """Arranca navegadores por adelantado (hasta el tamaño del pool)"""
+        for _ in range(min(count or self.size, self.size)):
+            driver = self._new_driver()
+            if driver is None:
+                break
+            self._idle.put(driver)
+
+    def _new_driver(self):
+        with self._lock:
+            if self._closed or len(self._drivers) >= self.size:
+                return None
+            # Reservar el hueco antes de arrancar Chrome (tarda segundos)
+            self._drivers.append(None)
+        try:
+            driver = self._driver_factory()
+        except Exception:
+            with self._lock:
+                self._drivers.remove(None)
+            raise
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+        logger.info(f"Navegador del pool iniciado ({len(self._drivers)}/{self.size})")
+        return driver
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Toma un navegador libre, arrancando uno nuevo si el pool no está lleno"""
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        driver = self._new_driver()
+        if driver is not None:
+            return driver
+        return self._idle.get(timeout=timeout)
+
+    def release(self, driver, discard: bool = False):
+        """Devuelve el navegador al pool (o lo descarta si quedó en mal estado)"""
+        if discard or self._closed:
+            self._quit(driver)
+            return
+        self._idle.put(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error cerrando navegador: {e}")
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """Uso: `with pool.driver() as driver: ...`"""
+        driver = self.acquire(timeout)
+        discard = False
+        try:
+            yield driver
+        except WebDriverException:
+            # Sesión caída o navegador colgado: reemplazarlo en el próximo acquire
+            discard = True
+            raise
+        finally:
+            self.release(driver, discard=discard)
+
+    def load(self, driver, url: str, wait_selector: Optional[str] = None,
+             timeout: Optional[float] = None) -> bool:
+        """Abre la URL y espera a que aparezca `wait_selector`; False si no aparece a tiempo"""
+        driver.get(url)
+        if not wait_selector:
+            return True
+        try:
+            WebDriverWait(driver, timeout or self.config.get('wait_timeout', 10)).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, wait_selector))
+            )
+            return True
+        except TimeoutException:
+            logger.warning(f"No aparecieron productos ({wait_selector}) en {url}")
+            return False
+
+    def scroll_to_load_more(self, driver, item_selector: Optional[str] = None,
+                            max_scrolls: Optional[int] = None, timeout: Optional[float] = None):
+        """Hace scroll hasta el final mientras la página siga cargando contenido nuevo"""
+        max_scrolls = max_scrolls or self.config.get('max_scrolls', 3)
+        timeout = timeout or self.config.get('scroll_timeout', 2)
+
+        def snapshot(d):
+            height = d.execute_script("return document.body.scrollHeight")
+            count = len(d.find_elements(By.CSS_SELECTOR, item_selector)) if item_selector else 0
+            return height, count
+
+        last = snapshot(driver)
+        for _ in range(max_scrolls):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=0.2).until(lambda d: snapshot(d) != last)
+            except TimeoutException:
+                break
+            last = snapshot(driver)
+
+    def close(self):
+        """Cierra todos los navegadores del pool"""
+        with self._lock:
+            self._closed = True
+            drivers = [driver for driver in self._drivers if driver is not None]
+        for driver in drivers:
+            self._quit(driver)
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        if drivers:
+            logger.info(f"{len(drivers)} navegadores del pool cerrados")
+
+_default_pool: Optional[WebDriverPool] = None
+_default_pool_lock = threading.Lock()
+
+def get_webdriver_pool() -> WebDriverPool:
+    """Pool compartido del proceso (se cierra al salir); usa el user agent de SELENIUM_CONFIG"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool._closed:
+            _default_pool = WebDriverPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+def close_webdriver_pool():
+    """Cierra el pool compartido si se llegó a crear"""
+    global _default_pool
+    with _default_pool_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close()